@@ -1,42 +1,49 @@
-from flask import Flask, request, render_template, send_file, jsonify
+from flask import Flask, request, render_template, send_file, jsonify, Response, stream_with_context
 import os
-import pandas as pd
+import time
+import traceback
 import uuid
 from unidecode import unidecode
-from supabase import create_client, Client
 from dotenv import load_dotenv
-import re
-import math
 
 load_dotenv()
 
-# Configuration Supabase
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Configuration Supabase (clients créés à la demande, un par process : voir clients.py)
+from config import SUPABASE_URL, SUPABASE_KEY, UPLOAD_FOLDER, OUTPUT_FOLDER
+from clients import get_session, get_supabase
 
-# Debug: Vérifier si les variables sont chargées
-print(f"DEBUG: SUPABASE_URL = {SUPABASE_URL[:30] if SUPABASE_URL else 'None'}...")
-print(f"DEBUG: SUPABASE_KEY = {'Loaded' if SUPABASE_KEY else 'None'}")
-
-supabase: Client = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        print("DEBUG: Supabase client created successfully!")
-    except Exception as e:
-        print(f"Erreur init Supabase: {e}")
-
-UPLOAD_FOLDER = 'uploads'
-OUTPUT_FOLDER = 'outputs'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+from artifact_store import ArtifactStore
+from otb_snapshots import SnapshotStore, to_records
+import rate_matrix
+import pricing
+from import_journal import ImportJournal, ImportConflict, IMPORT_FOLDER
+
+# Journal des imports (reprise au dernier lot confirmé avec le même import_id)
+imports = ImportJournal()
+
+# TTL + quota (LRU) sur uploads/, outputs/ et les journaux d'imports terminés, sweeper en arrière-plan
+artifacts = ArtifactStore.from_env([UPLOAD_FOLDER, OUTPUT_FOLDER, IMPORT_FOLDER], keep=imports.unfinished)
+artifacts.start_sweeper()
+
+# Snapshots "on the books" (pickup / pace) des rapports de réservations
+snapshots = SnapshotStore()
+
+# Matrices tarifaires Lighthouse (un fichier par hôtel et par date de shop)
+rates = rate_matrix.RateStore()
+
 app = Flask(__name__, template_folder='.')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 
-from utils import clean_column_name, infer_sql_type, split_datetime_columns, format_all_dates
 import excel_handler
+import import_service
+import pipeline
+from supabase_rest import FrameRecords, build_records, insert_records
+from storage_upload import StreamingUpload, TusUpload, UPLOAD_TIMEOUT
+import exporter
 
 # ... (Configuration Supabase reste ici)
 
@@ -76,22 +83,8 @@ def preview_excel_sheet():
 
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     try:
-        # Custom Smart Logic (Detects Lighthouse or Planning)
-        if is_lighthouse:
-            df = excel_handler.read_smart_excel(filepath, sheet_name)
-        else:
-            # Standard logic
-            df = excel_handler.read_excel_sheet(filepath, sheet_name)
-            
-        # Split datetime logic (to match what we do for CSVs)
-        # Note: If Lighthouse format, 'Date' is likely already a date or string 'Jeu 15/01/2026'
-        # split_datetime_columns might be redundant or safe to run. 
-        # Lighthouse dates are like "Jeu 15/01/2026". 
-        # split_datetime_columns looks for ' ' or 'T'.
-        # Let's keep it generic.
-        df = split_datetime_columns(df)
-        
-        cleaned_columns = [clean_column_name(c) for c in df.columns]
+        with artifacts.pinned(filepath):
+            cleaned_columns = pipeline.preview_excel_columns(filepath, sheet_name, is_lighthouse)
         return jsonify({
             'filename': filename,
             'columns': cleaned_columns
@@ -104,139 +97,120 @@ def preview_excel_sheet():
 @app.route('/process_excel', methods=['POST'])
 def process_excel_step2():
     data = request.json
-    filename = data.get('filename')
-    sheet_name = data.get('sheet_name')
-    target_table_name = data.get('table_name')
-    state_mode = data.get('mode', 'create') # create or update
-    selected_columns = data.get('columns', [])
-    column_mapping = data.get('column_mapping', {})
-    column_types = data.get('column_types', {})
-    is_lighthouse = data.get('is_lighthouse', False)
+    try:
+        params = import_service.excel_params(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not filename or not sheet_name or not target_table_name:
-        return jsonify({'error': 'Paramètres manquants'}), 400
-    
-    # Nettoyage du nom de la table pour sécurité SQL si création
-    if state_mode == 'create':
-        target_table_name = clean_column_name(target_table_name)
-    
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], params['filename'])
     if not os.path.exists(filepath):
         return jsonify({'error': 'Fichier introuvable'}), 404
 
-    try:
-        # Lecture
-        if is_lighthouse:
-            df = excel_handler.read_smart_excel(filepath, sheet_name)
-        else:
-            df = excel_handler.read_excel_sheet(filepath, sheet_name)
-        
-        # 1. Split colonnes Datetime
-        df = split_datetime_columns(df)
-        
-        # 2. Nettoyage des noms de colonnes
-        df.columns = [clean_column_name(c) for c in df.columns]
-        
-        # 3. Filtrage & Mapping (Similaire à CSV)
-        if selected_columns:
-            # On ne garde que les colonnes demandées
-            valid_cols = [c for c in selected_columns if c in df.columns]
-            df = df[valid_cols]
-            
-        if state_mode == 'append' and column_mapping:
-            df.rename(columns=column_mapping, inplace=True)
-            # Garder uniquement les colonnes mappées (Destination DB names)
-            target_cols = set(column_mapping.values())
-            df = df[[c for c in df.columns if c in target_cols]]
-
-        # 4. Formatage dates (incluant les colonnes déclarées DATE par l'user)
-        force_dates = [orig for orig, t in column_types.items() if t == 'DATE']
-        df_clean = format_all_dates(df, force_dates=force_dates)
-        
-        # 5. Nettoyage '0' / Empty -> None
-        df_clean = df_clean.where(pd.notnull(df_clean), None)
-        
-        # Push 
+    with artifacts.pinned(filepath):
         try:
-             response_msg = push_to_supabase(df_clean, target_table_name, state_mode, column_types)
-             return jsonify({'status': 'success', 'message': response_msg})
-        except Exception as e_push:
-             import traceback
-             traceback.print_exc()
-             return jsonify({'error': f"Erreur Supabase: {str(e_push)}"}), 500
-        
-    except Exception as e:
-        print(f"Erreur process excel: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+            df_clean = pipeline.prepare_excel_import(filepath, params['sheet'], params['mode'], params['columns'],
+                                                     params['mapping'], params['types'], params['is_lighthouse'])
 
-import requests # Add import
+            # Rate shop Lighthouse -> matrice tarifaire de l'hôtel 'hotel' (nom D-Edge, voir pricing)
+            rate_shop = None
+            if params['is_lighthouse']:
+                rate_shop = pipeline.record_rate_shop(filepath, params['sheet'], rates,
+                                                      data.get('hotel'), data.get('shop_date'))
+
+            # Plan (clé on_conflict, layout de la nouvelle table) et journal de l'import (voir import_service)
+            keys = table_keys(params['table']) if import_service.needs_table_keys(params, data) else None
+            try:
+                plan = import_service.plan_load(df_clean, params, data, replace=True, table_keys=keys)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            try:
+                checkpoint = import_service.begin(imports, data, params, plan, filepath, len(df_clean))
+            except ImportConflict as e:
+                return jsonify({'error': str(e), 'import_id': data.get('import_id')}), 409
+
+            # Toute erreur à partir d'ici passe l'import en 'failed' (sinon 409 pendant STALE_SECONDS)
+            with checkpoint.guard():
+                # Push
+                if not get_supabase():
+                    checkpoint.done()
+                    return jsonify({'status': 'success', 'message': import_service.NO_SUPABASE_MESSAGE,
+                                    'rate_shop': rate_shop, 'import': checkpoint.summary()})
+                try:
+                    already = checkpoint.next_offset
+                    total_inserted = run_load(plan, build_records(df_clean), checkpoint)
+                    return jsonify({'status': 'success', 'rate_shop': rate_shop, 'import': checkpoint.summary(),
+                                    'message': import_service.load_message(plan, total_inserted, already, excel=True)})
+                except Exception as e_push:
+                    traceback.print_exc()
+                    checkpoint.failed(e_push)
+                    return jsonify({'error': f"Erreur Supabase: {str(e_push)}", 'import_id': checkpoint.import_id,
+                                    'import': checkpoint.summary()}), 500
 
-def push_to_supabase(df, table_name, mode, column_types=None):
-    if not supabase:
-         return "Supabase non configuré (Mode local seulement)"
-    
-    if column_types is None: column_types = {}
-    print(f"DEBUG: push_to_supabase table={table_name} mode={mode} rows={len(df)}")
-
-    # Generate Create Table SQL
-    if mode == 'create':
-        cols_def = []
-        for col in df.columns:
-            # Use provided type from UI, otherwise infer
-            sql_type = column_types.get(col, infer_sql_type(df[col]))
-            cols_def.append(f"{col} {sql_type}")
-        
-        create_table_sql = f"DROP TABLE IF EXISTS {table_name}; CREATE TABLE {table_name} ({', '.join(cols_def)});"
-        print(f"DEBUG: Executing SQL: {create_table_sql[:150]}...")
-        
-        try:
-            supabase.rpc("exec_sql", {"query": create_table_sql}).execute()
-        except Exception as e:
-             print(f"❌ Error creating/dropping table: {e}")
-             raise e
-
-        import time
-        time.sleep(1) # Wait for propagation
-
-    # Insert Data
-    # Convert to standard python types for JSON (handles datetimes -> ISO strings)
-    # We use json.loads(df.to_json) to ensure everything is JSON-compliant (NaN -> null, Dates -> ISO)
-    import json
-    df_final = df.where(pd.notnull(df), None) # Ensure NaNs are None (null in JSON)
-    records = json.loads(df_final.to_json(orient='records', date_format='iso'))
-    
-    # Batch insert
-    batch_size = 500 # Can increase back to 500 or 1000 since we use POST body now
-    total_inserted = 0
-    
-    print(f"DEBUG: Starting batch insert for {len(records)} records (Direct HTTP)")
-    
-    headers = {
-        "apikey": SUPABASE_KEY,
-        "Authorization": f"Bearer {SUPABASE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "return=minimal" # Don't return inserted rows (saves bandwidth)
-    }
-    url = f"{SUPABASE_URL.rstrip('/')}/rest/v1/{table_name}"
-
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i + batch_size]
-        try:
-            # We use direct requests to avoid SDK weirdness (URI Too Long 414)
-            response = requests.post(url, json=batch, headers=headers)
-            
-            if response.status_code not in (200, 201):
-                raise Exception(f"HTTP {response.status_code}: {response.text}")
-                
-            total_inserted += len(batch)
         except Exception as e:
-            print(f"❌ Error inserting batch {i}: {e}")
-            raise e
-        
-    action = "créée et remplie" if mode == 'create' else "mise à jour"
-    return f"✅ Table Excel '{table_name}' {action} ({total_inserted} lignes)."
+            print(f"Erreur process excel: {e}")
+            traceback.print_exc()
+            return jsonify({'error': str(e)}), 500
+
+def table_keys(table_name):
+    """Clés uniques d'une table existante (RPC get_table_keys, voir setup_rpc.py), None si indisponibles."""
+    supabase = get_supabase()
+    if not supabase:
+        return None
+    try:
+        return supabase.rpc("get_table_keys", {"t_name": table_name}).execute().data
+    except Exception as e:
+        print(f"Info: clés de la table {table_name} non lues ({e})")
+        return None
+
+
+def table_exists(table_name):
+    """La table existe-t-elle (RPC get_table_columns) ? False si la lecture échoue."""
+    try:
+        return bool(get_supabase().rpc("get_table_columns", {"t_name": table_name}).execute().data)
+    except Exception as e:
+        print(f"Info: colonnes de la table {table_name} non lues ({e})")
+        return False
+
+
+def run_load(plan, records, checkpoint):
+    """
+    Exécute un plan de chargement (import_service) : DDL si pas encore fait, lots, SQL après chargement.
+    Journalise la fin de l'import (done) ; relève l'erreur, journalisée 'failed' par l'appelant.
+    """
+    supabase = get_supabase()
+    app.logger.debug(f"run_load table={plan['table']} mode={plan['mode']} rows={len(records)}")
+    # Pas de DROP / CREATE si l'import reprend : la table contient déjà les lots confirmés
+    if plan['create_sql'] and not checkpoint.table_created:
+        supabase.rpc("exec_sql", {"query": plan['create_sql']}).execute()
+        checkpoint.mark_table_created()
+        time.sleep(plan['settle_seconds'])
+    if checkpoint.next_offset == 0:
+        for query in plan['pre_insert_sql']:
+            supabase.rpc("exec_sql", {"query": query}).execute()
+    total_inserted = insert_records(SUPABASE_URL, SUPABASE_KEY, plan['table'], records,
+                                    batch_size=plan['batch_size'], session=get_session(),
+                                    on_conflict=plan['on_conflict'], checkpoint=checkpoint, merge=plan['merge'])
+    if plan['post_load_sql']:
+        supabase.rpc("exec_sql", {"query": plan['post_load_sql']}).execute()
+    checkpoint.done()
+    return total_inserted
+
+
+def push_stay_nights(df_nights, references, table_name, mode, import_id, input_path):
+    """Table de faits <table>_nuits, chargée après la table brute. Ne lève pas : résumé (avec l'erreur éventuelle)."""
+    exists = mode == 'append' and table_exists(import_service.stay_nights_table(table_name))
+    plan = import_service.plan_stay_nights(df_nights, references, table_name, mode, exists)
+    try:
+        checkpoint = import_service.begin_stay_nights(imports, plan, import_id, input_path, len(df_nights))
+    except ImportConflict as e:
+        return import_service.stay_nights_summary(plan, error=e)
+    try:
+        with checkpoint.guard():
+            run_load(plan, FrameRecords(df_nights), checkpoint)
+    except Exception as e:
+        print(f"Info/Erreur nuitées: {e}")
+        return import_service.stay_nights_summary(plan, checkpoint, e)
+    return import_service.stay_nights_summary(plan, checkpoint)
 
 
 @app.route('/')
@@ -257,31 +231,13 @@ def upload_file():
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
 
-    try:
-        df = pd.read_csv(filepath, sep=';', on_bad_lines='skip', encoding='utf-8')
-    except Exception:
-        try:
-            df = pd.read_csv(filepath, sep=';', on_bad_lines='skip', encoding='latin1')
-        except Exception:
-            return jsonify({"error": "Impossible de lire le fichier CSV."}), 400
+    df = pipeline.read_uploaded_csv(filepath)
+    if df is None:
+        return jsonify({"error": "Impossible de lire le fichier CSV."}), 400
+
+    # Colonnes "post-split" et nettoyées : ce qui sera disponible pour l'import
+    cleaned_columns = pipeline.preview_csv_columns(df)
 
-    # Simulation du pré-traitement pour avoir les 'bonnes' colonnes (avec split date/heure)
-    # On travaille sur une copie légère pour ne pas écraser le fichier source si on veut garder l'original
-    # Mais ici on veut juste extraire les noms de colonnes futurs.
-    
-    # 1. Split Datetime
-    df_preview = split_datetime_columns(df)
-    
-    # 2. Clean Names (optionnel ici, mais utile pour proposer un mapping auto propre)
-    # L'utilisateur a demandé que l'app prenne en compte la transformation (accents, etc)
-    # Donc on renvoie les colonnes "brutes post-split" ou "nettoyées" ?
-    # Le frontend affichera "Colonnes CSV".
-    # Si on renvoie nettoyé : "reservation" (au lieu de Réservation).
-    # C'est mieux pour le mapping auto si la DB a aussi "reservation".
-    
-    # On renvoie les noms nettoyés comme référence "source" pour le mapping
-    cleaned_columns = [clean_column_name(c) for c in df_preview.columns]
-    
     return jsonify({
         "filename": filename,
         "columns": cleaned_columns, # Ces colonnes correspondent à ce qui sera disponible pour l'import
@@ -290,6 +246,7 @@ def upload_file():
 
 @app.route('/tables', methods=['GET'])
 def list_tables():
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Supabase non connecté"}), 500
     try:
@@ -300,6 +257,7 @@ def list_tables():
 
 @app.route('/tables/<table_name>/columns', methods=['GET'])
 def list_table_columns(table_name):
+    supabase = get_supabase()
     if not supabase:
         return jsonify({"error": "Supabase non connecté"}), 500
     try:
@@ -311,205 +269,222 @@ def list_table_columns(table_name):
 @app.route('/filter', methods=['POST'])
 def filter_columns():
     data = request.json
-    filename = data.get('filename')
-    selected_columns = data.get('columns', [])
-    mode = data.get('mode', 'create') # create | append
-    target_table_name = data.get('table_name', '').strip()
-    column_mapping = data.get('column_mapping', {}) # {csv_col: db_col}
-
-    if not filename or not selected_columns:
-        return jsonify({"error": "Fichier ou colonnes manquants"}), 400
-
-    if not target_table_name and mode == 'append':
-         return jsonify({"error": "Nom de la table requis pour le mode 'Mettre à jour'"}), 400
-
-    if not target_table_name:
-        target_table_name = 'reservations_' + uuid.uuid4().hex[:8]
-    
-    # Nettoyage du nom de la table pour sécurité SQL si création
-    if mode == 'create':
-        target_table_name = clean_column_name(target_table_name)
+    try:
+        params = import_service.csv_params(data, imports)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    input_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    input_path = os.path.join(app.config['UPLOAD_FOLDER'], params['filename'])
     output_filename = f"filtered_{uuid.uuid4().hex}.csv"
     output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
     sql_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{output_filename.replace('.csv', '.sql')}")
 
-    # Tentative de lecture robuste (détection séparateur)
-    try:
-        # Essai 1: Séparateur ';' (classique FR)
-        df = pd.read_csv(input_path, sep=';', on_bad_lines='skip', encoding='utf-8', engine='python')
-        if len(df.columns) < 2: # Si tout est dans une colonne, c'était probablement pas ';'
-            raise ValueError("Sep not ;")
-    except Exception:
-        try:
-            # Essai 2: Séparateur ',' (standard)
-            df = pd.read_csv(input_path, sep=',', on_bad_lines='skip', encoding='utf-8', engine='python')
-        except Exception:
-            # Fallback: Encoding latin1 + séparateur ';'
-            df = pd.read_csv(input_path, sep=';', on_bad_lines='skip', encoding='latin1', engine='python')
+    # Fichiers de l'import protégés de l'éviction jusqu'à la fin de la requête
+    with artifacts.pinned(input_path, output_path, sql_path):
+        # Lecture en une passe (dialecte détecté, lignes ignorées comptées) puis transformation
+        # (mêmes colonnes que celles envoyées au front lors de l'upload)
+        df, csv_report = pipeline.read_csv_for_import(input_path)
+        df_filtered = pipeline.prepare_csv_import(df, params['columns'], params['mode'], params['mapping'])
 
-    # Transformation pré-sélection (pour matcher ce qu'on a envoyé au front lors de l'upload)
-    
-    # 1. Split datetime (créer date_d_achat, heure_d_achat...)
-    df_filtered = split_datetime_columns(df)
-    
-    # 2. Nettoyer TOUS les noms pour matcher ceux du frontend
-    original_cols = df_filtered.columns.tolist()
-    clean_cols = [clean_column_name(c) for c in original_cols]
-    df_filtered.columns = clean_cols
-    
-    # 3. Maintenant on peut filtrer selon la sélection du front (qui utilise les noms clean)
-    # Attention: Si une colonne n'existe pas (ex: ignorée par erreur), on l'ignore ou on error ?
-    # Filtrage robuste
-    valid_cols = [c for c in selected_columns if c in df_filtered.columns]
-    df_filtered = df_filtered[valid_cols]
-
-    # Plus besoin de re-splitter ou re-cleaner après, c'est fait.
-    
-    # Étape 3 : Réorganiser après 'reference' (si pertinent avec les nouveaux noms)
-    # Étape 3 : Logique spécifique par mode
-    if mode == 'create':
-        # Réorganiser colonnes (Business Logic pour placer les dates après la référence)
-        cols = df_filtered.columns.tolist()
-        new_order = []
-        inserted = False
-        
-        # Liste des colonnes dates techniques qu'on veut regrouper
-        technical_date_cols = [
-            'date_d_achat', 'heure_d_achat',
-            'date_modification', 'heure_modification',
-            'date_d_annulation', 'heure_d_annulation'
-        ]
-
-        for col in cols:
-            if col == 'reference' and not inserted:
-                new_order.append(col)
-                for dt_col in technical_date_cols:
-                    if dt_col in cols:
-                        new_order.append(dt_col)
-                inserted = True
-            elif col not in technical_date_cols:
-                new_order.append(col)
-        
-        if not inserted:
-            # Fallback si 'reference' pas trouvé
-            new_order = [c for c in cols if c not in technical_date_cols] + [c for c in technical_date_cols if c in cols]
-            
-        df_filtered = df_filtered[new_order]
-
-    elif mode == 'append':
-        # Appliquer mapping
-        # l'utilisateur envoie { "col_csv_clean": "col_db" }
-        if column_mapping:
-            df_filtered.rename(columns=column_mapping, inplace=True)
-            # On ne garde que les colonnes mappées (celles qui sont maintenant des noms DB valides)
-            target_cols = set(column_mapping.values())
-            final_cols = [c for c in df_filtered.columns if c in target_cols]
-            df_filtered = df_filtered[final_cols]
-
-
-    # Étape 4 : Nettoyer données textuelles (toujours)
-    # Exclure colonnes date/heure pour éviter d'introduire "0" dans des champs DATE/TIME
-    for col in df_filtered.select_dtypes(include='object').columns:
-        if 'date' in col or 'heure' in col:
-            continue
-        df_filtered[col] = df_filtered[col].astype(str).apply(lambda x: unidecode(x) if pd.notna(x) and x != 'nan' else '')
-
-    # Nettoyage explicite des colonnes date/heure
-    for col in df_filtered.columns:
-        if 'date' in col or 'heure' in col:
-            df_filtered[col] = df_filtered[col].replace({'0': None, 0: None, '': None})
-
-    # Étape 5 : Formater toutes les dates en jj/mm/aaaa (toujours)
-    df_filtered = format_all_dates(df_filtered)
-
-    # Sauvegarder CSV
-    df_filtered.to_csv(output_path, index=False, sep=';', encoding='utf-8', na_rep='')
-
-    import_status = "⚠️ Supabase non configuré."
-    storage_url = ""
-    save_storage = data.get('save_storage', False)
-
-    if supabase:
-        # Upload Storage (Si demandé)
-        if save_storage:
-            try:
-                # Création/Vérif bucket 'exports' (échouera si existe déjà, pas grave)
-                # supabase.storage.create_bucket("exports", public=True) 
-                
-                with open(output_path, 'rb') as f:
-                    storage_path = f"exports/{output_filename}"
-                    supabase.storage.from_("exports").upload(storage_path, f)
-                    storage_url = supabase.storage.from_("exports").get_public_url(storage_path)
-            except Exception as e:
-                print(f"Info/Erreur Storage: {e}") 
-
-    create_table_sql = "-- Mode Mise à jour (APPEND) : Pas de CREATE TABLE"
-    
-    if mode == 'create':
-        # Générer SQL CREATE TABLE
-        create_table_sql = f"CREATE TABLE IF NOT EXISTS {target_table_name} (\n"
-        columns_defs = []
-        for col in df_filtered.columns:
-            sql_type = infer_sql_type(df_filtered[col])
-            columns_defs.append(f"    {col} {sql_type}")
-        create_table_sql += ",\n".join(columns_defs) + "\n);"
-
-        with open(sql_path, 'w', encoding='utf-8') as f:
-            f.write(create_table_sql)
-
-    if supabase:
+        # Plan (clé on_conflict, layout de la nouvelle table) et journal de l'import (voir import_service)
+        keys = table_keys(params['table']) if import_service.needs_table_keys(params, data) else None
         try:
-            if mode == 'create':
-                # 1. Création de la table via RPC
-                supabase.rpc("exec_sql", {"query": create_table_sql}).execute()
-                import time
-                time.sleep(2)
-            
-            # 2. Préparation des données
-            import json
-            # Remplacer None/NaN par np.nan pour que to_json les convertisse en null JSON
-            # Remplacer None/NaN par np.nan pour que to_json les convertisse en null JSON
-            # Nettoyage ULTIME : Remplacer tout "0" ou 0 par None dans tout le dataframe
-            df_clean = df_filtered.replace({'0': None, 0: None, '': None, pd.NA: None, float('nan'): None})
-            # S'assurer que les NaNs sont None
-            df_clean = df_clean.where(pd.notnull(df_clean), None)
-            
-            records = json.loads(df_clean.to_json(orient='records', date_format='iso'))
-            
-            # 3. Insertion par lots (batch)
-            batch_size = 100
-            total_inserted = 0
-            
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
-                # supabase.table(target_table_name).insert(batch).execute()
-                
-                supabase.table(target_table_name).insert(batch).execute()
-                total_inserted += len(batch)
-                
-            action = "créée et remplie" if mode == 'create' else "mise à jour"
-            import_status = f"✅ Table '{target_table_name}' {action} ({total_inserted} lignes ajoutées)."
-            
-        except Exception as e:
-            import_status = f"⚠️ Erreur Supabase API : {str(e)}"
-    
-    return jsonify({
-        "download_url": f"/download/{output_filename}",
-        "sql_url": f"/download/{os.path.basename(sql_path)}" if mode == 'create' else "",
-        "table_name": target_table_name,
-        "import_status": import_status,
-        "create_table_sql": create_table_sql,
-        "storage_url": storage_url
-    })
+            plan = import_service.plan_load(df_filtered, params, data, table_keys=keys)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            checkpoint = import_service.begin(imports, data, params, plan, input_path, len(df_filtered))
+        except ImportConflict as e:
+            return jsonify({"error": str(e), "import_id": data.get('import_id')}), 409
+
+        # Toute erreur à partir d'ici passe l'import en 'failed' (sinon 409 pendant STALE_SECONDS)
+        with checkpoint.guard():
+            # Snapshot OTB daté (toutes les colonnes du rapport, pas seulement la sélection)
+            otb_snapshot = None
+            if data.get('record_snapshot', True):
+                otb_snapshot = pipeline.record_otb_snapshot(df, snapshots, data.get('capture_date'))
+
+            import_status = import_service.NO_SUPABASE_STATUS
+            supabase = get_supabase()
+
+            # Upload Storage (si demandé) : envoi TUS par blocs dès l'écriture du CSV,
+            # qui continue en arrière-plan pendant la création de la table et les insertions
+            storage_upload = None
+            if supabase and data.get('save_storage', False):
+                tus = TusUpload(SUPABASE_URL, SUPABASE_KEY, 'exports', f"exports/{output_filename}")
+                storage_upload = StreamingUpload(tus, output_path).start()
+
+            # Sauvegarder CSV
+            if storage_upload:
+                storage_upload.write_csv(df_filtered, index=False, sep=';', encoding='utf-8', na_rep='')
+            else:
+                df_filtered.to_csv(output_path, index=False, sep=';', encoding='utf-8', na_rep='')
+
+            if plan['create_sql']:
+                with open(sql_path, 'w', encoding='utf-8') as f:
+                    f.write(import_service.sql_file_text(plan))
+
+            if supabase:
+                try:
+                    already = checkpoint.next_offset
+                    total_inserted = run_load(plan, pipeline.build_csv_records(df_filtered), checkpoint)
+                    import_status = import_service.load_message(plan, total_inserted, already)
+                except Exception as e:
+                    checkpoint.failed(e)
+                    import_status = import_service.load_error_status(e, checkpoint)
+            else:
+                checkpoint.done()
+
+            # Nuitées (rapport D-Edge) : une ligne par nuit de séjour dans <table>_nuits
+            nights_summary = None
+            if supabase and checkpoint.summary()['status'] == 'done' and data.get('stay_nights', True):
+                nights = pipeline.build_stay_nights(df)
+                if nights is not None:
+                    df_nights, references, long_stays = nights
+                    nights_summary = dict(push_stay_nights(df_nights, references, plan['table'], plan['mode'],
+                                                           checkpoint.import_id, input_path), **long_stays)
+                    import_status += import_service.stay_nights_status(nights_summary, len(df_nights))
+
+            storage_url = ""
+            if storage_upload:
+                try:
+                    storage_url = storage_upload.result(UPLOAD_TIMEOUT)
+                except Exception as e:
+                    print(f"Info/Erreur Storage: {e}")
+
+            return jsonify(import_service.filter_response(plan, output_filename, sql_path, import_status, checkpoint,
+                                                          storage_url=storage_url, otb_snapshot=otb_snapshot,
+                                                          csv_report=csv_report, stay_nights=nights_summary))
 
 @app.route('/download/<filename>')
 def download_file(filename):
     path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
     if not os.path.exists(path):
         return "Fichier non trouvé", 404
+    artifacts.touch(path)
     return send_file(path, as_attachment=True)
 
+@app.route('/export/<table_name>', methods=['GET'])
+def export_table(table_name):
+    """
+    Export complet d'une table en flux : /export/<table>?format=csv|xlsx|parquet&columns=a,b&key=reference
+    (pagination par clé sur `key`, qui doit contenir une clé unique de la table ; par défaut sa clé primaire,
+    OFFSET si la table n'a pas de clé unique).
+    """
+    if not get_supabase():
+        return jsonify({"error": "Supabase non connecté"}), 500
+
+    fmt = request.args.get('format', 'csv').lower()
+    columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+    key_param = request.args.get('key', '')
+
+    message = exporter.check_export_params(table_name, fmt, columns, key_param)
+    if message:
+        return jsonify({"error": message}), 400
+    try:
+        page_size = exporter.parse_page_size(request.args.get('page_size'))
+        key_columns, key_not_null = exporter.export_key(table_keys(table_name), key_param)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stream = exporter.stream_export(SUPABASE_URL, SUPABASE_KEY, table_name, fmt, columns, key_columns, page_size,
+                                    session=get_session(), key_not_null=key_not_null)
+    try:
+        # Première page lue avant d'envoyer les en-têtes : une table inconnue donne une vraie erreur
+        first = next(stream, b'')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    def generate():
+        yield first
+        yield from stream
+
+    mimetype, ext = exporter.EXPORT_FORMATS[fmt]
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={table_name}.{ext}"})
+
+@app.route('/otb/captures', methods=['GET'])
+def otb_captures():
+    return jsonify(snapshots.captures())
+
+@app.route('/otb/pickup', methods=['GET'])
+def otb_pickup():
+    """Pickup par date de séjour entre deux captures : /otb/pickup?from=2026-01-01&to=2026-01-08&hotel=..."""
+    args = request.args
+    if not args.get('from') or not args.get('to'):
+        return jsonify({"error": "Paramètres 'from' et 'to' requis (dates de capture)"}), 400
+    try:
+        df = snapshots.pickup(args['from'], args['to'], hotel=args.get('hotel'), segment=args.get('segment'),
+                              stay_from=args.get('stay_from'), stay_to=args.get('stay_to'))
+        return jsonify(to_records(df))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/otb/pace', methods=['GET'])
+def otb_pace():
+    """Courbe de pace des séjours [stay_from, stay_to] : /otb/pace?stay_from=...&stay_to=...&hotel=..."""
+    args = request.args
+    if not args.get('stay_from') or not args.get('stay_to'):
+        return jsonify({"error": "Paramètres 'stay_from' et 'stay_to' requis"}), 400
+    try:
+        df = snapshots.pace(args['stay_from'], args['stay_to'], hotel=args.get('hotel'), segment=args.get('segment'),
+                            max_days_before=int(args.get('max_days_before', 365)))
+        return jsonify(to_records(df))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/rates/<hotel>/shops', methods=['GET'])
+def rate_shops(hotel):
+    return jsonify(rates.shop_dates(hotel))
+
+@app.route('/rates/<hotel>/compset', methods=['GET'])
+def rate_compset(hotel):
+    """Positionnement tarifaire par date de séjour : /rates/<hotel>/compset?shop_date=2026-01-15&own=..."""
+    args = request.args
+    shops = rates.shop_dates(hotel)
+    if not shops:
+        return jsonify({"error": f"Aucun rate shop pour {hotel}"}), 404
+    try:
+        df = rates.compset(hotel, args.get('shop_date') or shops[-1], own=args.get('own'),
+                           stay_from=args.get('stay_from'), stay_to=args.get('stay_to'))
+        return jsonify(rate_matrix.to_records(df))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/rates/<hotel>/changes', methods=['GET'])
+def rate_changes(hotel):
+    """Variations de tarifs d'un shop à l'autre : /rates/<hotel>/changes?from=...&to=...&stay_from=..."""
+    args = request.args
+    shops = [s for s in rates.shop_dates(hotel)
+             if (not args.get('from') or s >= args['from']) and (not args.get('to') or s <= args['to'])]
+    try:
+        df = rates.rate_changes(hotel, shops, stay_from=args.get('stay_from'), stay_to=args.get('stay_to'))
+        return jsonify(rate_matrix.to_records(df))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/recommendations', methods=['GET', 'POST'])
+def recommendations():
+    """
+    Prix recommandés par hôtel x date de séjour : /recommendations?hotel=...&start=2026-01-01&days=365
+    POST {"hotels": [...], "start": ..., "days": ..., "rules": {...}} pour surcharger les règles (pricing.DEFAULT_RULES).
+    """
+    args = request.args
+    body = request.get_json(silent=True) or {}
+    hotels = body.get('hotels') or args.getlist('hotel') or None
+    try:
+        df = pricing.recommend(snapshots, hotels=hotels, start=body.get('start') or args.get('start'),
+                               n_days=int(body.get('days') or args.get('days', 365)), rules=body.get('rules'),
+                               as_of=body.get('as_of') or args.get('as_of'), rates_folder=rates.folder)
+        return jsonify(rate_matrix.to_records(df))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/artifacts/stats', methods=['GET'])
+def artifacts_stats():
+    return jsonify(artifacts.stats())
+
 if __name__ == '__main__':
     app.run(debug=True)
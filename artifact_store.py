@@ -0,0 +1,218 @@
+"""
+Cycle de vie des fichiers de travail (uploads/, outputs/ et journaux d'imports).
+
+- TTL : un fichier non consulté depuis plus de `ttl_seconds` est supprimé.
+- Quota : au-delà de `quota_bytes`, on supprime les fichiers les moins récemment consultés (LRU)
+  jusqu'à repasser sous `low_watermark * quota_bytes`.
+- Pins : les fichiers d'un import en cours ne sont jamais supprimés.
+- keep : fichiers gardés selon leur contenu (journal d'un import non terminé, voir ImportJournal.unfinished),
+  tant que la fonction les désigne.
+
+Le dernier accès est l'atime du fichier, mis à jour explicitement par touch() (indépendant du montage
+noatime). Les pins sont des fichiers marqueurs dans <dossier>/.pins/ : l'état est donc partagé entre
+les workers gunicorn qui servent les mêmes dossiers.
+"""
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+PIN_DIR = '.pins'
+
+
+class ArtifactStore:
+    def __init__(self, folders, ttl_seconds=72 * 3600, quota_bytes=2 * 1024 ** 3, sweep_interval=600,
+                 low_watermark=0.9, stale_pin_seconds=6 * 3600, keep=None):
+        self.folders = list(folders)
+        self.keep = keep
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.sweep_interval = sweep_interval
+        self.low_watermark = low_watermark
+        self.stale_pin_seconds = stale_pin_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_sweep = None
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        for folder in self.folders:
+            os.makedirs(os.path.join(folder, PIN_DIR), exist_ok=True)
+
+    @classmethod
+    def from_env(cls, folders, keep=None):
+        return cls(
+            folders,
+            ttl_seconds=float(os.getenv('ARTIFACT_TTL_HOURS', 72)) * 3600,
+            quota_bytes=int(float(os.getenv('ARTIFACT_QUOTA_MB', 2048)) * 1024 ** 2),
+            sweep_interval=float(os.getenv('ARTIFACT_SWEEP_SECONDS', 600)),
+            keep=keep,
+        )
+
+    # --- Accès / pins ---
+
+    def touch(self, path):
+        """Marque le fichier comme consulté (LRU)."""
+        try:
+            st = os.stat(path)
+            os.utime(path, (time.time(), st.st_mtime))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def pinned(self, *paths):
+        """Protège les fichiers de l'éviction le temps d'un import."""
+        markers = []
+        for path in paths:
+            folder, name = os.path.split(os.path.abspath(path))
+            marker = os.path.join(folder, PIN_DIR, f"{name}__{os.getpid()}_{uuid.uuid4().hex[:8]}")
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            open(marker, 'w').close()
+            markers.append(marker)
+            self.touch(path)
+        try:
+            yield
+        finally:
+            for marker in markers:
+                try:
+                    os.remove(marker)
+                except FileNotFoundError:
+                    pass
+            for path in paths:
+                self.touch(path)
+
+    def _pinned_names(self, folder, now):
+        names = set()
+        pin_dir = os.path.join(folder, PIN_DIR)
+        try:
+            entries = list(os.scandir(pin_dir))
+        except FileNotFoundError:
+            return names
+        for entry in entries:
+            try:
+                # Marqueur orphelin (worker tué pendant un import)
+                if now - entry.stat().st_mtime > self.stale_pin_seconds:
+                    os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            names.add(entry.name.rsplit('__', 1)[0])
+        return names
+
+    # --- Inventaire / éviction ---
+
+    def _scan(self, now):
+        """Liste (path, size, last_access, pinned) de tous les fichiers gérés (pinned : pin ou keep)."""
+        files = []
+        for folder in self.folders:
+            pinned = self._pinned_names(folder, now)
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                kept = entry.name in pinned or bool(self.keep and self.keep(entry.path))
+                files.append((entry.path, st.st_size, max(st.st_atime, st.st_mtime), kept))
+        return files
+
+    def _evict(self, path, size):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False # Déjà supprimé (autre worker)
+        self.evicted_files += 1
+        self.evicted_bytes += size
+        return True
+
+    def sweep(self):
+        """Un passage TTL puis quota. Retourne le résumé du passage."""
+        with self._lock:
+            now = time.time()
+            files = self._scan(now)
+            removed = 0
+            freed = 0
+
+            kept = []
+            for path, size, last_access, pinned in files:
+                if not pinned and now - last_access > self.ttl_seconds and self._evict(path, size):
+                    removed += 1
+                    freed += size
+                else:
+                    kept.append((path, size, last_access, pinned))
+
+            total = sum(f[1] for f in kept)
+            if total > self.quota_bytes:
+                target = self.quota_bytes * self.low_watermark
+                for path, size, last_access, pinned in sorted(kept, key=lambda f: f[2]):
+                    if total <= target:
+                        break
+                    if pinned:
+                        continue
+                    if self._evict(path, size):
+                        removed += 1
+                        freed += size
+                    total -= size
+
+            self.last_sweep = {'at': now, 'removed_files': removed, 'freed_bytes': freed,
+                               'duration_ms': round((time.time() - now) * 1000, 2)}
+            return self.last_sweep
+
+    def stats(self):
+        now = time.time()
+        scanned = self._scan(now)
+        folders = {}
+        for folder in self.folders:
+            files = [f for f in scanned if os.path.dirname(f[0]) == folder]
+            folders[folder] = {
+                'files': len(files),
+                'bytes': sum(f[1] for f in files),
+                'pinned': sum(1 for f in files if f[3]),
+                'oldest_access_age_s': round(now - min((f[2] for f in files), default=now), 1),
+            }
+        return {
+            'folders': folders,
+            'total_bytes': sum(f['bytes'] for f in folders.values()),
+            'quota_bytes': self.quota_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'sweep_interval_s': self.sweep_interval,
+            'last_sweep': self.last_sweep,
+            'evicted_files': self.evicted_files,
+            'evicted_bytes': self.evicted_bytes,
+        }
+
+    # --- Sweeper en arrière-plan ---
+
+    def start_sweeper(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='artifact-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def after_fork(self):
+        """
+        Dans un worker forké (gunicorn --preload) : le thread du master n'existe pas ici et son
+        verrou a pu être copié verrouillé. Nouveau verrou, nouveau sweeper.
+        """
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.start_sweeper()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Info/Erreur sweeper: {e}")
+            self._stop.wait(self.sweep_interval)
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import time
+
+from artifact_store import ArtifactStore
+from import_journal import ImportJournal
+
+HOUR = 3600
+
+
+def _file(folder, name, size=100, age_hours=0):
+    """Fichier de size octets, dernier accès il y a age_hours."""
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    at = time.time() - age_hours * HOUR
+    os.utime(path, (at, at))
+    return path
+
+
+def test_ttl_spares_pinned_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtifactStore([tmp], ttl_seconds=24 * HOUR, quota_bytes=10 ** 9)
+        old = _file(tmp, 'old.csv', age_hours=48)
+        pinned = _file(tmp, 'pinned.csv', age_hours=48)
+        recent = _file(tmp, 'recent.csv', age_hours=1)
+        with store.pinned(pinned):
+            os.utime(pinned, (time.time() - 48 * HOUR,) * 2)  # pinned() le marque consulté : on le vieillit
+            result = store.sweep()
+        assert result['removed_files'] == 1 and result['freed_bytes'] == 100
+        assert not os.path.exists(old)
+        assert os.path.exists(pinned) and os.path.exists(recent)
+
+
+def test_quota_evicts_least_recently_used_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        # 5 x 100 octets, quota 350 : on descend sous 0.9 x 350 = 315, soit 2 suppressions
+        store = ArtifactStore([tmp], ttl_seconds=1000 * HOUR, quota_bytes=350)
+        paths = [_file(tmp, f"f{i}.csv", age_hours=10 - i) for i in range(5)]  # f0 le plus ancien
+        with store.pinned(paths[0]):
+            os.utime(paths[0], (time.time() - 10 * HOUR,) * 2)
+            store.touch(paths[2])  # consulté : passe en dernier
+            store.sweep()
+        remaining = sorted(os.path.basename(p) for p in paths if os.path.exists(p))
+        assert remaining == ['f0.csv', 'f2.csv', 'f4.csv'], remaining
+        assert store.evicted_files == 2 and store.evicted_bytes == 200
+
+
+def test_unfinished_import_journals_are_kept():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        store = ArtifactStore([journal.folder], ttl_seconds=HOUR, quota_bytes=10 ** 9, keep=journal.unfinished)
+        source = _file(tmp, 'source.csv')
+        running = journal.begin('en-cours', 'resa', 'create', 'fp', 10, 5)
+        failed = journal.begin('echoue', 'resa', 'create', 'fp', 10, 5)
+        failed.failed("HTTP 503")
+        done = journal.begin('termine', 'resa', 'create', 'fp', 10, 5)
+        done.done()
+        for import_id in ('en-cours', 'echoue', 'termine'):
+            path = journal._path(import_id)
+            os.utime(path, (time.time() - 48 * HOUR,) * 2)
+        assert store.sweep()['removed_files'] == 1
+        assert journal.get('termine') is None
+        assert journal.get('en-cours')['next_offset'] == 0 and journal.get('echoue')['status'] == 'failed'
+        assert store.stats()['folders'][journal.folder]['pinned'] == 2
+        assert not journal.unfinished(source)
+
+
+if __name__ == '__main__':
+    test_ttl_spares_pinned_files()
+    test_quota_evicts_least_recently_used_first()
+    test_unfinished_import_journals_are_kept()
+    print("✅ artifact_store: TTL et LRU respectent les pins, journaux d'imports non terminés gardés")
@@ -0,0 +1,519 @@
+"""
+Mode de service ASGI (FastAPI + uvicorn), mêmes routes que app.py.
+
+- Les étapes pandas (CPU) passent par un executor (threads par défaut, processus si RMS_ASGI_EXECUTOR=process).
+- Les appels PostgREST passent par un httpx.AsyncClient partagé (supabase_async.AsyncSupabase) ;
+  les uploads Storage passent par storage_upload (TUS).
+Un worker peut ainsi servir l'UI pendant que plusieurs imports attendent le réseau.
+
+Lancement:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 2
+"""
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from unidecode import unidecode
+
+load_dotenv()
+
+from config import SUPABASE_URL, SUPABASE_KEY, UPLOAD_FOLDER, OUTPUT_FOLDER
+from artifact_store import ArtifactStore
+from otb_snapshots import SnapshotStore, to_records
+import rate_matrix
+import pricing
+from import_journal import ImportJournal, ImportConflict, IMPORT_FOLDER
+import excel_handler
+import exporter
+import import_service
+import pipeline
+from supabase_async import AsyncSupabase
+from supabase_rest import FrameRecords, build_records
+from storage_upload import StreamingUpload, TusUpload, UPLOAD_TIMEOUT
+
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+EXECUTOR_KIND = os.getenv('RMS_ASGI_EXECUTOR', 'thread')
+EXECUTOR_WORKERS = int(os.getenv('RMS_ASGI_CPU_WORKERS', os.cpu_count() or 2))
+
+executor = None
+supabase = None
+imports = ImportJournal()
+artifacts = ArtifactStore.from_env([UPLOAD_FOLDER, OUTPUT_FOLDER, IMPORT_FOLDER], keep=imports.unfinished)
+snapshots = SnapshotStore()
+rates = rate_matrix.RateStore()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global executor, supabase
+    if EXECUTOR_KIND == 'process':
+        executor = ProcessPoolExecutor(max_workers=EXECUTOR_WORKERS)
+    else:
+        executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='rms-cpu')
+    if SUPABASE_URL and SUPABASE_KEY:
+        supabase = AsyncSupabase(SUPABASE_URL, SUPABASE_KEY)
+    artifacts.start_sweeper()
+    try:
+        yield
+    finally:
+        artifacts.stop_sweeper()
+        if supabase:
+            await supabase.aclose()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Exécute une étape pandas hors de la boucle d'événements."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+def error(message, status=400):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+async def save_upload(file, filepath):
+    """Copie l'upload par blocs (sans charger tout le fichier en mémoire)."""
+    with open(filepath, 'wb') as out:
+        while chunk := await file.read(1024 * 1024):
+            out.write(chunk)
+
+
+def write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@app.get('/')
+async def index():
+    return FileResponse('index.html')
+
+
+@app.post('/upload_excel')
+async def upload_excel_step1(file: UploadFile = File(None)):
+    if file is None:
+        return error('Aucun fichier')
+    if file.filename == '':
+        return error('Aucun fichier sélectionné')
+    if not file.filename.endswith(('.xlsx', '.xls')):
+        return error('Format fichier invalide (attendu: .xlsx, .xls)')
+
+    filename = str(uuid.uuid4()) + "_" + unidecode(file.filename)
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    await save_upload(file, filepath)
+
+    try:
+        sheets = await run_cpu(excel_handler.list_sheets, filepath)
+        return {'filename': filename, 'sheets': sheets}
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.post('/preview_excel')
+async def preview_excel_sheet(request: Request):
+    data = await request.json()
+    filename = data.get('filename')
+    sheet_name = data.get('sheet_name')
+    is_lighthouse = data.get('is_lighthouse', False)
+
+    if not filename or not sheet_name:
+        return error('Paramètres manquants')
+
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    try:
+        with artifacts.pinned(filepath):
+            cleaned_columns = await run_cpu(pipeline.preview_excel_columns, filepath, sheet_name, is_lighthouse)
+        return {'filename': filename, 'columns': cleaned_columns}
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.post('/process_excel')
+async def process_excel_step2(request: Request):
+    data = await request.json()
+    try:
+        params = import_service.excel_params(data)
+    except ValueError as e:
+        return error(str(e))
+
+    filepath = os.path.join(UPLOAD_FOLDER, params['filename'])
+    if not os.path.exists(filepath):
+        return error('Fichier introuvable', 404)
+
+    with artifacts.pinned(filepath):
+        try:
+            df_clean = await run_cpu(pipeline.prepare_excel_import, filepath, params['sheet'], params['mode'],
+                                     params['columns'], params['mapping'], params['types'], params['is_lighthouse'])
+            rate_shop = None
+            if params['is_lighthouse']:
+                rate_shop = await run_cpu(pipeline.record_rate_shop, filepath, params['sheet'], rates,
+                                          data.get('hotel'), data.get('shop_date'))
+        except Exception as e:
+            print(f"Erreur process excel: {e}")
+            return error(str(e), 500)
+
+        # Plan et journal de l'import (voir import_service)
+        keys = await table_keys(params['table']) if import_service.needs_table_keys(params, data) else None
+        try:
+            plan = await run_cpu(import_service.plan_load, df_clean, params, data, replace=True, table_keys=keys)
+        except ValueError as e:
+            return error(str(e))
+        try:
+            checkpoint = import_service.begin(imports, data, params, plan, filepath, len(df_clean))
+        except ImportConflict as e:
+            return JSONResponse({'error': str(e), 'import_id': data.get('import_id')}, status_code=409)
+
+        # Toute erreur (ou annulation) à partir d'ici passe l'import en 'failed' (voir app.process_excel_step2)
+        with checkpoint.guard():
+            if not supabase:
+                checkpoint.done()
+                return {'status': 'success', 'message': import_service.NO_SUPABASE_MESSAGE, 'rate_shop': rate_shop,
+                        'import': checkpoint.summary()}
+            try:
+                already = checkpoint.next_offset
+                records = await run_cpu(build_records, df_clean)
+                total_inserted = await run_load(plan, records, checkpoint)
+                return {'status': 'success', 'rate_shop': rate_shop, 'import': checkpoint.summary(),
+                        'message': import_service.load_message(plan, total_inserted, already, excel=True)}
+            except Exception as e_push:
+                checkpoint.failed(e_push)
+                return JSONResponse({'error': f"Erreur Supabase: {str(e_push)}", 'import_id': checkpoint.import_id,
+                                     'import': checkpoint.summary()}, status_code=500)
+
+
+async def table_keys(table_name):
+    """Version asynchrone de app.table_keys."""
+    if not supabase:
+        return None
+    try:
+        return await supabase.rpc("get_table_keys", {"t_name": table_name})
+    except Exception as e:
+        print(f"Info: clés de la table {table_name} non lues ({e})")
+        return None
+
+
+async def table_exists(table_name):
+    """Version asynchrone de app.table_exists."""
+    try:
+        return bool(await supabase.rpc("get_table_columns", {"t_name": table_name}))
+    except Exception as e:
+        print(f"Info: colonnes de la table {table_name} non lues ({e})")
+        return False
+
+
+async def run_load(plan, records, checkpoint):
+    """Version asynchrone de app.run_load (journalise done, relève l'erreur : 'failed' journalisé par l'appelant)."""
+    if plan['create_sql'] and not checkpoint.table_created:
+        await supabase.rpc("exec_sql", {"query": plan['create_sql']})
+        checkpoint.mark_table_created()
+        await asyncio.sleep(plan['settle_seconds'])
+    if checkpoint.next_offset == 0:
+        for query in plan['pre_insert_sql']:
+            await supabase.rpc("exec_sql", {"query": query})
+    total_inserted = await supabase.insert_records(plan['table'], records, batch_size=plan['batch_size'],
+                                                   on_conflict=plan['on_conflict'], checkpoint=checkpoint,
+                                                   merge=plan['merge'])
+    if plan['post_load_sql']:
+        await supabase.rpc("exec_sql", {"query": plan['post_load_sql']})
+    checkpoint.done()
+    return total_inserted
+
+
+async def push_stay_nights(df_nights, references, table_name, mode, import_id, input_path):
+    """Version asynchrone de app.push_stay_nights (table de faits <table>_nuits, ne lève pas)."""
+    exists = mode == 'append' and await table_exists(import_service.stay_nights_table(table_name))
+    plan = await run_cpu(import_service.plan_stay_nights, df_nights, references, table_name, mode, exists)
+    try:
+        checkpoint = import_service.begin_stay_nights(imports, plan, import_id, input_path, len(df_nights))
+    except ImportConflict as e:
+        return import_service.stay_nights_summary(plan, error=e)
+    try:
+        with checkpoint.guard():
+            await run_load(plan, FrameRecords(df_nights), checkpoint)
+    except Exception as e:
+        print(f"Info/Erreur nuitées: {e}")
+        return import_service.stay_nights_summary(plan, checkpoint, e)
+    return import_service.stay_nights_summary(plan, checkpoint)
+
+
+@app.post('/upload')
+async def upload_file(file: UploadFile = File(None)):
+    if file is None:
+        return error("Aucun fichier fourni")
+    if file.filename == '':
+        return error("Nom de fichier vide")
+    if not file.filename.endswith('.csv'):
+        return error("Seuls les fichiers CSV sont acceptés")
+
+    filename = str(uuid.uuid4()) + '.csv'
+    filepath = os.path.join(UPLOAD_FOLDER, filename)
+    await save_upload(file, filepath)
+
+    df = await run_cpu(pipeline.read_uploaded_csv, filepath)
+    if df is None:
+        return error("Impossible de lire le fichier CSV.")
+
+    cleaned_columns = await run_cpu(pipeline.preview_csv_columns, df)
+    return {
+        "filename": filename,
+        "columns": cleaned_columns,
+        "raw_columns_count": len(df.columns)
+    }
+
+
+@app.get('/tables')
+async def list_tables():
+    if not supabase:
+        return error("Supabase non connecté", 500)
+    try:
+        return await supabase.rpc("get_public_tables", {})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/tables/{table_name}/columns')
+async def list_table_columns(table_name: str):
+    if not supabase:
+        return error("Supabase non connecté", 500)
+    try:
+        return await supabase.rpc("get_table_columns", {"t_name": table_name})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.post('/filter')
+async def filter_columns(request: Request):
+    data = await request.json()
+    try:
+        params = import_service.csv_params(data, imports)
+    except ValueError as e:
+        return error(str(e))
+
+    input_path = os.path.join(UPLOAD_FOLDER, params['filename'])
+    output_filename = f"filtered_{uuid.uuid4().hex}.csv"
+    output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+    sql_path = os.path.join(OUTPUT_FOLDER, f"{output_filename.replace('.csv', '.sql')}")
+
+    # Fichiers de l'import protégés de l'éviction jusqu'à la fin de la requête
+    with artifacts.pinned(input_path, output_path, sql_path):
+        df, csv_report = await run_cpu(pipeline.read_csv_for_import, input_path)
+        df_filtered = await run_cpu(pipeline.prepare_csv_import, df, params['columns'], params['mode'],
+                                    params['mapping'])
+
+        # Plan et journal de l'import (voir import_service)
+        keys = await table_keys(params['table']) if import_service.needs_table_keys(params, data) else None
+        try:
+            plan = await run_cpu(import_service.plan_load, df_filtered, params, data, table_keys=keys)
+        except ValueError as e:
+            return error(str(e))
+        try:
+            checkpoint = import_service.begin(imports, data, params, plan, input_path, len(df_filtered))
+        except ImportConflict as e:
+            return JSONResponse({"error": str(e), "import_id": data.get('import_id')}, status_code=409)
+
+        # Toute erreur (ou annulation) à partir d'ici passe l'import en 'failed' (voir app.filter_columns)
+        with checkpoint.guard():
+            otb_snapshot = None
+            if data.get('record_snapshot', True):
+                otb_snapshot = await run_cpu(pipeline.record_otb_snapshot, df, snapshots, data.get('capture_date'))
+
+            # Upload Storage TUS en flux (voir app.filter_columns) : thread d'upload + écriture du CSV dans un thread
+            # (le fichier est partagé avec l'uploader, donc pas d'écriture dans le pool de process)
+            storage_upload = None
+            if supabase and data.get('save_storage', False):
+                tus = TusUpload(supabase.url, supabase.key, 'exports', f"exports/{output_filename}")
+                storage_upload = StreamingUpload(tus, output_path).start()
+                await asyncio.to_thread(storage_upload.write_csv, df_filtered,
+                                        index=False, sep=';', encoding='utf-8', na_rep='')
+            else:
+                await run_cpu(df_filtered.to_csv, output_path, index=False, sep=';', encoding='utf-8', na_rep='')
+
+            if plan['create_sql']:
+                await run_cpu(write_text, sql_path, import_service.sql_file_text(plan))
+
+            import_status = import_service.NO_SUPABASE_STATUS
+            if supabase:
+                try:
+                    already = checkpoint.next_offset
+                    records = await run_cpu(pipeline.build_csv_records, df_filtered)
+                    total_inserted = await run_load(plan, records, checkpoint)
+                    import_status = import_service.load_message(plan, total_inserted, already)
+                except Exception as e:
+                    checkpoint.failed(e)
+                    import_status = import_service.load_error_status(e, checkpoint)
+            else:
+                checkpoint.done()
+
+            # Nuitées (voir app.filter_columns)
+            nights_summary = None
+            if supabase and checkpoint.summary()['status'] == 'done' and data.get('stay_nights', True):
+                nights = await run_cpu(pipeline.build_stay_nights, df)
+                if nights is not None:
+                    df_nights, references, long_stays = nights
+                    nights_summary = dict(await push_stay_nights(df_nights, references, plan['table'], plan['mode'],
+                                                                 checkpoint.import_id, input_path), **long_stays)
+                    import_status += import_service.stay_nights_status(nights_summary, len(df_nights))
+
+            storage_url = ""
+            if storage_upload:
+                try:
+                    storage_url = await asyncio.to_thread(storage_upload.result, UPLOAD_TIMEOUT)
+                except Exception as e:
+                    print(f"Info/Erreur Storage: {e}")
+
+            return import_service.filter_response(plan, output_filename, sql_path, import_status, checkpoint,
+                                                  storage_url=storage_url, otb_snapshot=otb_snapshot,
+                                                  csv_report=csv_report, stay_nights=nights_summary)
+
+
+@app.get('/download/{filename}')
+async def download_file(filename: str):
+    path = os.path.join(OUTPUT_FOLDER, filename)
+    if not os.path.exists(path):
+        return PlainTextResponse("Fichier non trouvé", status_code=404)
+    artifacts.touch(path)
+    return FileResponse(path, filename=filename)
+
+
+@app.get('/export/{table_name}')
+async def export_table(table_name: str, format: str = 'csv', columns: str = '', key: str = '',
+                       page_size: str = ''):
+    """Export complet d'une table en flux (voir app.export_table)."""
+    if not supabase:
+        return error("Supabase non connecté", 500)
+
+    fmt = format.lower()
+    cols = [c for c in columns.split(',') if c] or None
+    message = exporter.check_export_params(table_name, fmt, cols, key)
+    if message:
+        return error(message)
+    try:
+        size = exporter.parse_page_size(page_size)
+        key_columns, key_not_null = exporter.export_key(await table_keys(table_name), key)
+    except ValueError as e:
+        return error(str(e))
+
+    # Générateur synchrone (requests) : Starlette l'itère dans son threadpool. Première page dans un thread
+    # (un générateur ne passe pas à un exécuteur de process)
+    stream = exporter.stream_export(SUPABASE_URL, SUPABASE_KEY, table_name, fmt, cols, key_columns, size,
+                                    key_not_null=key_not_null)
+    try:
+        first = await asyncio.to_thread(next, stream, b'')
+    except Exception as e:
+        return error(str(e), 500)
+
+    def generate():
+        yield first
+        yield from stream
+
+    mimetype, ext = exporter.EXPORT_FORMATS[fmt]
+    return StreamingResponse(generate(), media_type=mimetype,
+                             headers={"Content-Disposition": f"attachment; filename={table_name}.{ext}"})
+
+
+@app.get('/otb/captures')
+async def otb_captures():
+    return snapshots.captures()
+
+
+@app.get('/otb/pickup')
+async def otb_pickup(request: Request):
+    """Pickup par date de séjour entre deux captures (voir app.otb_pickup)."""
+    args = request.query_params
+    if not args.get('from') or not args.get('to'):
+        return error("Paramètres 'from' et 'to' requis (dates de capture)")
+    try:
+        df = await run_cpu(snapshots.pickup, args['from'], args['to'], hotel=args.get('hotel'),
+                           segment=args.get('segment'), stay_from=args.get('stay_from'), stay_to=args.get('stay_to'))
+        return to_records(df)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/otb/pace')
+async def otb_pace(request: Request):
+    """Courbe de pace des séjours [stay_from, stay_to] (voir app.otb_pace)."""
+    args = request.query_params
+    if not args.get('stay_from') or not args.get('stay_to'):
+        return error("Paramètres 'stay_from' et 'stay_to' requis")
+    try:
+        df = await run_cpu(snapshots.pace, args['stay_from'], args['stay_to'], hotel=args.get('hotel'),
+                           segment=args.get('segment'), max_days_before=int(args.get('max_days_before', 365)))
+        return to_records(df)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/rates/{hotel}/shops')
+async def rate_shops(hotel: str):
+    return rates.shop_dates(hotel)
+
+
+@app.get('/rates/{hotel}/compset')
+async def rate_compset(hotel: str, request: Request):
+    """Positionnement tarifaire par date de séjour (voir app.rate_compset)."""
+    args = request.query_params
+    shops = rates.shop_dates(hotel)
+    if not shops:
+        return error(f"Aucun rate shop pour {hotel}", 404)
+    try:
+        df = await run_cpu(rates.compset, hotel, args.get('shop_date') or shops[-1], own=args.get('own'),
+                           stay_from=args.get('stay_from'), stay_to=args.get('stay_to'))
+        return rate_matrix.to_records(df)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/rates/{hotel}/changes')
+async def rate_changes(hotel: str, request: Request):
+    """Variations de tarifs d'un shop à l'autre (voir app.rate_changes)."""
+    args = request.query_params
+    shops = [s for s in rates.shop_dates(hotel)
+             if (not args.get('from') or s >= args['from']) and (not args.get('to') or s <= args['to'])]
+    try:
+        df = await run_cpu(rates.rate_changes, hotel, shops, stay_from=args.get('stay_from'),
+                           stay_to=args.get('stay_to'))
+        return rate_matrix.to_records(df)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.api_route('/recommendations', methods=['GET', 'POST'])
+async def recommendations(request: Request):
+    """Prix recommandés par hôtel x date de séjour (voir app.recommendations)."""
+    args = request.query_params
+    body = {}
+    if request.method == 'POST':
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+    hotels = body.get('hotels') or args.getlist('hotel') or None
+    try:
+        # Blocs d'hôtels répartis par pricing.recommend sur le pool du worker (pas l'exécuteur CPU partagé)
+        df = await asyncio.to_thread(pricing.recommend, snapshots, hotels=hotels,
+                                     start=body.get('start') or args.get('start'),
+                                     n_days=int(body.get('days') or args.get('days', 365)), rules=body.get('rules'),
+                                     as_of=body.get('as_of') or args.get('as_of'), rates_folder=rates.folder)
+        return await run_cpu(rate_matrix.to_records, df)
+    except ValueError as e:
+        return error(str(e))
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@app.get('/artifacts/stats')
+async def artifacts_stats():
+    # Parcours de dossiers (I/O, verrou du store) : thread, jamais l'exécuteur de process
+    return await asyncio.to_thread(artifacts.stats)
@@ -0,0 +1,89 @@
+"""
+Benchmark: CSV import read (/filter) on large D-Edge exports.
+
+Compares the previous trial-and-error reader (engine='python', ';' then ',' then latin1)
+with csv_reader.read_csv (byte-level sniffing, single pass) on the C and pyarrow engines,
+for the usual export (UTF-8 BOM, ';') and for a ',' / cp1252 variant where the legacy reader
+parses the file several times. A few malformed lines are injected to check they are reported.
+
+Usage:
+    python benchmarks/csv_benchmark.py --rows 200000
+    python benchmarks/csv_benchmark.py --rows 500000 --skip-legacy
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import csv_reader
+from generators import generate_dedge_frame
+
+
+def legacy_read_csv_for_import(input_path):
+    """Implementation before csv_reader (kept for comparison)."""
+    try:
+        df = pd.read_csv(input_path, sep=';', on_bad_lines='skip', encoding='utf-8', engine='python')
+        if len(df.columns) < 2:
+            raise ValueError("Sep not ;")
+    except Exception:
+        try:
+            df = pd.read_csv(input_path, sep=',', on_bad_lines='skip', encoding='utf-8', engine='python')
+        except Exception:
+            df = pd.read_csv(input_path, sep=';', on_bad_lines='skip', encoding='latin1', engine='python')
+    return df
+
+
+def write_variant(df, path, sep, encoding, bad_lines):
+    df.to_csv(path, sep=sep, index=False, encoding=encoding)
+    # Lignes avec un champ en trop, réparties dans le fichier
+    with open(path, 'rb') as f:
+        lines = f.read().split(b'\n')
+    step = max(1, len(lines) // (bad_lines + 1))
+    for i in range(1, bad_lines + 1):
+        lines[i * step] += sep.encode() + b'extra'
+    with open(path, 'wb') as f:
+        f.write(b'\n'.join(lines))
+    return path
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--bad-lines", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    df = generate_dedge_frame(args.rows)
+    engines = ['c', 'pyarrow']
+    with tempfile.TemporaryDirectory() as folder:
+        for label, sep, encoding in (("utf-8-sig ';'", ';', 'utf-8-sig'), ("cp1252 ','", ',', 'cp1252')):
+            path = write_variant(df, os.path.join(folder, 'export.csv'), sep, encoding, args.bad_lines)
+            print(f"{label}: {args.rows:,} rows, {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+
+            if not args.skip_legacy:
+                try:
+                    legacy, elapsed = timed(legacy_read_csv_for_import, path)
+                    print(f"  {'legacy (python engine)':<24}{elapsed:8.2f} s  {legacy.shape}")
+                except Exception as e:
+                    print(f"  {'legacy (python engine)':<24}   error  {type(e).__name__}: {e}")
+
+            (_, sniff_elapsed) = timed(csv_reader.sniff, path)
+            for engine in engines:
+                (result, report), elapsed = timed(csv_reader.read_csv, path, engine=engine)
+                print(f"  {'csv_reader[' + report['engine'] + ']':<24}{elapsed:8.2f} s  {result.shape}  "
+                      f"sep={report['delimiter']!r} enc={report['encoding']} bad_lines={report['bad_lines']}")
+            print(f"  {'(sniff only)':<24}{sniff_elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Générateurs de données RMS synthétiques (reproductibles via seed) pour les benchmarks.
+
+- D-Edge "réservations en cours" (CSV ';', UTF-8 BOM, mêmes colonnes que l'export réel)
+- Lighthouse / Booking "Tarifs" (xlsx, en-tête ligne 5)
+- Planning (xlsx, en-tête ligne 2, dates en colonnes à partir de D)
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+DEDGE_COLUMNS = [
+    "Etat", "Référence", "Date d'achat", "Dernière modification", "Date d'annulation", "Hôtel", "Hôtel (ID)",
+    "Titre", "Prénom", "Nom", "E-Mail", "Date d'arrivée", "Date de départ", "Nuits", "Chambres", "Adultes",
+    "Enfants", "Bébés", "Type de chambre", "Tarif", "Détail du panier", "Tarifs multiples",
+    "Demande de réservation", "Code promo", "Visibilité du code promo", "Montant total", "Montant du panier",
+    "Garantie", "Monnaie", "Mode de paiement", "Plateforme", "Assurance annulation", "Etat du paiement",
+    "Produit", "Type d'origine", "Origine", "Partenaire de distribution", "Partenaire de distribution (ID)",
+    "Référence partenaire", "Evaluation client", "Langue", "Pays", "Code postal client", "Téléphone",
+    "Moteur de réservation", "Referrer", "Origin", "Commentaire client (BE seulement)", "Compte société",
+    "Utilisateur compte société", "Société", "Opt-in hôtel accepté", "Opt-in partenaires accepté",
+    "Motif de l'annulation", "Facturation de l'annulation", "Montant restant",
+]
+
+HOTELS = [("FOLKESTONE OPERA", 2258), ("HOTEL MADELEINE HAUSSMANN", 2259), ("HOTEL DE L'ARCADE", 2260),
+          ("HOTEL OPERA RICHEPANSE", 2261)]
+ROOM_TYPES = ["Double Classique", "Twin Classique", "Single", "Suite Junior", "Double Supérieure"]
+ORIGINS = [("Expedia", 1903), ("Booking.com", 1904), ("Site Web", 0), ("HRS", 1905), ("Agoda", 1906)]
+COMPETITORS = ["Folkestone Opéra", "Hôtel Madeleine Haussmann", "Hôtel De L'Arcade", "Hôtel Opéra Richepanse",
+               "Hôtel Vendôme Saint-Germain", "Hôtel Chavanel", "Hôtel Pas de Calais", "Hôtel Mansart"]
+RATE_COMMENTS = ["Pas de flex", "Épuisé", "1 pax seulement", "Min. 2 nuits"]
+WEEKDAYS_FR = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
+
+
+def _fr_amount(values):
+    return np.char.replace(np.char.mod("%.2f", values), ".", ",")
+
+
+def generate_dedge_frame(n_rows, seed=0, start=datetime.date(2026, 1, 1)):
+    """DataFrame brut tel que lu depuis un export D-Edge (toutes les valeurs en texte)."""
+    rng = np.random.default_rng(seed)
+    base = np.datetime64(start)
+
+    purchase = base + rng.integers(-180, 0, n_rows).astype("timedelta64[D]")
+    purchase_ts = purchase.astype("datetime64[m]") + rng.integers(0, 24 * 60, n_rows).astype("timedelta64[m]")
+    arrival = purchase + rng.integers(0, 365, n_rows).astype("timedelta64[D]")
+    nights = rng.integers(1, 8, n_rows)
+    departure = arrival + nights.astype("timedelta64[D]")
+    rooms = rng.choice([1, 1, 1, 1, 2, 3], n_rows)
+    amount = np.round(rng.uniform(90, 320, n_rows) * nights * rooms, 2)
+
+    cancelled = rng.random(n_rows) < 0.12
+    modified = rng.random(n_rows) < 0.3
+    hotel_idx = rng.integers(0, len(HOTELS), n_rows)
+    origin_idx = rng.integers(0, len(ORIGINS), n_rows)
+
+    def fmt_dt(arr):
+        return pd.to_datetime(arr).strftime("%d/%m/%Y %H:%M").to_numpy()
+
+    def fmt_d(arr):
+        return pd.to_datetime(arr).strftime("%d/%m/%Y").to_numpy()
+
+    purchase_str = fmt_dt(purchase_ts)
+    modif_str = np.where(modified, fmt_dt(purchase_ts + np.timedelta64(90, "m")), "")
+    cancel_str = np.where(cancelled, fmt_dt(purchase_ts + np.timedelta64(3, "D")), "")
+    amount_str = _fr_amount(amount)
+
+    letters = np.array(list("ABCDEFGHJKLMNPQRSTUVWXYZ"))
+    refs = ["".join(r) for r in letters[rng.integers(0, len(letters), (n_rows, 6))]]
+
+    data = {c: np.full(n_rows, "", dtype=object) for c in DEDGE_COLUMNS}
+    data.update({
+        "Etat": np.where(cancelled, "Annulée", "Validée"),
+        "Référence": refs,
+        "Date d'achat": purchase_str,
+        "Dernière modification": modif_str,
+        "Date d'annulation": cancel_str,
+        "Hôtel": np.array([h[0] for h in HOTELS])[hotel_idx],
+        "Hôtel (ID)": np.array([h[1] for h in HOTELS])[hotel_idx],
+        "Prénom": rng.choice(["YUNJIA", "LAURA", "MARC", "SOPHIE", "JEAN"], n_rows),
+        "Nom": rng.choice(["HONG", "BALL", "MARTIN", "DUPONT", "DURAND"], n_rows),
+        "E-Mail": np.char.add(np.array(refs, dtype=str), "@m.expediapartnercentral.com"),
+        "Date d'arrivée": fmt_d(arrival),
+        "Date de départ": fmt_d(departure),
+        "Nuits": nights,
+        "Chambres": rooms,
+        "Adultes": rng.integers(1, 4, n_rows),
+        "Enfants": rng.integers(0, 2, n_rows),
+        "Bébés": 0,
+        "Type de chambre": rng.choice(ROOM_TYPES, n_rows),
+        "Tarif": rng.choice(["PKG-EXP-BB-FLEX-2P", "BAR-RO-FLEX", "NANR-BB"], n_rows),
+        "Tarifs multiples": 0,
+        "Demande de réservation": 0,
+        "Montant total": amount_str,
+        "Montant du panier": amount_str,
+        "Garantie": amount_str,
+        "Monnaie": "EUR",
+        "Mode de paiement": "Transaction",
+        "Assurance annulation": 0,
+        "Etat du paiement": "Payé en ligne avec succès.",
+        "Produit": "Channel Manager",
+        "Type d'origine": "Distribution en ligne",
+        "Origine": np.array([o[0] for o in ORIGINS])[origin_idx],
+        "Partenaire de distribution": np.array([o[0] for o in ORIGINS])[origin_idx],
+        "Partenaire de distribution (ID)": np.array([o[1] for o in ORIGINS])[origin_idx],
+        "Référence partenaire": rng.integers(2_000_000_000, 2_999_999_999, n_rows),
+        "Langue": rng.choice(["fr", "en", "de", "es"], n_rows),
+    })
+    return pd.DataFrame(data, columns=DEDGE_COLUMNS)
+
+
+def write_dedge_csv(path, n_rows, seed=0):
+    df = generate_dedge_frame(n_rows, seed=seed)
+    df.to_csv(path, sep=";", index=False, encoding="utf-8-sig")
+    return path
+
+
+def generate_lighthouse_frame(n_days, n_competitors=len(COMPETITORS), seed=0, start=datetime.date(2026, 1, 15)):
+    """Feuille "Tarifs" Lighthouse: 4 lignes de métadonnées, en-tête ligne 5."""
+    rng = np.random.default_rng(seed)
+    competitors = [COMPETITORS[i % len(COMPETITORS)] + ("" if i < len(COMPETITORS) else f" {i}")
+                   for i in range(n_competitors)]
+    days = pd.date_range(start, periods=n_days, freq="D")
+    labels = [f"{WEEKDAYS_FR[d.weekday()]} {d.strftime('%d/%m/%Y')}" for d in days]
+    demand = [f"{p}%" for p in rng.integers(15, 95, n_days)]
+
+    rates = rng.integers(120, 480, (n_days, n_competitors)).astype(object)
+    is_comment = rng.random((n_days, n_competitors)) < 0.08
+    rates[is_comment] = np.array(RATE_COMMENTS, dtype=object)[rng.integers(0, len(RATE_COMMENTS), is_comment.sum())]
+
+    header = ["Jour Date", "Demande du marché"] + competitors
+    rows = [["Metadata"] + [""] * (len(header) - 1)] + [[""] * len(header)] * 3 + [header]
+    body = np.column_stack([np.array(labels, dtype=object), np.array(demand, dtype=object), rates])
+    return pd.DataFrame(rows + body.tolist())
+
+
+def write_lighthouse_xlsx(path, n_days, n_competitors=len(COMPETITORS), seed=0):
+    generate_lighthouse_frame(n_days, n_competitors, seed=seed).to_excel(path, index=False, header=False)
+    return path
+
+
+def build_planning_grid(n_rooms, n_days, fill_rate=0.7, seed=0):
+    """
+    Same layout as mock_planning.xlsx (header row 2, cols A-C metadata, D+ dates),
+    scaled to n_rooms x n_days.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2026, 1, 1)
+    dates = [start + datetime.timedelta(days=i) for i in range(n_days)]
+
+    prices = rng.integers(80, 400, size=(n_rooms, n_days)).astype(object)
+    statuses = np.array(["Fermé", "Complet", "Option"], dtype=object)
+    is_status = rng.random((n_rooms, n_days)) < 0.05
+    prices[is_status] = statuses[rng.integers(0, len(statuses), is_status.sum())]
+    is_empty = rng.random((n_rooms, n_days)) > fill_rate
+    prices[is_empty] = None
+
+    data = {
+        "Room": [str(100 + i) for i in range(n_rooms)],
+        "Type": rng.choice(["SGL", "DBL", "TWN", "SUI"], size=n_rooms),
+        "Status": rng.choice(["Open", "Closed"], size=n_rooms),
+    }
+    df = pd.DataFrame(data)
+    df_dates = pd.DataFrame(prices, columns=dates)
+    return pd.concat([df, df_dates], axis=1)
+
+
+def write_planning_xlsx(df, path):
+    header = pd.DataFrame([["Export Planning"] + [""] * (len(df.columns) - 1), df.columns.tolist()])
+    body = pd.DataFrame(df.to_numpy())
+    pd.concat([header, body]).to_excel(path, index=False, header=False)
+    return path
@@ -0,0 +1,59 @@
+"""
+Benchmark: cold import time of the web app (what each gunicorn worker pays without --preload).
+
+Runs `python -X importtime -c "import app"` in fresh interpreters, reports the wall time
+(best of --repeat) and the slowest packages (self import time summed per root package).
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module asgi_app --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module):
+    """(wall seconds, {package: µs}) pour un import à froid (temps propre cumulé par package racine)."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:"):].split("|")
+        # Temps propre : pas de double comptage des imports imbriqués
+        packages[name.strip().split(".")[0]] += int(self_us)
+    return wall, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_once(args.module) for _ in range(args.repeat)]
+    wall, packages = min(runs, key=lambda r: r[0])
+    interpreter, _ = import_once("sys")
+    print(f"import {args.module}: {wall * 1000:.0f} ms wall (best of {args.repeat}), "
+          f"interpreter startup {interpreter * 1000:.0f} ms")
+    print(f"{'package':<24}{'ms':>10}")
+    for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<24}{us / 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
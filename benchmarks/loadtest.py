@@ -0,0 +1,331 @@
+"""
+Test de charge: le serveur de production (gunicorn -c gunicorn.conf.py app:app) face à un stub Supabase local.
+
+Lance benchmarks/stub_server.py et gunicorn en sous-processus, puis envoie le trafic de
+N clients concurrents pour chaque scénario et chaque niveau de concurrence:
+
+    browse        GET /tables
+    csv_import    POST /upload (D-Edge CSV) -> POST /filter
+    csv_storage   csv_import avec save_storage: le CSV filtré part vers Storage en TUS pendant
+                  l'insertion des lignes (échec du parcours si /filter ne renvoie pas de storage_url)
+    excel_import  POST /upload_excel (Lighthouse) -> /preview_excel -> /process_excel
+    mixed         60% browse, 25% csv_import, 15% excel_import
+
+Rapport par scénario: parcours terminés, débit (parcours/s), latence p50/p99 par endpoint,
+erreurs et mémoire des workers gunicorn (pic RSS du plus gros worker et de l'ensemble,
+relevé dans /proc). Augmenter --concurrency montre où la latence décroche pour un
+réglage --workers / --threads donné.
+
+Utilisation:
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --workers 4 --concurrency 1,4,8,16 --duration 30
+    python benchmarks/loadtest.py --scenarios mixed --rows 20000 --json benchmarks/results/loadtest.json
+    python benchmarks/loadtest.py --scenarios csv_import,csv_storage --storage-bandwidth 2000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+import generators
+
+SCENARIOS = ['browse', 'csv_import', 'csv_storage', 'excel_import', 'mixed']
+MIX = [('browse', 0.60), ('csv_import', 0.25), ('excel_import', 0.15)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_http(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} injoignable après {timeout}s")
+
+
+# --- Mémoire des workers ---
+
+def _children(pid):
+    """Enfants directs de pid (workers gunicorn du master)."""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                pids.append(int(entry))
+        except (OSError, IndexError):
+            continue
+    return pids
+
+
+def _rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class MemorySampler(threading.Thread):
+    """Pic RSS des workers gunicorn (plus gros worker, somme des workers) pendant l'exécution."""
+
+    def __init__(self, master_pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.peak_worker = 0.0
+        self.peak_total = 0.0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            rss = [_rss_mb(pid) for pid in _children(self.master_pid)]
+            if rss:
+                self.peak_worker = max(self.peak_worker, max(rss))
+                self.peak_total = max(self.peak_total, sum(rss))
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+# --- Trafic ---
+
+class Client:
+    def __init__(self, base_url, fixtures, results):
+        self.base_url = base_url
+        self.fixtures = fixtures
+        self.results = results
+        self.http = requests.Session()
+
+    def call(self, endpoint, method, path, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=300, **kwargs)
+            ok = response.status_code < 400
+            body = response.json() if ok else None
+        except (requests.RequestException, ValueError):
+            ok, body = False, None
+        self.results.record(endpoint, time.perf_counter() - t0, ok)
+        if not ok:
+            raise RuntimeError(endpoint)
+        return body
+
+    def browse(self):
+        self.call('/tables', 'GET', '/tables')
+
+    def csv_import(self, save_storage=False):
+        with open(self.fixtures['csv'], 'rb') as f:
+            upload = self.call('/upload', 'POST', '/upload', files={'file': ('export.csv', f, 'text/csv')})
+        return self.call('/filter', 'POST', '/filter', json={
+            'filename': upload['filename'], 'columns': upload['columns'], 'mode': 'create',
+            'record_snapshot': True, 'save_storage': save_storage,
+        })
+
+    def csv_storage(self):
+        result = self.csv_import(save_storage=True)
+        # Les erreurs Storage ne font pas échouer /filter (journalisées côté serveur): storage_url vide = échec
+        ok = bool(result.get('storage_url'))
+        self.results.record('storage_url', 0.0, ok)
+        if not ok:
+            raise RuntimeError('storage_url')
+
+    def excel_import(self):
+        with open(self.fixtures['xlsx'], 'rb') as f:
+            upload = self.call('/upload_excel', 'POST', '/upload_excel', files={'file': ('tarifs.xlsx', f)})
+        sheet = upload['sheets'][0]
+        preview = self.call('/preview_excel', 'POST', '/preview_excel', json={
+            'filename': upload['filename'], 'sheet_name': sheet, 'is_lighthouse': True})
+        self.call('/process_excel', 'POST', '/process_excel', json={
+            'filename': upload['filename'], 'sheet_name': sheet, 'is_lighthouse': True, 'mode': 'create',
+            'table_name': f"lt_{uuid.uuid4().hex[:8]}", 'columns': preview['columns'], 'hotel': 'LOADTEST',
+        })
+
+    def run(self, scenario, deadline, rng):
+        while time.time() < deadline:
+            flow = scenario
+            if scenario == 'mixed':
+                flow = rng.choices([name for name, _ in MIX], weights=[w for _, w in MIX])[0]
+            t0 = time.perf_counter()
+            try:
+                getattr(self, flow)()
+                self.results.record(f"flow:{flow}", time.perf_counter() - t0, True)
+            except RuntimeError:
+                self.results.record(f"flow:{flow}", time.perf_counter() - t0, False)
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, elapsed, ok):
+        with self.lock:
+            if ok:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        out = {}
+        for endpoint in sorted(set(self.latencies) | set(self.errors)):
+            lat = np.array(self.latencies[endpoint]) * 1000
+            out[endpoint] = {
+                'count': int(lat.size),
+                'errors': self.errors[endpoint],
+                'per_second': round(lat.size / elapsed, 2),
+                'p50_ms': round(float(np.percentile(lat, 50)), 1) if lat.size else None,
+                'p99_ms': round(float(np.percentile(lat, 99)), 1) if lat.size else None,
+            }
+        return out
+
+
+def run_scenario(base_url, master_pid, fixtures, scenario, concurrency, duration, seed):
+    results = Results()
+    sampler = MemorySampler(master_pid)
+    sampler.start()
+    deadline = time.time() + duration
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=Client(base_url, fixtures, results).run,
+                                args=(scenario, deadline, random.Random(seed + i))) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    sampler.stop()
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 2),
+        'endpoints': results.summary(elapsed),
+        'worker_rss_peak_mb': round(sampler.peak_worker, 1),
+        'workers_rss_total_peak_mb': round(sampler.peak_total, 1),
+    }
+
+
+def print_report(report):
+    flows = {k: v for k, v in report['endpoints'].items() if k.startswith('flow:')}
+    done = sum(v['count'] for v in flows.values())
+    errors = sum(v['errors'] for v in report['endpoints'].values())
+    print(f"\n{report['scenario']} x{report['concurrency']}: {done} flows in {report['seconds']} s "
+          f"({done / report['seconds']:.2f}/s), {errors} errors, worker RSS peak "
+          f"{report['worker_rss_peak_mb']} MB (all workers {report['workers_rss_total_peak_mb']} MB)")
+    print(f"  {'endpoint':<22}{'count':>7}{'err':>5}{'/s':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for endpoint, s in report['endpoints'].items():
+        p50 = f"{s['p50_ms']:.0f}" if s['p50_ms'] is not None else '-'
+        p99 = f"{s['p99_ms']:.0f}" if s['p99_ms'] is not None else '-'
+        print(f"  {endpoint:<22}{s['count']:>7}{s['errors']:>5}{s['per_second']:>8.2f}{p50:>10}{p99:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--no-preload", action="store_true")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,8", help="Nombres de clients, séparés par des virgules")
+    parser.add_argument("--duration", type=float, default=20, help="Secondes par scénario et par niveau de concurrence")
+    parser.add_argument("--rows", type=int, default=2000, help="Lignes du CSV D-Edge envoyé")
+    parser.add_argument("--days", type=int, default=90, help="Dates de séjour de la feuille Lighthouse envoyée")
+    parser.add_argument("--latency", type=float, default=0.005, help="Latence du stub par requête (s)")
+    parser.add_argument("--storage-bandwidth", type=int,
+                        help="Débit Storage simulé par le stub (octets/s, défaut illimité)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Écrit les rapports dans ce fichier")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"scénario(s) inconnu(s): {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    work = tempfile.mkdtemp(prefix="rms_loadtest_")
+    fixtures = {
+        'csv': generators.write_dedge_csv(os.path.join(work, 'export.csv'), args.rows, seed=args.seed),
+        'xlsx': generators.write_lighthouse_xlsx(os.path.join(work, 'tarifs.xlsx'), args.days, seed=args.seed),
+    }
+    stub_port, app_port = free_port(), free_port()
+    stub_url, base_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+    env = dict(os.environ,
+               SUPABASE_URL=stub_url, SUPABASE_KEY="loadtest",
+               UPLOAD_FOLDER=os.path.join(work, 'uploads'), OUTPUT_FOLDER=os.path.join(work, 'outputs'),
+               SNAPSHOT_FOLDER=os.path.join(work, 'snapshots'), RATES_FOLDER=os.path.join(work, 'rates'),
+               IMPORT_FOLDER=os.path.join(work, 'imports'),
+               GUNICORN_BIND=f"127.0.0.1:{app_port}", WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), GUNICORN_PRELOAD='0' if args.no_preload else '1',
+               GUNICORN_MAX_REQUESTS='0')
+    for key in ('UPLOAD_FOLDER', 'OUTPUT_FOLDER'):
+        os.makedirs(env[key], exist_ok=True)
+
+    stub_cmd = [sys.executable, os.path.join(BENCH_DIR, 'stub_server.py'), '--port', str(stub_port),
+                '--no-keep-rows', '--no-keep-objects', '--latency', str(args.latency)]
+    if args.storage_bandwidth:
+        stub_cmd += ['--storage-bandwidth', str(args.storage_bandwidth)]
+    stub = subprocess.Popen(stub_cmd, stdout=subprocess.DEVNULL, env=env)
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    reports = []
+    try:
+        wait_http(stub_url + "/rest/v1/")
+        wait_http(base_url + "/")
+        print(f"gunicorn: {args.workers} workers x {args.threads} threads "
+              f"(preload={'no' if args.no_preload else 'yes'}), stub latency {args.latency * 1000:.0f} ms, "
+              f"CSV {args.rows:,} rows, Lighthouse {args.days} days, {args.duration:.0f} s per run"
+              + (f", Storage {args.storage_bandwidth / 1e6:.1f} MB/s" if args.storage_bandwidth else ""))
+        for scenario in scenarios:
+            for concurrency in levels:
+                report = run_scenario(base_url, server.pid, fixtures, scenario, concurrency, args.duration, args.seed)
+                print_report(report)
+                reports.append(report)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        stub.terminate()
+        for proc in (server, stub):
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'workers': args.workers, 'threads': args.threads, 'rows': args.rows,
+                       'runs': reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: passage large -> long du Planning (parse_planning_format).
+
+Compare la transformation actuelle en une passe à l'implémentation précédente
+(melt + pd.to_datetime ligne à ligne + clean_generic_numeric_cols) sur une
+version agrandie de mock_planning.xlsx.
+
+Utilisation:
+    python benchmarks/planning_benchmark.py --rooms 300 --days 1095
+    python benchmarks/planning_benchmark.py --rooms 50 --days 365 --xlsx
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import excel_handler
+from generators import build_planning_grid, write_planning_xlsx
+
+
+def legacy_parse_planning(df):
+    """Implémentation d'avant la transformation en une passe (gardée pour comparaison)."""
+    fixed_cols = df.columns[0:3].tolist()
+    date_cols = df.columns[3:].tolist()
+    df_melted = df.melt(id_vars=fixed_cols, value_vars=date_cols, var_name='Date', value_name='Valeur')
+    df_melted['Date'] = pd.to_datetime(df_melted['Date'], errors='coerce')
+    df_melted = df_melted.dropna(subset=['Date'])
+    return excel_handler.clean_generic_numeric_cols(df_melted, exclude=["Date"], apply_x_rule=False)
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=300)
+    parser.add_argument("--days", type=int, default=3 * 365)
+    parser.add_argument("--fill-rate", type=float, default=0.7)
+    parser.add_argument("--xlsx", action="store_true", help="Passe par un vrai fichier .xlsx (read_excel inclus)")
+    args = parser.parse_args()
+
+    df = build_planning_grid(args.rooms, args.days, args.fill_rate)
+    print(f"Grid: {args.rooms} rooms x {args.days} days ({args.rooms * args.days:,} cells)")
+
+    if args.xlsx:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, "bench_planning.xlsx")
+            write_planning_xlsx(df, path)
+            df = pd.read_excel(path, header=1, engine='openpyxl')
+
+    legacy, t_legacy, m_legacy = measure(legacy_parse_planning, df)
+    current, t_current, m_current = measure(excel_handler.parse_planning_format, df)
+
+    # Contrôle: même contenu non vide
+    legacy_sparse = legacy[legacy['Valeur'].notna()].reset_index(drop=True)
+    assert len(legacy_sparse) == len(current), (len(legacy_sparse), len(current))
+    assert legacy_sparse['Valeur'].tolist() == current['Valeur'].tolist()
+
+    print(f"{'impl':<10} {'rows':>12} {'time (s)':>10} {'peak (MB)':>10}")
+    print(f"{'legacy':<10} {len(legacy):>12,} {t_legacy:>10.3f} {m_legacy / 1e6:>10.1f}")
+    print(f"{'current':<10} {len(current):>12,} {t_current:>10.3f} {m_current / 1e6:>10.1f}")
+    print(f"Speedup x{t_legacy / t_current:.1f}, memory x{m_legacy / max(m_current, 1):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: price recommendations (pricing.recommend) for N hotels x D stay dates.
+
+Builds synthetic OTB captures (latest + pickup reference, via SnapshotStore.record) and one
+Lighthouse rate shop per hotel (RateStore.record) in a temporary folder, then times the
+serial path against the process pool.
+
+Usage:
+    python benchmarks/recommendation_benchmark.py --hotels 50 --days 365
+    python benchmarks/recommendation_benchmark.py --hotels 200 --days 365 --workers 8
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clients
+import pricing
+from otb_snapshots import SnapshotStore
+from rate_matrix import RateStore
+from generators import COMPETITORS
+
+
+def bookings(hotels, n_per_hotel, start, n_days, rng):
+    """Réservations minimalistes (noms de colonnes nettoyés, comme après import D-Edge)."""
+    n = len(hotels) * n_per_hotel
+    arrival = np.datetime64(start) + rng.integers(0, n_days, n).astype('timedelta64[D]')
+    nights = rng.integers(1, 5, n)
+    return pd.DataFrame({
+        'etat': np.where(rng.random(n) < 0.1, 'Annulée', 'Confirmée'),
+        'hotel': np.repeat(np.array(hotels, dtype=object), n_per_hotel),
+        'date_d_arrivee': pd.to_datetime(arrival).strftime('%d/%m/%Y'),
+        'date_de_depart': pd.to_datetime(arrival + nights.astype('timedelta64[D]')).strftime('%d/%m/%Y'),
+        'chambres': rng.choice([1, 1, 1, 2], n),
+        'montant_total': np.round(rng.uniform(90, 320, n) * nights, 2),
+    })
+
+
+def build_fixture(folder, n_hotels, n_days, n_per_hotel, start, seed=0):
+    rng = np.random.default_rng(seed)
+    hotels = [f"HOTEL {i:03d}" for i in range(n_hotels)]
+    snapshots = SnapshotStore(os.path.join(folder, 'snapshots'))
+    df = bookings(hotels, n_per_hotel, start, n_days, rng)
+    # Capture de référence (J-7) : 85% des réservations actuelles
+    snapshots.record(df.sample(frac=0.85, random_state=seed), start - datetime.timedelta(days=7))
+    snapshots.record(df, start)
+
+    rates = RateStore(os.path.join(folder, 'rates'))
+    stay_dates = pd.date_range(start, periods=n_days)
+    for i, h in enumerate(hotels):
+        base = rng.uniform(110, 260, (n_days, 1)) * rng.uniform(0.8, 1.25, (1, len(COMPETITORS)))
+        status = np.where(rng.random(base.shape) < 0.08, 2, 0).astype(np.int8)
+        values = np.where(status == 0, np.round(base), np.nan).astype(np.float32)
+        rates.record(h, stay_dates, [h] + COMPETITORS[1:], values, status, shop_date=start)
+    return snapshots, rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hotels", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--bookings-per-hotel", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--chunk-size", type=int, default=8)
+    args = parser.parse_args()
+    clients.PROCESS_WORKERS = args.workers  # Taille du pool partagé, créé au premier recommend parallèle
+
+    start = datetime.date(2026, 1, 1)
+    with tempfile.TemporaryDirectory() as folder:
+        t0 = time.perf_counter()
+        snapshots, rates = build_fixture(folder, args.hotels, args.days, args.bookings_per_hotel, start)
+        print(f"Fixture: {args.hotels} hotels x {args.days} days, "
+              f"{args.hotels * args.bookings_per_hotel:,} bookings ({time.perf_counter() - t0:.1f}s)")
+
+        timings = {}
+        for label, workers in (("serial", 1), (f"pool ({args.workers} workers)", args.workers)):
+            t0 = time.perf_counter()
+            df = pricing.recommend(snapshots, start=start, n_days=args.days, as_of=start,
+                                   rates_folder=rates.folder, workers=workers, chunk_size=args.chunk_size)
+            timings[label] = time.perf_counter() - t0
+            print(f"  {label:<22} {timings[label] * 1000:8.1f} ms  ({len(df):,} recommendations)")
+
+        print(df.describe()[['occupancy', 'own_rate', 'compset_median', 'recommended_rate', 'change_pct']]
+              .round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Suite de benchmarks reproductible du pipeline d'import.
+
+Chaque étape est chronométrée (meilleur de --repeat) puis profilée en mémoire (pic tracemalloc)
+sur des données synthétiques (generators.py) à plusieurs échelles:
+
+    split_datetime_columns, format_all_dates, clean_generic_numeric_cols,
+    read_csv (D-Edge), read_smart_excel (Lighthouse, Planning),
+    build_records (payload JSON), insert_records (POST vers un stub HTTP local)
+
+Les résultats sont écrits en JSON. Une baseline enregistrée permet de détecter les régressions:
+
+    python benchmarks/run_benchmarks.py --scales 1k,10k --save-baseline default
+    python benchmarks/run_benchmarks.py --scales 1k,10k --compare default   # exit 1 si régression
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import csv_reader
+import excel_handler
+from supabase_rest import build_records, insert_records
+from utils import clean_column_name, split_datetime_columns, format_all_dates
+
+import generators
+from stub_server import StubSupabase
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def parse_scale(text):
+    text = text.strip().lower()
+    for suffix, mult in (("k", 1_000), ("m", 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * mult)
+    return int(text)
+
+
+def measure(func, repeat=3):
+    """Retourne (meilleur temps en s, pic mémoire en octets, résultat)."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - t0)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def build_stages(n_rows, workdir, stub, max_excel_rows):
+    """
+    Liste de (nom, callable). Les entrées de chaque étape sont préparées ici,
+    hors chronométrage.
+    """
+    stages = []
+
+    # --- D-Edge CSV ---
+    csv_path = generators.write_dedge_csv(os.path.join(workdir, f"dedge_{n_rows}.csv"), n_rows)
+    df_raw, _ = csv_reader.read_csv(csv_path)
+    stages.append(("read_csv", lambda: csv_reader.read_csv(csv_path)))
+    stages.append(("split_datetime_columns", lambda: split_datetime_columns(df_raw)))
+
+    df_split = split_datetime_columns(df_raw)
+    df_split.columns = [clean_column_name(c) for c in df_split.columns]
+    stages.append(("format_all_dates", lambda: format_all_dates(df_split)))
+
+    df_dates = format_all_dates(df_split)
+    stages.append(("build_records", lambda: build_records(df_dates)))
+
+    records = build_records(df_dates)
+    table = f"bench_{n_rows}"
+    stages.append(("insert_records", lambda: insert_records(stub.url, "bench-key", table, records, batch_size=500)))
+
+    # --- Excel (openpyxl est lent: échelle plafonnée) ---
+    n_excel = min(n_rows, max_excel_rows)
+    light_path = generators.write_lighthouse_xlsx(os.path.join(workdir, f"lighthouse_{n_excel}.xlsx"), n_excel)
+    df_light = pd.read_excel(light_path, header=4, engine='openpyxl').rename(columns={"Jour Date": "Date"})
+    stages.append(("clean_generic_numeric_cols", lambda: excel_handler.clean_generic_numeric_cols(
+        df_light, exclude=["Date", "Demande du marché"], apply_x_rule=True)))
+    stages.append(("read_smart_excel[lighthouse]", lambda: excel_handler.read_smart_excel(light_path, "Sheet1")))
+
+    n_days = 365
+    grid = generators.build_planning_grid(max(1, n_excel // n_days), n_days)
+    plan_path = generators.write_planning_xlsx(grid, os.path.join(workdir, f"planning_{n_excel}.xlsx"))
+    stages.append(("read_smart_excel[planning]", lambda: excel_handler.read_smart_excel(plan_path, "Sheet1")))
+
+    return stages
+
+
+def run(scales, repeat, max_excel_rows, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, StubSupabase(keep_rows=False) as stub:
+        for n_rows in scales:
+            print(f"\n=== Scale {n_rows:,} rows ===")
+            for name, func in build_stages(n_rows, workdir, stub, max_excel_rows):
+                if only and not any(o in name for o in only):
+                    continue
+                seconds, peak, _ = measure(func, repeat=repeat)
+                key = f"{name}@{n_rows}"
+                results[key] = {"stage": name, "rows": n_rows, "seconds": round(seconds, 6),
+                                "peak_mb": round(peak / 1e6, 3)}
+                print(f"{name:<32} {seconds:>10.4f} s {peak / 1e6:>10.1f} MB")
+    return results
+
+
+def environment():
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Liste des régressions (temps ou mémoire > baseline * tolerance)."""
+    regressions = []
+    for key, res in results.items():
+        ref = baseline["results"].get(key)
+        if not ref:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            # Bruit de mesure: on ignore les valeurs minuscules
+            floor = 0.005 if metric == "seconds" else 1.0
+            if res[metric] > max(ref[metric], floor) * tolerance:
+                regressions.append(f"{key} {metric}: {ref[metric]} -> {res[metric]} (x{res[metric] / max(ref[metric], 1e-9):.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1k,10k,100k", help="Ex: 1k,10k,100k,1M")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-excel-rows", default="100k", help="Plafond pour les étapes xlsx (openpyxl)")
+    parser.add_argument("--only", default="", help="Filtre sur le nom des étapes (séparées par des virgules)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    scales = [parse_scale(s) for s in args.scales.split(",") if s.strip()]
+    only = [o.strip() for o in args.only.split(",") if o.strip()]
+    results = run(scales, args.repeat, parse_scale(args.max_excel_rows), only)
+    report = {"environment": environment(), "results": results}
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nRésultats: {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline enregistrée: {path}")
+
+    if args.compare:
+        path = os.path.join(BASELINE_DIR, f"{args.compare}.json")
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Régressions détectées:")
+            for r in regressions:
+                print(f"  - {r}")
+            sys.exit(1)
+        print(f"\n✅ Aucune régression vs baseline '{args.compare}' (tolérance x{args.tolerance})")
+
+
+if __name__ == "__main__":
+    main()
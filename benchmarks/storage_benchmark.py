@@ -0,0 +1,86 @@
+"""
+Benchmark: /filter export archiving (save_storage) cost on import latency.
+
+Against the local stub (per-request latency, simulated Storage bandwidth), times write CSV + table insert:
+    - without archiving,
+    - legacy: full-file Storage upload after the CSV is written, before the inserts,
+    - streamed: storage_upload.StreamingUpload (TUS chunks sent while the CSV is written
+      and during the inserts), joined before responding.
+The uploaded object is checked byte for byte against the local file.
+
+Usage:
+    python benchmarks/storage_benchmark.py --rows 200000
+    python benchmarks/storage_benchmark.py --rows 500000 --latency 0.02 --chunk-mb 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline
+from generators import generate_dedge_frame
+from storage_upload import StreamingUpload, TusUpload
+from stub_server import StubSupabase
+from supabase_rest import insert_records
+
+CSV_OPTIONS = dict(index=False, sep=';', encoding='utf-8', na_rep='')
+
+
+def run(stub, df, records, path, variant, chunk_size):
+    session = requests.Session()
+    name = os.path.basename(path)
+    t0 = time.perf_counter()
+    upload = None
+    if variant == 'streamed':
+        tus = TusUpload(stub.url, 'key', 'exports', f"exports/{name}", session=requests.Session())
+        upload = StreamingUpload(tus, path, chunk_size=chunk_size).start()
+        upload.write_csv(df, **CSV_OPTIONS)
+    else:
+        df.to_csv(path, **CSV_OPTIONS)
+    if variant == 'legacy':
+        with open(path, 'rb') as f:
+            response = session.post(f"{stub.url}/storage/v1/object/exports/exports/{name}", data=f,
+                                    headers={'Content-Type': 'text/csv'})
+        response.raise_for_status()
+    written = time.perf_counter() - t0
+    insert_records(stub.url, 'key', f"bench_{variant}", records, batch_size=500, session=session)
+    if upload:
+        upload.result()
+    elapsed = time.perf_counter() - t0
+
+    if variant != 'none':
+        with open(path, 'rb') as f:
+            assert stub.state.objects[f"exports/exports/{name}"] == f.read(), "uploaded object differs"
+    return written, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--latency", type=float, default=0.01, help="Stub latency per request (s)")
+    parser.add_argument("--chunk-mb", type=float, default=6)
+    parser.add_argument("--bandwidth-mb", type=float, default=20, help="Simulated Storage upload MB/s")
+    args = parser.parse_args()
+
+    df = generate_dedge_frame(args.rows)
+    records = pipeline.build_csv_records(df)
+    chunk_size = int(args.chunk_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as folder, StubSupabase(keep_rows=False, latency=args.latency) as stub:
+        stub.state.storage_bandwidth = args.bandwidth_mb * 1024 ** 2
+        print(f"{args.rows:,} rows, stub latency {args.latency * 1000:.0f} ms, "
+              f"Storage {args.bandwidth_mb} MB/s, chunks {args.chunk_mb} MB")
+        baseline = None
+        for variant in ('none', 'legacy', 'streamed'):
+            path = os.path.join(folder, f"filtered_{variant}.csv")
+            written, elapsed = run(stub, df, records, path, variant, chunk_size)
+            baseline = baseline or elapsed
+            print(f"  {variant:<10} csv+upload {written:6.2f} s  total {elapsed:6.2f} s  "
+                  f"(+{(elapsed - baseline) * 1000:6.0f} ms)  {os.path.getsize(path) / 1024 ** 2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
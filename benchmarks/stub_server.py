@@ -0,0 +1,499 @@
+"""
+Stand-in local pour Supabase (PostgREST + Storage), utilisé par les benchmarks.
+
+Couvre ce que l'app appelle:
+- POST /rest/v1/<table>               (insertions par lots, ?on_conflict=<col>[,<col>] + ignore-duplicates
+                                       ou merge-duplicates (upsert) ; 409 si une ligne viole une clé
+                                       déclarée, 500 si un upsert touche deux fois la même clé, comme PostgreSQL)
+- GET  /rest/v1/<table>               (lecture, filtres eq/gt/is.null, or=(...) / and(...),
+                                       order=a.asc,b.asc + limit/offset)
+- POST /rest/v1/rpc/exec_sql          (seuls DROP TABLE, les clés PRIMARY KEY / UNIQUE,
+                                       DELETE FROM <table> WHERE <col> IN ('...') et la suppression
+                                       des doublons avant une clé (DELETE ... USING ... ctid) sont suivis)
+- POST /rest/v1/rpc/get_public_tables
+- POST /rest/v1/rpc/get_table_columns
+- POST /rest/v1/rpc/get_table_keys
+- POST/PUT /storage/v1/object/<bucket>/<path>
+- POST /storage/v1/upload/resumable, HEAD/PATCH .../<id>   (TUS, Upload-Defer-Length)
+
+Usage autonome:
+    python benchmarks/stub_server.py --port 54321
+"""
+import argparse
+import base64
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class StubConflict(Exception):
+    """Ligne en double sur une clé déclarée (PostgreSQL : 23505, PostgREST : 409)."""
+
+
+class StubCardinality(Exception):
+    """Upsert qui modifierait deux fois la même ligne dans un lot (PostgreSQL : 21000)."""
+
+
+_DROP = re.compile(r"DROP TABLE IF EXISTS (\w+)", re.I)
+_CREATE = re.compile(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+) \((.*?)\)(?: PARTITION BY [^;]*)?;", re.I | re.S)
+_TABLE_UNIQUE = re.compile(r"\bUNIQUE \(([^)]*)\)", re.I)
+_PRIMARY = re.compile(r"ALTER TABLE (\w+) ADD PRIMARY KEY \(([^)]*)\)", re.I)
+_UNIQUE_INDEX = re.compile(r"CREATE UNIQUE INDEX (?:IF NOT EXISTS )?\w+ ON (\w+) \(([^)]*)\)", re.I)
+_DEDUPE = re.compile(r"DELETE FROM (\w+) a USING \w+ b WHERE a\.ctid < b\.ctid AND ([^;]*);", re.I)
+_DEDUPE_COL = re.compile(r"a\.(\w+) = b\.")
+_DELETE_IN = re.compile(r"DELETE FROM (\w+) WHERE (\w+) IN \(((?:'(?:[^']|'')*'(?:, )?)*)\);", re.I)
+_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+
+
+def _columns(text):
+    return [c.strip() for c in text.split(",")]
+
+
+class StubState:
+    def __init__(self, keep_rows=True, latency=0.0, keep_objects=True):
+        self.lock = threading.Lock()
+        self.keep_rows = keep_rows
+        self.keep_objects = keep_objects  # False : objets Storage reçus puis oubliés (b"" ; tests de charge)
+        self.latency = latency
+        self.tables = {}        # table -> list of rows
+        self.row_counts = {}    # table -> int
+        self.objects = {}       # "bucket/path" -> bytes
+        self.sql = []
+        self.requests = 0
+        self.inserts = 0
+        self.fail_inserts = set()   # Numéros (1-based) des POST d'insertion à faire échouer (503)
+        self.lose_inserts = set()   # Numéros (1-based) des POST appliqués mais répondus en 500 (réponse perdue)
+        self.keys = {}              # (table, colonne on_conflict) -> valeurs déjà insérées
+        self.table_keys = {}        # table -> [(colonnes, primaire)] déclarées par exec_sql
+        self.uploads = {}           # id TUS -> {"key", "data", "offset", "length"}
+        self.patches = 0
+        self.fail_patches = set()   # Numéros (1-based) des PATCH TUS reçus mais répondus en 500 (réponse perdue)
+        self.storage_bandwidth = None  # Octets/s simulés pour les corps Storage (None = illimité)
+
+    def throttle(self, n_bytes):
+        if self.storage_bandwidth:
+            time.sleep(n_bytes / self.storage_bandwidth)
+
+    def _seen(self, table, key):
+        return self.keys.setdefault((table, key), set())
+
+    def insert(self, table, rows, on_conflict=None, merge=False):
+        """
+        on_conflict : lignes déjà présentes sur cette clé ignorées (ignore-duplicates)
+        ou mises à jour (merge : merge-duplicates, lignes gardées seulement avec keep_rows).
+        Lève StubConflict (rien n'est inséré) si une ligne viole une autre clé déclarée,
+        StubCardinality si un upsert contient deux fois la même clé.
+        """
+        with self.lock:
+            checks = [",".join(cols) for cols, _ in self.table_keys.get(table, []) if ",".join(cols) != on_conflict]
+            pending = {k: set() for k in checks + ([on_conflict] if on_conflict else [])}
+            fresh, updates = [], {}
+            for row in rows:
+                if on_conflict:
+                    key = tuple(row.get(c) for c in on_conflict.split(","))  # Clé composite : "reference,date_d_arrivee"
+                    if merge and None not in key and (key in pending[on_conflict] or key in updates):
+                        raise StubCardinality("ON CONFLICT DO UPDATE command cannot affect row a second time")
+                    if key in self._seen(table, on_conflict):
+                        if merge:
+                            updates[key] = row
+                        continue
+                    if key in pending[on_conflict]:
+                        continue
+                    pending[on_conflict].add(key)
+                for k in checks:
+                    key = tuple(row.get(c) for c in k.split(","))
+                    if None in key:
+                        continue  # NULL : jamais en conflit (PostgreSQL)
+                    if key in self._seen(table, k) or key in pending[k]:
+                        raise StubConflict(f"duplicate key value violates unique constraint ({k})")
+                    pending[k].add(key)
+                fresh.append(row)
+            for k, keys in pending.items():
+                self._seen(table, k).update(keys)
+            if updates and self.keep_rows:
+                cols = on_conflict.split(",")
+                for existing in self.tables.get(table, []):
+                    row = updates.get(tuple(existing.get(c) for c in cols))
+                    if row is not None:
+                        existing.update(row)
+            self.row_counts[table] = self.row_counts.get(table, 0) + len(fresh)
+            if self.keep_rows:
+                self.tables.setdefault(table, []).extend(fresh)
+            else:
+                self.tables.setdefault(table, [])
+
+    def declare_key(self, table, cols, primary=False):
+        """Clé ajoutée par DDL ; les lignes déjà présentes comptent pour les prochaines insertions."""
+        with self.lock:
+            keys = self.table_keys.setdefault(table, [])
+            if any(c == cols for c, _ in keys):
+                return
+            keys.insert(0 if primary else len(keys), (cols, primary))
+            seen = self._seen(table, ",".join(cols))
+            seen.update(tuple(r.get(c) for c in cols) for r in self.tables.get(table, []))
+
+    def drop_table(self, table):
+        with self.lock:
+            self.tables.pop(table, None)
+            self.row_counts.pop(table, None)
+            self.table_keys.pop(table, None)
+            for k in [k for k in self.keys if k[0] == table]:
+                del self.keys[k]
+
+    def dedupe(self, table, cols):
+        """Doublons sur cols supprimés, dernière ligne gardée (NULL : jamais égaux, comme en SQL)."""
+        with self.lock:
+            rows = self.tables.get(table, [])
+            last = {}
+            for i, r in enumerate(rows):
+                key = tuple(r.get(c) for c in cols)
+                if None not in key:
+                    last[key] = i
+            kept = [r for i, r in enumerate(rows)
+                    if None in (key := tuple(r.get(c) for c in cols)) or last[key] == i]
+            self.row_counts[table] = self.row_counts.get(table, 0) - (len(rows) - len(kept))
+            self.tables[table] = kept
+
+    def delete_rows(self, table, column, values):
+        """DELETE ... WHERE column IN (values), valeurs comparées en texte ; clés recalculées sur les lignes restantes."""
+        with self.lock:
+            rows = self.tables.get(table, [])
+            kept = [r for r in rows if r.get(column) is None or str(r.get(column)) not in values]
+            self.row_counts[table] = self.row_counts.get(table, 0) - (len(rows) - len(kept))
+            self.tables[table] = kept
+            for (t, k) in [k for k in self.keys if k[0] == table]:
+                self.keys[(t, k)] = {tuple(r.get(c) for c in k.split(",")) for r in kept}
+
+    def apply_sql(self, query):
+        """Ordres exec_sql suivis par le stub : DROP TABLE, doublons, clés (PRIMARY KEY, UNIQUE), DELETE ... IN."""
+        for table in _DROP.findall(query):
+            self.drop_table(table)
+        for table, condition in _DEDUPE.findall(query):
+            self.dedupe(table, _DEDUPE_COL.findall(condition))
+        for table, body in _CREATE.findall(query):
+            for cols in _TABLE_UNIQUE.findall(body):
+                self.declare_key(table, _columns(cols))
+        for table, cols in _PRIMARY.findall(query):
+            self.declare_key(table, _columns(cols), primary=True)
+        for table, cols in _UNIQUE_INDEX.findall(query):
+            self.declare_key(table, _columns(cols))
+        for table, column, literals in _DELETE_IN.findall(query):
+            self.delete_rows(table, column, {v.replace("''", "'") for v in _LITERAL.findall(literals)})
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send(self, status, payload=None, headers=None):
+            body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _before(self):
+            with state.lock:
+                state.requests += 1
+            if state.latency:
+                time.sleep(state.latency)
+
+        def do_POST(self):
+            self._before()
+            parsed = urlparse(self.path)
+            path = parsed.path
+            body = self._read_body()
+
+            if path.startswith("/rest/v1/rpc/"):
+                return self._rpc(path.rsplit("/", 1)[-1], json.loads(body or b"{}"))
+            if path.startswith("/rest/v1/"):
+                table = path[len("/rest/v1/"):]
+                rows = json.loads(body or b"[]")
+                if isinstance(rows, dict):
+                    rows = [rows]
+                with state.lock:
+                    state.inserts += 1
+                    fail = state.inserts in state.fail_inserts
+                    lost = state.inserts in state.lose_inserts
+                if fail:
+                    return self._send(503, {"message": "Injected failure"})
+                on_conflict = parse_qs(parsed.query).get("on_conflict", [None])[0]
+                prefer = self.headers.get("Prefer") or ""
+                merge = "merge-duplicates" in prefer
+                resolve = merge or "ignore-duplicates" in prefer
+                try:
+                    state.insert(table, rows, on_conflict if resolve else None, merge=merge)
+                except StubConflict as e:
+                    return self._send(409, {"code": "23505", "message": str(e)})
+                except StubCardinality as e:
+                    return self._send(500, {"code": "21000", "message": str(e)})
+                if lost:
+                    return self._send(500, {"message": "Injected lost response"})
+                return self._send(201)
+            if path == "/storage/v1/upload/resumable":
+                return self._tus_create()
+            if path.startswith("/storage/v1/object/"):
+                return self._store_object(path, body)
+            return self._send(404, {"message": f"Unknown route {path}"})
+
+        def do_HEAD(self):
+            self._before()
+            with state.lock:
+                upload = state.uploads.get(self.path.rsplit("/", 1)[-1])
+            if upload is None:
+                return self._send(404)
+            headers = {"Upload-Offset": str(upload["offset"]), "Tus-Resumable": "1.0.0",
+                       "Cache-Control": "no-store"}
+            if upload["length"] is not None:
+                headers["Upload-Length"] = str(upload["length"])
+            return self._send(200, headers=headers)
+
+        def do_PATCH(self):
+            self._before()
+            body = self._read_body()
+            state.throttle(len(body))
+            with state.lock:
+                upload = state.uploads.get(self.path.rsplit("/", 1)[-1])
+                if upload is None:
+                    return self._send(404)
+                if int(self.headers.get("Upload-Offset", -1)) != upload["offset"]:
+                    return self._send(409, {"message": "Upload-Offset mismatch"})
+                if state.keep_objects:
+                    upload["data"] += body
+                upload["offset"] += len(body)
+                if self.headers.get("Upload-Length"):
+                    upload["length"] = int(self.headers["Upload-Length"])
+                if upload["length"] is not None and upload["offset"] == upload["length"]:
+                    state.objects[upload["key"]] = bytes(upload["data"])
+                state.patches += 1
+                fail = state.patches in state.fail_patches
+                offset = upload["offset"]
+            if fail:
+                return self._send(500, {"message": "Injected failure"})
+            return self._send(204, headers={"Upload-Offset": str(offset), "Tus-Resumable": "1.0.0"})
+
+        def do_PUT(self):
+            self._before()
+            path = urlparse(self.path).path
+            body = self._read_body()
+            if path.startswith("/storage/v1/object/"):
+                return self._store_object(path, body)
+            return self._send(404, {"message": f"Unknown route {path}"})
+
+        def do_GET(self):
+            self._before()
+            parsed = urlparse(self.path)
+            if not parsed.path.startswith("/rest/v1/"):
+                return self._send(404, {"message": f"Unknown route {parsed.path}"})
+            table = parsed.path[len("/rest/v1/"):]
+            with state.lock:
+                rows = list(state.tables.get(table, []))
+            return self._send(200, _select(rows, parse_qs(parsed.query)))
+
+        def _rpc(self, name, params):
+            if name == "exec_sql":
+                with state.lock:
+                    state.sql.append(params.get("query", ""))
+                state.apply_sql(params.get("query", ""))
+                return self._send(200, None)
+            if name == "get_public_tables":
+                with state.lock:
+                    names = sorted(state.tables)
+                return self._send(200, [{"table_name": t} for t in names])
+            if name == "get_table_columns":
+                with state.lock:
+                    rows = state.tables.get(params.get("t_name"), [])
+                cols = list(rows[0].keys()) if rows else []
+                return self._send(200, [{"column_name": c, "data_type": "text"} for c in cols])
+            if name == "get_table_keys":
+                with state.lock:
+                    keys = list(state.table_keys.get(params.get("t_name"), []))
+                return self._send(200, [{"key_columns": cols, "is_primary": primary} for cols, primary in keys])
+            return self._send(404, {"message": f"Unknown function {name}"})
+
+        def _tus_create(self):
+            meta = {}
+            for item in (self.headers.get("Upload-Metadata") or "").split(","):
+                name, _, value = item.strip().partition(" ")
+                meta[name] = base64.b64decode(value).decode("utf-8") if value else ""
+            length = self.headers.get("Upload-Length")
+            with state.lock:
+                upload_id = f"u{len(state.uploads) + 1}"
+                state.uploads[upload_id] = {"key": f"{meta.get('bucketName')}/{meta.get('objectName')}",
+                                            "data": bytearray(), "offset": 0,
+                                            "length": int(length) if length else None}
+            return self._send(201, headers={"Location": f"/storage/v1/upload/resumable/{upload_id}",
+                                            "Tus-Resumable": "1.0.0"})
+
+        def _store_object(self, path, body):
+            key = unquote(path[len("/storage/v1/object/"):])
+            state.throttle(len(body))
+            with state.lock:
+                state.objects[key] = body if state.keep_objects else b""
+            return self._send(200, {"Key": key})
+
+    return Handler
+
+
+def _split_terms(text):
+    """Termes d'une liste PostgREST "a.eq.1,and(b.gt.2,c.is.null)" (virgules hors parenthèses et guillemets)."""
+    terms, depth, quoted, current = [], 0, False, ""
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and quoted:
+            current += text[i:i + 2]
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            terms.append(current)
+            current = ""
+            i += 1
+            continue
+        current += ch
+        i += 1
+    return terms + [current] if current else terms
+
+
+def _unquote(raw):
+    if raw.startswith('"') and raw.endswith('"'):
+        return raw[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return raw
+
+
+def _matches(row, col, condition):
+    """Condition PostgREST sur une colonne : eq/gt/gte, is.null, not.is.null."""
+    value = row.get(col)
+    if condition == "is.null":
+        return value is None
+    if condition == "not.is.null":
+        return value is not None
+    op, _, raw = condition.partition(".")
+    raw = _unquote(raw)
+    if op == "eq":
+        return value is not None and str(value) == raw
+    if op in ("gt", "gte"):
+        return value is not None and (_key(value) > _key(raw) if op == "gt" else _key(value) >= _key(raw))
+    raise ValueError(f"Opérateur non géré par le stub: {condition}")
+
+
+def _logic(row, op, terms):
+    """or(...) / and(...) : termes "col.op.valeur" ou groupes imbriqués."""
+    results = []
+    for term in _split_terms(terms):
+        if term.startswith(("and(", "or(")):
+            inner_op, _, rest = term.partition("(")
+            results.append(_logic(row, inner_op, rest[:-1]))
+        else:
+            col, _, condition = term.partition(".")
+            results.append(_matches(row, col, condition))
+    return any(results) if op == "or" else all(results)
+
+
+def _select(rows, query):
+    """
+    Sous-ensemble de la syntaxe PostgREST : eq/gt/gte/is.null/not.is.null, or=(...) avec and(...) imbriqués,
+    order=a.asc,b.asc (NULL en dernier, comme PostgreSQL), limit, offset, select.
+    """
+    reserved = {"select", "order", "limit", "offset"}
+    for col, values in query.items():
+        if col in reserved:
+            continue
+        if col in ("or", "and"):
+            rows = [r for r in rows if _logic(r, col, values[0][1:-1])]
+        else:
+            rows = [r for r in rows if _matches(r, col, values[0])]
+    if "order" in query:
+        cols = [term.split(".")[0] for term in query["order"][0].split(",")]
+        rows = sorted(rows, key=lambda r: [(r.get(c) is None, _key(r.get(c))) for c in cols])
+    if "offset" in query:
+        rows = rows[int(query["offset"][0]):]
+    if "limit" in query:
+        rows = rows[:int(query["limit"][0])]
+    if "select" in query and query["select"][0] != "*":
+        cols = query["select"][0].split(",")
+        rows = [{c: r.get(c) for c in cols} for r in rows]
+    return rows
+
+
+def _key(val):
+    try:
+        return (0, float(val), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(val))
+
+
+class StubSupabase:
+    """
+    Serveur stub dans un thread. S'utilise en context manager:
+
+        with StubSupabase() as stub:
+            insert_records(stub.url, "key", "t", rows)
+            stub.state.row_counts["t"]
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, keep_rows=True, latency=0.0, keep_objects=True):
+        self.state = StubState(keep_rows=keep_rows, latency=latency, keep_objects=keep_objects)
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self.state))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Supabase local")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--no-keep-rows", action="store_true", help="Compter les lignes sans les garder en mémoire")
+    parser.add_argument("--no-keep-objects", action="store_true",
+                        help="Recevoir les objets Storage sans les garder en mémoire")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence artificielle par requête (s)")
+    parser.add_argument("--storage-bandwidth", type=int, help="Débit Storage simulé (octets/s, défaut illimité)")
+    args = parser.parse_args()
+
+    stub = StubSupabase(args.host, args.port, keep_rows=not args.no_keep_rows, latency=args.latency,
+                        keep_objects=not args.no_keep_objects)
+    stub.state.storage_bandwidth = args.storage_bandwidth
+    print(f"Stub Supabase sur {stub.url} (SUPABASE_URL={stub.url})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,77 @@
+"""
+Benchmark: column-wise transforms (column_executor.map_columns) per execution mode.
+
+Runs the three import transforms on synthetic data:
+    format_all_dates     (D-Edge date columns)
+    ascii_text_column    (D-Edge text columns, /filter unidecode step)
+    clean_numeric_column (Lighthouse competitor columns, many stay dates)
+in serial, thread, process (pickled groups) and process (Arrow IPC in shared memory) modes,
+checks every mode returns the serial result, and reports the best time of --repeat.
+Parallel modes only pay off with several cores (see --workers, default = CPU count).
+
+Usage:
+    python benchmarks/transform_benchmark.py --rows 200000
+    python benchmarks/transform_benchmark.py --rows 500000 --competitors 60 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clients
+import column_executor
+import excel_handler
+import pipeline
+from generators import generate_dedge_frame, generate_lighthouse_frame
+from utils import clean_column_name, format_date_column
+
+MODES = [('serial', 'serial', False), ('thread', 'thread', False),
+         ('process', 'process', False), ('process+arrow', 'process', True)]
+
+
+def workloads(rows, competitors, days):
+    dedge = generate_dedge_frame(rows)
+    dedge.columns = [clean_column_name(c) for c in dedge.columns]
+    date_cols = [c for c in dedge.columns if 'date' in c and 'heure' not in c]
+    text_cols = [c for c in dedge.select_dtypes(include='object').columns if 'date' not in c and 'heure' not in c]
+
+    light = generate_lighthouse_frame(days, competitors)
+    light.columns = light.iloc[4]
+    light = light.iloc[5:].reset_index(drop=True).astype(str)
+    rate_cols = [c for c in light.columns if c not in ('Jour Date', 'Demande du marché')]
+    return [
+        ('format dates', dedge, format_date_column, date_cols, {}),
+        ('unidecode text', dedge, pipeline.ascii_text_column, text_cols, {}),
+        ('clean rates', light, excel_handler.clean_numeric_column, rate_cols, {'apply_x_rule': True}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--competitors", type=int, default=60)
+    parser.add_argument("--days", type=int, default=20_000, help="Lighthouse rows (stay dates x shops)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    clients.PROCESS_WORKERS = args.workers  # Taille du pool partagé, créé au premier map_columns
+    print(f"{os.cpu_count()} CPU(s), {args.workers} workers")
+    for name, df, func, columns, kwargs in workloads(args.rows, args.competitors, args.days):
+        print(f"{name}: {len(df):,} rows x {len(columns)} columns")
+        expected = None
+        for label, mode, shared in MODES:
+            column_executor.SHARED_MEMORY_MIN_CELLS = 0 if shared else float('inf')
+            best = float('inf')
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                result = column_executor.map_columns(df, func, columns, workers=args.workers, mode=mode, **kwargs)
+                best = min(best, time.perf_counter() - t0)
+            expected = result if expected is None else expected
+            same = "ok" if result.equals(expected) else "MISMATCH"
+            print(f"  {label:<16}{best:8.2f} s  {same}")
+
+
+if __name__ == "__main__":
+    main()
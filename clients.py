@@ -0,0 +1,97 @@
+"""
+Clients HTTP partagés, un jeu par process (compatible gunicorn --preload).
+
+Les modules lourds (supabase, requests) sont importés une seule fois dans le master ;
+les clients eux-mêmes (sockets, pools de connexions) sont créés à la première utilisation
+dans chaque worker, jamais hérités d'un fork : un pool de connexions partagé entre deux
+process mélangerait les réponses.
+
+Même règle pour le pool de process des calculs CPU (column_executor, pricing) : un seul par worker,
+créé à la première utilisation et réutilisé par toutes les requêtes (et tous les threads) du worker.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from supabase import create_client
+
+from config import SUPABASE_URL, SUPABASE_KEY
+
+HTTP_POOL_SIZE = int(os.getenv('RMS_HTTP_POOL_SIZE', 16))
+PROCESS_WORKERS = int(os.getenv('RMS_PROCESS_WORKERS', os.cpu_count() or 1))
+
+_lock = threading.Lock()
+_pid = None
+_session = None
+_supabase = None
+_process_pool = None
+
+
+def _check_pid():
+    """Oublie les clients créés par un autre process (parent avant fork)."""
+    global _pid, _session, _supabase, _process_pool
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _session = None
+        _supabase = None
+        _process_pool = None  # Pool du parent : ses process ne sont pas nos enfants, on ne l'arrête pas
+
+
+def reset():
+    """À appeler après un fork (gunicorn post_fork)."""
+    global _lock, _pid
+    _lock = threading.Lock()
+    _pid = None
+    _check_pid()
+
+
+def get_session():
+    """requests.Session avec pool de connexions keep-alive vers Supabase."""
+    global _session
+    with _lock:
+        _check_pid()
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def get_supabase():
+    """Client SDK Supabase (RPC, Storage), None si non configuré ou en erreur."""
+    global _supabase
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
+    with _lock:
+        _check_pid()
+        if _supabase is None:
+            try:
+                _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            except Exception as e:
+                print(f"Erreur init Supabase: {e}")
+                return None
+        return _supabase
+
+
+def get_process_pool():
+    """
+    ProcessPoolExecutor du worker, démarré au premier calcul parallèle.
+    Contexte forkserver : les process de calcul ne sont pas forkés depuis un worker multithread
+    (gunicorn threads, ASGI), ils partent d'un serveur de fork sans threads ni sockets.
+    """
+    global _process_pool
+    with _lock:
+        _check_pid()
+        # Un process de calcul tué (OOM) casse le pool pour de bon : on en recrée un
+        if _process_pool is None or getattr(_process_pool, '_broken', False):
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+        return _process_pool
+
+
+os.register_at_fork(after_in_child=reset)
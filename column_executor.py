@@ -0,0 +1,154 @@
+"""
+Transformations colonne par colonne en parallèle (nettoyage des valeurs, dates, texte).
+
+Les colonnes sont réparties en groupes, un groupe par worker :
+- serial  : petits fichiers (moins de PARALLEL_MIN_CELLS cellules) ou un seul CPU ;
+- process : pool de process du worker (clients.get_process_pool, créé une fois puis réutilisé) ;
+            les transformations sont du Python pur, le GIL empêche les threads d'en profiter.
+            Au-delà de SHARED_MEMORY_MIN_CELLS, chaque groupe circule en format Arrow IPC dans un fichier
+            de SHM_DIR (tmpfs) au lieu d'être picklé dans le pipe du pool : écrit une fois, lu par mmap.
+            Ce n'est pas du zéro-copie de bout en bout : to_pandas() copie les colonnes numériques et
+            recrée les objets Python des colonnes texte dans chaque process. Le gain est d'éviter le
+            pickle et le pipe, à l'aller comme au retour. Les groupes qu'Arrow ne sait pas typer
+            (types mélangés) repassent par pickle ;
+- thread  : ThreadPoolExecutor, pour des fonctions qui relâchent le GIL (RMS_TRANSFORM_MODE=thread).
+
+La fonction appliquée doit être définie au niveau d'un module (picklable) : func(series, **kwargs) -> série.
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+import clients
+
+TRANSFORM_MODE = os.getenv('RMS_TRANSFORM_MODE', 'auto')  # auto | serial | thread | process
+TRANSFORM_WORKERS = int(os.getenv('RMS_TRANSFORM_WORKERS', clients.PROCESS_WORKERS))
+PARALLEL_MIN_CELLS = int(os.getenv('RMS_TRANSFORM_PARALLEL_MIN_CELLS', 500_000))
+SHARED_MEMORY_MIN_CELLS = int(os.getenv('RMS_TRANSFORM_SHM_MIN_CELLS', 1_000_000))
+SHM_DIR = os.getenv('RMS_TRANSFORM_SHM_DIR', '/dev/shm')  # tmpfs : fichiers en RAM, mappés par les workers
+
+
+def choose_mode(n_rows, n_columns, workers=None, mode=None):
+    """Mode effectif pour une transformation de n_rows x n_columns."""
+    mode = mode or TRANSFORM_MODE
+    workers = workers or TRANSFORM_WORKERS
+    if mode == 'auto':
+        big = n_rows * n_columns >= PARALLEL_MIN_CELLS
+        mode = 'process' if big and workers > 1 and n_columns > 1 else 'serial'
+    return mode
+
+
+def _groups(columns, n_groups):
+    """Colonnes réparties en n_groups groupes (colonnes voisines = largeurs proches, round-robin)."""
+    return [g for g in (columns[i::n_groups] for i in range(n_groups)) if g]
+
+
+def _apply(frame, func, kwargs):
+    return pd.DataFrame({col: func(frame[col], **kwargs) for col in frame.columns}, index=frame.index)
+
+
+# --- Transport Arrow en mémoire partagée ---
+
+def _to_shared(frame):
+    """DataFrame -> fichier Arrow IPC dans SHM_DIR (écrit en une passe). Lève une erreur Arrow si une colonne est mal typée."""
+    table = pa.Table.from_pandas(frame.reset_index(drop=True), preserve_index=False)
+    path = os.path.join(SHM_DIR, f"rms_columns_{uuid.uuid4().hex}.arrow")
+    try:
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+    except BaseException:
+        _release(path)
+        raise
+    return path
+
+
+def _from_shared(path, index=None, unlink=False):
+    """Fichier Arrow IPC -> DataFrame (buffers Arrow lus par mmap, puis copie / objets Python via to_pandas)."""
+    try:
+        with pa.memory_map(path) as source:
+            frame = pa.ipc.open_stream(source).read_all().to_pandas()
+    finally:
+        if unlink:
+            _release(path)
+    if index is not None:
+        frame.index = index
+    return frame
+
+
+def _release(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _run_group(func, kwargs, payload):
+    """Tâche d'un worker : payload = ('shm', chemin) ou ('frame', DataFrame). Même forme en retour."""
+    if payload[0] == 'shm':
+        frame = _from_shared(payload[1])
+    else:
+        frame = payload[1]
+    result = _apply(frame, func, kwargs)
+    if payload[0] == 'shm':
+        try:
+            return 'shm', _to_shared(result)
+        except Exception:
+            pass  # Résultat non typable par Arrow : renvoyé picklé
+    return 'frame', result
+
+
+def _payload(frame, use_shared):
+    if use_shared:
+        try:
+            return 'shm', _to_shared(frame)
+        except Exception:
+            pass  # Types mélangés (ex. tarifs et commentaires dans une colonne Lighthouse)
+    return 'frame', frame
+
+
+def map_columns(df, func, columns=None, workers=None, mode=None, **kwargs):
+    """
+    Copie de df où chaque colonne de `columns` (toutes par défaut) est remplacée par func(df[col], **kwargs).
+    Résultat identique quel que soit le mode.
+    """
+    columns = [c for c in (df.columns if columns is None else columns)]
+    out = df.copy()
+    if not columns:
+        return out
+    workers = min(workers or TRANSFORM_WORKERS, len(columns))
+    mode = choose_mode(len(df), len(columns), workers, mode)
+
+    if mode == 'serial' or workers <= 1:
+        for col in columns:
+            out[col] = func(df[col], **kwargs)
+        return out
+
+    groups = _groups(columns, workers)
+    if mode == 'thread':
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rms-columns') as pool:
+            results = list(pool.map(lambda cols: _apply(df[cols], func, kwargs), groups))
+    else:
+        use_shared = os.path.isdir(SHM_DIR) and len(df) * len(columns) >= SHARED_MEMORY_MIN_CELLS
+        payloads = [_payload(df[cols], use_shared) for cols in groups]
+        try:
+            pool = clients.get_process_pool()
+            returned = list(pool.map(_run_group, [func] * len(groups), [kwargs] * len(groups), payloads))
+        finally:
+            for kind, value in payloads:
+                if kind == 'shm':
+                    _release(value)
+        results = []
+        for item in returned:
+            if item[0] == 'shm':
+                results.append(_from_shared(item[1], index=df.index, unlink=True))
+            else:
+                results.append(item[1])
+
+    for result in results:
+        for col in result.columns:
+            out[col] = result[col]
+    return out
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+import column_executor
+from excel_handler import clean_numeric_column
+from pipeline import ascii_text_column
+from utils import format_date_column
+
+N = 600
+PARALLEL = [('thread', None), ('process', 10 ** 12), ('process', 0)]  # process : pickle, puis mémoire partagée
+
+
+def _frame():
+    rng = np.random.default_rng(7)
+    dates = np.array(['01/03/2026', '2026-03-02', '15/12/2025 10:30', '', None, 'n/a'], dtype=object)
+    rates = np.array(['120,50', 'x', 'X', '99', None, 'Complet', 80.0, 75], dtype=object)  # types mélangés
+    text = np.array(['Hôtel Étoile', 'Café', None, 'Zoë', 'naïve'], dtype=object)
+    return pd.DataFrame({
+        'date_arrivee': rng.choice(dates, N), 'date_depart': rng.choice(dates, N),
+        'tarif_a': rng.choice(rates, N), 'tarif_b': rng.choice(rates, N), 'tarif_c': rng.choice(rates[:4], N),
+        'nom': rng.choice(text, N), 'ville': rng.choice(text, N),
+    }, index=pd.RangeIndex(100, 100 + N))  # index non standard : conservé tel quel
+
+
+CASES = [
+    (format_date_column, ['date_arrivee', 'date_depart'], {}),
+    (clean_numeric_column, ['tarif_a', 'tarif_b', 'tarif_c'], {'apply_x_rule': True}),
+    (ascii_text_column, ['nom', 'ville'], {}),
+]
+
+
+def test_parallel_modes_match_serial():
+    df = _frame()
+    saved = column_executor.SHARED_MEMORY_MIN_CELLS
+    try:
+        for func, columns, kwargs in CASES:
+            expected = column_executor.map_columns(df, func, columns, mode='serial', **kwargs)
+            for mode, shm_min in PARALLEL:
+                column_executor.SHARED_MEMORY_MIN_CELLS = shm_min
+                got = column_executor.map_columns(df, func, columns, workers=2, mode=mode, **kwargs)
+                pd.testing.assert_frame_equal(got, expected, obj=f"{func.__name__} ({mode}, shm>={shm_min})")
+    finally:
+        column_executor.SHARED_MEMORY_MIN_CELLS = saved
+    assert df.equals(_frame())  # entrée non modifiée
+
+
+def test_auto_mode_stays_serial_for_small_frames():
+    assert column_executor.choose_mode(1000, 10, workers=4, mode='auto') == 'serial'
+    big = column_executor.PARALLEL_MIN_CELLS
+    assert column_executor.choose_mode(big, 2, workers=4, mode='auto') == 'process'
+    assert column_executor.choose_mode(big, 1, workers=4, mode='auto') == 'serial'  # une seule colonne
+
+
+if __name__ == '__main__':
+    test_parallel_modes_match_serial()
+    test_auto_mode_stays_serial_for_small_frames()
+    print("✅ column_executor: modes thread / process (pickle et mémoire partagée) identiques au mode série")
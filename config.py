@@ -9,4 +9,11 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'postgres'),
     'user': os.getenv('DB_USER', 'postgres'),
     'password': os.getenv('DB_PASSWORD', 'b28qyNkIV1UrffsrOQ5JoaQgK9xYHPl9')
-}
\ No newline at end of file
+}
+
+# Application (partagé par app.py et asgi_app.py)
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+OUTPUT_FOLDER = os.getenv('OUTPUT_FOLDER', 'outputs')
@@ -0,0 +1,200 @@
+"""
+Lecture des CSV uploadés (D-Edge et autres) en une seule passe.
+
+Le dialecte est détecté sur les premiers Ko du fichier, au niveau octets :
+- BOM (UTF-8 / UTF-16) -> encodage
+- sonde UTF-8 sur l'échantillon, sinon cp1252 (exports Excel FR), sinon latin1
+- séparateur = candidat dont le nombre d'occurrences par ligne (hors guillemets) est le plus régulier
+
+Puis une seule lecture, avec pyarrow (multithread) ou le moteur C (aperçu nrows, repli si pyarrow échoue).
+Les deux moteurs lisent toutes les cellules en texte, puis une même règle (_typed_frame, casts Arrow) convertit
+les colonnes entièrement entières / décimales : un fichier donne les mêmes types quel que soit le moteur
+(sans inférence propre au moteur : pyarrow reconnaîtrait des dates ISO, le moteur C des booléens).
+Les lignes avec trop de champs sont ignorées mais comptées (ParserWarning / lignes invalides pyarrow)
+et renvoyées dans le rapport. Les lignes avec trop peu de champs sont complétées par le moteur C,
+ignorées par pyarrow.
+"""
+import codecs
+import csv
+import os
+import re
+import warnings
+from collections import Counter
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from pandas._libs.parsers import STR_NA_VALUES
+
+SAMPLE_SIZE = 64 * 1024
+DELIMITERS = [';', ',', '\t', '|']  # Ordre = priorité en cas d'égalité (';' : exports FR)
+
+# 'auto' : pyarrow pour une lecture complète, moteur C pour un aperçu (nrows)
+CSV_ENGINE = os.getenv('RMS_CSV_ENGINE', 'auto')
+CAST_PROBE_ROWS = 1000
+TEXT_PROBE_ROWS = 20
+
+MAX_BAD_LINE_SAMPLES = 20
+
+_QUOTED = re.compile(r'"(?:[^"]|"")*"')
+# Caractères possibles d'un nombre lu par Arrow (chiffres, signe, exposant, nan / inf / infinity)
+_NUMBER_CHARS = re.compile(r'[\d\s.eE+\-naifNAIFtyTY]*')
+
+
+def detect_encoding(sample):
+    """(encodage, taille du BOM) d'après les premiers octets."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig', len(codecs.BOM_UTF8)
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16', 2
+    try:
+        # Décodeur incrémental : un caractère multi-octets coupé en fin d'échantillon n'est pas une erreur
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8', 0
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode('cp1252')
+        return 'cp1252', 0
+    except UnicodeDecodeError:
+        return 'latin1', 0
+
+
+def detect_delimiter(text, max_lines=50):
+    """Séparateur le plus régulier sur les premières lignes complètes (guillemets ignorés)."""
+    lines = [l for l in _QUOTED.sub('', text).splitlines()[:max_lines + 1] if l.strip()]
+    if len(lines) > 1:
+        lines = lines[:-1]  # Dernière ligne potentiellement tronquée
+    best, best_score = DELIMITERS[0], (0, 0)
+    for delim in DELIMITERS:
+        counts = [l.count(delim) for l in lines]
+        mode, freq = Counter(counts).most_common(1)[0] if counts else (0, 0)
+        if mode == 0:
+            continue
+        score = (freq / len(counts), mode)
+        if score > best_score:
+            best, best_score = delim, score
+    return best
+
+
+def sniff(path, sample_size=SAMPLE_SIZE):
+    """Dialecte du fichier : {'encoding', 'delimiter'}."""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    encoding, bom = detect_encoding(sample)
+    text = sample[bom:].decode(encoding.replace('-sig', ''), errors='ignore')
+    return {'encoding': encoding, 'delimiter': detect_delimiter(text)}
+
+
+def _choose_engine(nrows):
+    engine = CSV_ENGINE
+    if engine == 'auto':
+        engine = 'pyarrow' if nrows is None else 'c'
+    return engine
+
+
+def _bad_line(message):
+    """Message de ParserWarning -> liste de lignes ignorées (le moteur C en regroupe plusieurs par warning)."""
+    return [m for m in str(message).splitlines() if m.strip()]
+
+
+def _header_names(path, dialect):
+    """Noms de colonnes comme les nomme pandas (vides -> 'Unnamed: i', doublons -> 'nom.1')."""
+    with open(path, encoding=dialect['encoding'], errors='replace', newline='') as f:
+        fields = next(csv.reader(f, delimiter=dialect['delimiter']), [])
+    names, seen = [], Counter()
+    for i, name in enumerate(fields):
+        name = name or f"Unnamed: {i}"
+        base = name
+        while name in seen:
+            name = f"{base}.{seen[base]}"
+            seen[base] += 1
+        seen[name] += 1
+        names.append(name)
+    return names
+
+
+def _typed_column(arr):
+    """Colonne texte Arrow -> int64 si toutes les valeurs sont entières, float64 si décimales, sinon texte."""
+    # Un cast raté coûte une exception Arrow par type : une valeur de tête non numérique (date, '517,53', nom)
+    # suffit à garder le texte, sans cast (c'est l'essentiel du temps sur les petits fichiers)
+    if any(v is not None and not _NUMBER_CHARS.fullmatch(v) for v in arr.slice(0, TEXT_PROBE_ROWS).to_pylist()):
+        return arr
+    for target in (pa.int64(), pa.float64()):
+        try:
+            # Un échec de cast coûte autant qu'une colonne entière : on écarte d'abord sur l'en-tête
+            pc.cast(arr.slice(0, CAST_PROBE_ROWS), target)
+            return pc.cast(arr, target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return arr
+
+
+def _typed_frame(columns):
+    """{nom: colonne texte Arrow} -> DataFrame typé (même règle pour les deux moteurs ; vides -> NaN)."""
+    df = pa.table({name: _typed_column(arr) for name, arr in columns.items()}).to_pandas()
+    return df.where(df.notna(), float('nan'))
+
+
+def _read_pyarrow(path, dialect, bad):
+    """pyarrow.csv en direct, toutes les colonnes en texte (le moteur pyarrow de pandas inférerait les types)."""
+    def invalid_row(row):
+        bad.append(f"Ligne {row.number}: {row.actual_columns} champs au lieu de {row.expected_columns}")
+        return 'skip'
+
+    names = _header_names(path, dialect)
+    encoding = 'utf8' if dialect['encoding'] in ('utf-8', 'utf-8-sig') else dialect['encoding']
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(encoding=encoding, column_names=names, skip_rows=1),
+        parse_options=pacsv.ParseOptions(delimiter=dialect['delimiter'], invalid_row_handler=invalid_row),
+        convert_options=pacsv.ConvertOptions(column_types={n: pa.string() for n in names},
+                                             null_values=sorted(STR_NA_VALUES), strings_can_be_null=True))
+    return _typed_frame({name: table[name] for name in names})
+
+
+def _read_c(path, dialect, nrows):
+    """Moteur C en texte ; octets invalides isolés plus loin que l'échantillon remplacés plutôt que d'échouer."""
+    df = pd.read_csv(path, engine='c', sep=dialect['delimiter'], encoding=dialect['encoding'], on_bad_lines='warn',
+                     encoding_errors='replace', nrows=nrows, dtype=str, low_memory=False)
+    return _typed_frame({col: pa.array(df[col], from_pandas=True, type=pa.string()) for col in df.columns})
+
+
+def read_csv(path, nrows=None, engine=None, dialect=None):
+    """
+    Lecture unique du CSV. Retourne (df, rapport) ; rapport = dialecte, moteur, lignes ignorées.
+    """
+    dialect = dialect or sniff(path)
+    engine = engine or _choose_engine(nrows)
+
+    bad = []
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        df = None
+        if engine == 'pyarrow':
+            try:
+                df = _read_pyarrow(path, dialect, bad)
+            except Exception as e:
+                print(f"Info: lecture pyarrow impossible ({e}), moteur C")
+                engine = 'c'
+                bad.clear()
+        if df is None:
+            df = _read_c(path, dialect, nrows)
+
+    bad += [line for w in caught if issubclass(w.category, pd.errors.ParserWarning) for line in _bad_line(w.message)]
+    for w in caught:
+        if not issubclass(w.category, pd.errors.ParserWarning):
+            warnings.warn_explicit(w.message, w.category, w.filename, w.lineno)
+    if bad:
+        print(f"Info CSV: {len(bad)} ligne(s) mal formée(s) ignorée(s) dans {os.path.basename(path)}")
+
+    report = {
+        'encoding': dialect['encoding'],
+        'delimiter': dialect['delimiter'],
+        'engine': engine,
+        'rows': len(df),
+        'bad_lines': len(bad),
+        'bad_line_samples': bad[:MAX_BAD_LINE_SAMPLES],
+    }
+    return df, report
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import pandas as pd
+
+import csv_reader
+from benchmarks.generators import write_dedge_csv
+
+# Cas où les moteurs inféraient des types différents : booléens, dates ISO, zéros non significatifs,
+# colonne vide, décimales à virgule, colonne entière avec trous, en-têtes vides ou en double
+CRAFTED = (
+    "ref;date;n;flag;amt;;n;code;empty\n"
+    "A;2026-01-05 10:00:00;3;True;900,35;x;1;007;\n"
+    "B;2026-01-06;;False;1,5;;2;010;\n"
+    "C;2026-01-07 12:30:00;5;true;;y;3.5;NA;\n"
+    "D;2026-01-08;7;True;12;z;4;1;;extra\n"
+    "E;;8;FALSE;3,25;w;5;002;\n"
+)
+
+
+def _both_engines(path):
+    c, rc = csv_reader.read_csv(path, engine='c')
+    arrow, ra = csv_reader.read_csv(path, engine='pyarrow')
+    assert ra['engine'] == 'pyarrow', ra
+    pd.testing.assert_frame_equal(c, arrow)
+    assert rc['bad_lines'] == ra['bad_lines'], (rc['bad_lines'], ra['bad_lines'])
+    return arrow, ra
+
+
+def test_engines_agree_on_crafted_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'crafted.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(CRAFTED)
+        df, report = _both_engines(path)
+    assert list(df.columns) == ['ref', 'date', 'n', 'flag', 'amt', 'Unnamed: 5', 'n.1', 'code', 'empty']
+    assert df['n'].dtype == 'float64' and df['n.1'].dtype == 'float64'
+    assert df['flag'].tolist() == ['True', 'False', 'true', 'FALSE']
+    assert df['code'].tolist()[:2] == [7.0, 10.0]
+    assert report['bad_lines'] == 1 and len(df) == 4
+
+
+def test_engines_agree_on_dedge_export():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dedge_csv(os.path.join(tmp, 'dedge.csv'), 3000)
+        df, _ = _both_engines(path)
+    assert len(df) == 3000
+
+
+if __name__ == '__main__':
+    test_engines_agree_on_crafted_file()
+    test_engines_agree_on_dedge_export()
+    print("✅ csv_reader: mêmes colonnes et mêmes types avec le moteur C et pyarrow")
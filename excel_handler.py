@@ -1,7 +1,10 @@
 import pandas as pd
+import numpy as np
 import openpyxl
 import datetime
 
+import column_executor
+
 def list_sheets(file_path):
     """
     Returns a list of sheet names from an Excel file.
@@ -44,10 +47,9 @@ def read_smart_excel(file_path, sheet_name):
                 
                 if is_planning:
                     print(f"✅ Format Detected: PLANNING (Header row {h_idx+1})")
-                    df_melted = parse_planning_format(df_plan)
-                    # For Planning, we DON'T replace text with 'x'. 
-                    # We only ensure basic string cleaning (no-break spaces etc)
-                    return clean_generic_numeric_cols(df_melted, exclude=["Date"], apply_x_rule=False)
+                    # For Planning, we DON'T replace text with 'x'.
+                    # Basic string cleaning (no-break spaces etc) is fused into the reshape.
+                    return parse_planning_format(df_plan)
         except Exception as e:
             print(f"Info: Planning check (header={h_idx}) failed: {e}")
 
@@ -68,45 +70,162 @@ def read_smart_excel(file_path, sheet_name):
 
 def parse_planning_format(df):
     """
-    Transforme le format Planning (Dates en colonnes) en format Base de Données (Dates en lignes)
+    Transforme le format Planning (Dates en colonnes) en format Base de Données (Dates en lignes).
+
+    Single pass, sparse output:
+    - the date headers are converted once (not once per melted row),
+    - empty cells are dropped during the reshape,
+    - value cleaning (same rules as clean_generic_numeric_cols without the 'x' rule)
+      runs on the distinct values only.
     """
     # Columns before D are metadata
-    fixed_cols = df.columns[0:3].tolist() 
+    fixed_cols = df.columns[0:3].tolist()
     date_cols = df.columns[3:].tolist()
-    
-    # Unpivot (Melt)
-    df_melted = df.melt(id_vars=fixed_cols, value_vars=date_cols, var_name='Date', value_name='Valeur')
-    
-    # Clean Date header
-    df_melted['Date'] = pd.to_datetime(df_melted['Date'], errors='coerce')
-    df_melted = df_melted.dropna(subset=['Date'])
-    
-    return df_melted
+
+    # Clean Date header (once per column)
+    header_dates = pd.to_datetime(pd.Series(date_cols, dtype=object), errors='coerce')
+    keep = header_dates.notna().to_numpy()
+    date_cols = [c for c, k in zip(date_cols, keep) if k]
+    header_dates = header_dates[keep].to_numpy()
+
+    # Values in date-major order (same row order as df.melt)
+    n_rows = len(df)
+    values = df[date_cols].to_numpy(dtype=object).T.ravel()
+    filled = pd.notna(values) & (values != "")
+    positions = np.flatnonzero(filled)
+    row_idx = positions % n_rows if n_rows else positions
+    date_idx = positions // n_rows if n_rows else positions
+
+    # Metadata cleaned on the wide frame (n rows), then repeated
+    df_fixed = clean_generic_numeric_cols(df[fixed_cols], exclude=[], apply_x_rule=False)
+    df_long = df_fixed.iloc[row_idx].reset_index(drop=True)
+    df_long['Date'] = header_dates[date_idx]
+    # Float columns (NaN in Excel) keep their '188.0' repr, like the previous melt did
+    is_float_col = np.array([pd.api.types.is_float_dtype(df[c]) for c in date_cols], dtype=bool)
+    is_float_val = is_float_col[date_idx]
+    kept = values[positions]
+    cleaned = np.empty(len(kept), dtype=object)
+    for mask in (is_float_val, ~is_float_val):
+        cleaned[mask] = _clean_distinct(kept[mask], apply_x_rule=False)
+    df_long['Valeur'] = cleaned
+
+    return df_long
+
+def _clean_cell(val, apply_x_rule=True):
+    if pd.isna(val) or val == "" or val is None: return None
+    s = str(val).strip().replace('\xa0', ' ') # Clean non-breaking spaces
+
+    # Simple numeric check
+    try:
+        # Handle French format 188,00 -> 188.00
+        v_str = s.replace(',', '.').replace(' ', '')
+        float(v_str) # test
+        return v_str
+    except ValueError:
+        # It's a comment or status.
+        # If apply_x_rule is True (Lighthouse), replace with 'x'.
+        # Else (Planning), keep original string.
+        return "x" if apply_x_rule else s
+
+def _factorize_typed(values):
+    """
+    pd.factorize keyed on (type, value): factorize alone merges 1, 1.0 and True into one value,
+    whose cleaned output would then depend on which one comes first.
+    Returns (codes, uniques) with uniques taken from the original values.
+    """
+    values = np.asarray(values, dtype=object)
+    codes, _ = pd.factorize(values, use_na_sentinel=False)
+    if len(values) == 0:
+        return codes, values
+    type_codes, _ = pd.factorize(np.fromiter(map(type, values), dtype=object, count=len(values)))
+    keys, _ = pd.factorize(codes.astype(np.int64) * (int(type_codes.max()) + 1) + type_codes)
+    _, first = np.unique(keys, return_index=True)
+    return keys, values[first]
+
+def _clean_distinct(values, apply_x_rule=True):
+    """
+    Applies _clean_cell to each distinct value only (grids repeat the same prices/statuses a lot).
+    """
+    codes, uniques = _factorize_typed(values)
+    cleaned = np.array([_clean_cell(v, apply_x_rule) for v in uniques], dtype=object)
+    return cleaned[codes] if len(codes) else np.array([], dtype=object)
 
 def clean_generic_numeric_cols(df, exclude, apply_x_rule=True):
     """
     Replaces non-numeric values in columns NOT in 'exclude' with 'x' (IF apply_x_rule is True).
     """
-    df_clean = df.copy()
-    for col in df_clean.columns:
-        if col in exclude:
-            continue
-            
-        def clean_val(val):
-            if pd.isna(val) or val == "" or val is None: return None
-            s = str(val).strip().replace('\xa0', ' ') # Clean non-breaking spaces
-            
-            # Simple numeric check
-            try:
-                # Handle French format 188,00 -> 188.00
-                v_str = s.replace(',', '.').replace(' ', '')
-                float(v_str) # test
-                return v_str
-            except ValueError:
-                # It's a comment or status. 
-                # If apply_x_rule is True (Lighthouse), replace with 'x'.
-                # Else (Planning), keep original string.
-                return "x" if apply_x_rule else s
-                
-        df_clean[col] = df_clean[col].apply(clean_val)
-    return df_clean
+    columns = [col for col in df.columns if col not in exclude]
+    # Colonnes concurrentes réparties entre workers pour les feuilles larges (voir column_executor)
+    return column_executor.map_columns(df, clean_numeric_column, columns, apply_x_rule=apply_x_rule)
+
+def clean_numeric_column(series, apply_x_rule=True):
+    """_clean_cell sur une colonne (une fois par valeur distincte)."""
+    return pd.Series(_clean_distinct(series.to_numpy(dtype=object), apply_x_rule), index=series.index, dtype=object)
+
+# --- Lighthouse : matrice de tarifs (rate shopping) ---
+
+# Codes de statut des cellules non numériques (à la place du 'x' de clean_generic_numeric_cols)
+RATE_OK = 0
+RATE_MISSING = 1
+RATE_SOLD_OUT = 2
+RATE_NO_FLEX = 3
+RATE_RESTRICTED = 4
+RATE_OTHER = 5
+
+RATE_STATUS_LABELS = {
+    RATE_OK: 'ok', RATE_MISSING: 'missing', RATE_SOLD_OUT: 'sold_out',
+    RATE_NO_FLEX: 'no_flex', RATE_RESTRICTED: 'restricted', RATE_OTHER: 'other',
+}
+
+def _rate_status(val):
+    """(tarif, code statut) pour une cellule Lighthouse."""
+    if pd.isna(val) or str(val).strip() == "":
+        return np.nan, RATE_MISSING
+    cleaned = _clean_cell(val, apply_x_rule=True)
+    if cleaned != "x":
+        return float(cleaned), RATE_OK
+    s = str(val).strip().lower()
+    if any(k in s for k in ("épuisé", "epuise", "complet", "sold out", "closed", "fermé")):
+        return np.nan, RATE_SOLD_OUT
+    if "flex" in s:
+        return np.nan, RATE_NO_FLEX
+    if any(k in s for k in ("pax", "min", "nuit", "los")):
+        return np.nan, RATE_RESTRICTED
+    return np.nan, RATE_OTHER
+
+def read_lighthouse_rates(file_path, sheet_name):
+    """
+    Feuille Lighthouse (en-tête ligne 5) -> matrice dense date de séjour x concurrent.
+    Retourne (stay_dates, competitors, rates float32 [NaN si non numérique], status int8, demand float32).
+    """
+    df = pd.read_excel(file_path, sheet_name=sheet_name, header=4, engine='openpyxl')
+    if "Jour Date" in df.columns:
+        df = df.rename(columns={"Jour Date": "Date"})
+    if "Date" not in df.columns:
+        raise ValueError("Format Lighthouse non reconnu (colonne 'Jour Date' absente ligne 5).")
+
+    # "Jeu 15/01/2026" -> 2026-01-15 (ou cellule déjà datetime)
+    raw_dates = df["Date"]
+    dates = pd.to_datetime(raw_dates.astype(str).str.extract(r'(\d{1,2}/\d{1,2}/\d{4})')[0],
+                           format='%d/%m/%Y', errors='coerce')
+    dates = dates.fillna(pd.to_datetime(raw_dates.where(raw_dates.map(lambda v: isinstance(v, datetime.datetime))),
+                                        errors='coerce'))
+    keep = dates.notna().to_numpy()
+    df = df[keep]
+    stay_dates = pd.DatetimeIndex(dates[keep]).normalize()
+
+    demand = None
+    if "Demande du marché" in df.columns:
+        demand = pd.to_numeric(df["Demande du marché"].astype(str).str.replace('%', '', regex=False)
+                               .str.replace(',', '.', regex=False), errors='coerce').to_numpy(np.float32)
+
+    competitors = [c for c in df.columns if c not in ("Date", "Demande du marché")
+                   and not str(c).startswith("Unnamed")]
+    values = df[competitors].to_numpy(dtype=object)
+    codes, uniques = _factorize_typed(values.ravel())
+    parsed = [_rate_status(v) for v in uniques]
+    rate_lut = np.array([p[0] for p in parsed], dtype=np.float32)
+    status_lut = np.array([p[1] for p in parsed], dtype=np.int8)
+    rates = rate_lut[codes].reshape(values.shape) if len(codes) else np.empty(values.shape, np.float32)
+    status = status_lut[codes].reshape(values.shape) if len(codes) else np.empty(values.shape, np.int8)
+    return stay_dates, [str(c) for c in competitors], rates, status, demand
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+import excel_handler
+
+# Cellules Lighthouse / Planning : pd.factorize confond 1, 1.0 et True (même hash, égaux)
+MIXED_ORDERS = [
+    [True, 1, 1.0, '1', 'Épuisé', None],
+    [1.0, True, 1, '1,5', np.nan, 0],
+    [1, 1.0, True, False, 0.0, 0, '188,00'],
+]
+
+
+def test_clean_distinct_keeps_types_apart():
+    for values in MIXED_ORDERS:
+        for apply_x_rule in (True, False):
+            expected = [excel_handler._clean_cell(v, apply_x_rule) for v in values]
+            got = list(excel_handler._clean_distinct(values, apply_x_rule))
+            assert got == expected, (values, apply_x_rule, got, expected)
+
+
+def test_clean_generic_numeric_cols_matches_cell_by_cell():
+    df = pd.DataFrame({'Date': ['Jeu 15/01/2026'] * 7,
+                       'A': [True, 1, 1.0, 'Pas de flex', 2, 2.0, None],
+                       'B': [1.0, 1, True, False, 0, 0.0, '330']})
+    out = excel_handler.clean_generic_numeric_cols(df, exclude=['Date'])
+    for col in ('A', 'B'):
+        assert list(out[col]) == [excel_handler._clean_cell(v) for v in df[col]], col
+    assert list(out['Date']) == list(df['Date'])
+
+
+if __name__ == '__main__':
+    test_clean_distinct_keeps_types_apart()
+    test_clean_generic_numeric_cols_matches_cell_by_cell()
+    print("✅ excel_handler: nettoyage par valeur distincte identique au nettoyage cellule par cellule")
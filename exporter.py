@@ -0,0 +1,289 @@
+"""
+Export d'une table Supabase en flux (CSV / XLSX / Parquet), à mémoire constante.
+
+Pagination par clé (keyset) : chaque page est `<key> > dernière valeur vue`, triée sur <key>
+(clé composite : comparaison ligne à ligne via or=(a.gt.x,and(a.eq.x,b.gt.y))).
+PostgREST n'a donc jamais à parcourir les lignes déjà envoyées (contrairement à OFFSET).
+La clé doit être unique, sinon les lignes de même valeur à cheval sur deux pages seraient perdues :
+elle est choisie parmi les clés de la table (RPC get_table_keys, voir export_key), clé primaire d'abord.
+Les lignes dont la clé contient un NULL (clé UNIQUE, pas primaire) sont envoyées à la fin,
+par OFFSET trié sur toutes les colonnes. Une table sans clé unique (tables d'avant la série, clé
+'index', <table>_nuits) est exportée entièrement de cette façon : plus lent sur une grande table
+(chaque page relit les précédentes), mais complet.
+
+CSV et Parquet (un row group par page) partent au fil des pages. XLSX est un zip dont le classeur
+n'est complet qu'à la fin : lignes écrites dans un fichier temporaire (mémoire constante), le premier
+octet n'est envoyé qu'une fois toute la table lue.
+"""
+import csv
+import io
+import os
+import tempfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from supabase_rest import rest_headers
+from utils import clean_column_name
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+CHUNK_SIZE = 256 * 1024
+
+DEFAULT_PAGE_SIZE = 5000
+MAX_PAGE_SIZE = 50000
+
+
+def _filter_value(value):
+    """Valeur de filtre PostgREST (guillemets si caractères réservés)."""
+    s = str(value)
+    if any(c in s for c in ',.:()" '):
+        return '"' + s.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return s
+
+
+def _after(key_columns, last):
+    """Filtre or=(...) des lignes strictement après `last` dans l'ordre (k1, k2, ...) d'une clé composite."""
+    terms = []
+    for i, col in enumerate(key_columns):
+        eqs = [f"{c}.eq.{_filter_value(last[c])}" for c in key_columns[:i]]
+        gt = f"{col}.gt.{_filter_value(last[col])}"
+        terms.append(f"and({','.join(eqs + [gt])})" if eqs else gt)
+    return f"({','.join(terms)})"
+
+
+def _get(http, url, params, headers):
+    response = http.get(url, params=params, headers=headers)
+    if response.status_code != 200:
+        raise Exception(f"HTTP {response.status_code}: {response.text}")
+    return response.json()
+
+
+def iter_pages(base_url, key, table_name, columns=None, key_columns=('reference',), page_size=DEFAULT_PAGE_SIZE,
+               session=None, key_not_null=False):
+    """
+    Générateur de pages (listes de dicts) via pagination par clé (key_columns : clé unique de la table).
+    key_not_null (clé primaire) : pas de passe pour les lignes dont la clé contient un NULL.
+    Sans key_columns (table sans clé unique) : toute la table par OFFSET.
+    """
+    http = session or requests
+    url = f"{base_url.rstrip('/')}/rest/v1/{table_name}"
+    headers = rest_headers(key)
+    key_columns = list(key_columns)
+    select = '*'
+    if columns:
+        select = ','.join(list(columns) + [c for c in key_columns if c not in columns])
+    if not key_columns:
+        yield from _offset_pages(http, url, headers, select, page_size, {})
+        return
+
+    last = None
+    while True:
+        params = {'select': select, 'order': ','.join(f"{c}.asc" for c in key_columns), 'limit': str(page_size)}
+        params.update({c: 'not.is.null' for c in key_columns})
+        if last is not None:
+            if len(key_columns) == 1:
+                params[key_columns[0]] = f"gt.{_filter_value(last[key_columns[0]])}"
+            else:
+                params['or'] = _after(key_columns, last)
+        rows = _get(http, url, params, headers)
+        if not rows:
+            break
+        yield rows
+        if len(rows) < page_size:
+            break
+        last = rows[-1]
+
+    if key_not_null:
+        return
+    # Lignes dont la clé contient un NULL (en principe peu nombreuses)
+    null_filter = ({key_columns[0]: 'is.null'} if len(key_columns) == 1
+                   else {'or': f"({','.join(f'{c}.is.null' for c in key_columns)})"})
+    yield from _offset_pages(http, url, headers, select, page_size, null_filter)
+
+
+def _offset_pages(http, url, headers, select, page_size, filters):
+    """
+    Pages par OFFSET, triées sur toutes les colonnes pour un ordre stable d'une page à l'autre (colonnes lues
+    sur une première ligne). Deux lignes de même valeur partout sont identiques : leur ordre est indifférent.
+    """
+    probe = _get(http, url, dict(filters, select=select, limit='1'), headers)
+    if not probe:
+        return
+    order = ','.join(f"{c}.asc" for c in probe[0])
+    offset = 0
+    while True:
+        params = dict(filters, select=select, order=order, limit=str(page_size), offset=str(offset))
+        rows = _get(http, url, params, headers)
+        if not rows:
+            break
+        yield rows
+        if len(rows) < page_size:
+            break
+        offset += page_size
+
+
+def _project(pages, columns):
+    """Fixe l'ordre des colonnes (celles demandées ou celles de la première page)."""
+    for rows in pages:
+        if columns is None:
+            columns = list(rows[0].keys())
+        yield columns, rows
+
+
+def stream_csv(pages, columns=None):
+    """CSV ';' (même format que les fichiers filtrés de /filter), une page à la fois."""
+    header_sent = False
+    for cols, rows in _project(pages, columns):
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=';', lineterminator='\n')
+        if not header_sent:
+            buf.write('\ufeff') # BOM (Excel)
+            writer.writerow(cols)
+            header_sent = True
+        writer.writerows([['' if r.get(c) is None else r.get(c) for c in cols] for r in rows])
+        yield buf.getvalue().encode('utf-8')
+    if not header_sent and columns:
+        yield ('\ufeff' + ';'.join(columns) + '\n').encode('utf-8')
+
+
+def _stream_file(path):
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def stream_xlsx(pages, columns=None, sheet_title='export'):
+    """
+    openpyxl en mode write_only : les lignes sont écrites au fil de l'eau dans un fichier temporaire
+    (mémoire constante), puis le classeur est envoyé par blocs.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title[:31])
+    header_sent = False
+    for cols, rows in _project(pages, columns):
+        if not header_sent:
+            ws.append(cols)
+            header_sent = True
+        for r in rows:
+            ws.append([r.get(c) for c in cols])
+    if not header_sent and columns:
+        ws.append(columns)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    wb.save(path)
+    yield from _stream_file(path)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule qui garde les octets écrits jusqu'au prochain take() (sortie du ParquetWriter)."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(pages, columns=None):
+    """Un row group Parquet par page, envoyé dès qu'il est écrit (le pied de fichier part à la fin)."""
+    sink = _ChunkSink()
+    writer = None
+    for cols, rows in _project(pages, columns):
+        # Types variables d'une page à l'autre (NULL, nombres en texte) : tout en texte
+        table = pa.table({c: pa.array([None if r.get(c) is None else str(r.get(c)) for r in rows],
+                                      type=pa.string()) for c in cols})
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.take()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.schema([(c, pa.string()) for c in columns or []]))
+    writer.close()
+    yield sink.take()
+
+
+def parse_page_size(value):
+    """page_size de la requête (défaut DEFAULT_PAGE_SIZE, plafonné à MAX_PAGE_SIZE). Lève ValueError (400)."""
+    if value is None or value == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"page_size invalide: {value}")
+    if page_size <= 0:
+        raise ValueError(f"page_size invalide: {value}")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def export_key(table_keys, key_param=None):
+    """
+    Clé de pagination : (colonnes, clé primaire ?) parmi les clés de la table (lignes de get_table_keys).
+    key_param ('a,b') doit contenir une clé unique de la table ; sans key_param, clé primaire puis
+    première clé unique, ou ([], False) si la table n'en a pas (export par OFFSET, voir iter_pages).
+    Lève ValueError (400) si key_param n'est pas une clé unique.
+    """
+    if table_keys is None:
+        raise ValueError("Clés de la table inconnues (RPC get_table_keys, voir setup_rpc.py)")
+    keys = sorted(table_keys, key=lambda r: not r.get('is_primary'))
+    primary = next((r['key_columns'] for r in keys if r.get('is_primary')), None)
+    if not key_param:
+        if not keys:
+            print("Info: table sans clé unique, export par OFFSET")
+            return [], False
+        columns = list(keys[0]['key_columns'])
+    else:
+        columns = [c for c in key_param.split(',') if c]
+        if not any(set(r['key_columns']) <= set(columns) for r in keys):
+            raise ValueError(f"Clé d'export non unique dans la table: {key_param} "
+                             f"(clés : {', '.join(','.join(r['key_columns']) for r in keys) or 'aucune'})")
+    # Clé primaire (NOT NULL) : pas de lignes à clé NULL
+    return columns, bool(primary) and set(columns) <= set(primary)
+
+
+def check_export_params(table_name, fmt, columns, key_param):
+    """Message d'erreur si les paramètres d'export sont invalides, sinon None."""
+    # Identifiants SQL uniquement (ils partent dans l'URL PostgREST)
+    key_columns = [c for c in (key_param or '').split(',') if c]
+    for ident in [table_name] + key_columns + (columns or []):
+        if clean_column_name(ident) != ident:
+            return f"Identifiant invalide: {ident}"
+    if fmt not in EXPORT_FORMATS:
+        return f"Format inconnu: {fmt}"
+    return None
+
+
+def stream_export(base_url, key, table_name, fmt='csv', columns=None, key_columns=('reference',),
+                  page_size=DEFAULT_PAGE_SIZE, session=None, key_not_null=False):
+    """Flux d'octets de l'export complet de la table au format demandé."""
+    pages = iter_pages(base_url, key, table_name, columns, key_columns, page_size, session, key_not_null)
+    if fmt == 'xlsx':
+        return stream_xlsx(pages, columns, sheet_title=table_name)
+    if fmt == 'parquet':
+        return stream_parquet(pages, columns)
+    return stream_csv(pages, columns)
@@ -0,0 +1,43 @@
+"""
+Configuration gunicorn (production) : gunicorn -c gunicorn.conf.py app:app
+
+- preload_app : app.py et ses dépendances lourdes (pandas, numpy, openpyxl, supabase) sont importés
+  une seule fois dans le master ; les workers sont forkés avec ces modules déjà chargés (copy-on-write).
+  Démarrage et recyclage des workers (max_requests) ne repayent plus le coût des imports.
+- post_fork : chaque worker crée ses propres clients HTTP, son pool de process (clients.py)
+  et son sweeper d'artefacts.
+"""
+import os
+import sys
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 300))  # Gros imports Excel / CSV
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+# Recyclage des workers (fuites mémoire pandas) : rapide grâce au preload
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 50))
+
+accesslog = '-'
+
+_started = time.perf_counter()
+
+
+def when_ready(server):
+    server.log.info(f"Application chargée en {(time.perf_counter() - _started) * 1000:.0f} ms "
+                    f"(preload={'oui' if preload_app else 'non'})")
+    rms = sys.modules.get('app')
+    if rms is not None:
+        # Le master ne sert pas de requêtes : pas de sweeper ici, chaque worker a le sien
+        rms.artifacts.stop_sweeper()
+
+
+def post_fork(server, worker):
+    import clients
+    clients.reset()
+    rms = sys.modules.get('app')
+    if rms is not None:
+        rms.artifacts.after_fork()
@@ -0,0 +1,186 @@
+"""
+Journal des imports (reprise après erreur).
+
+Chaque import a un import_id et un fichier JSON dans IMPORT_FOLDER :
+    table, mode, empreinte (fichier source + paramètres + nombre de lignes), taille de lot,
+    table_created (DDL déjà exécuté), next_offset (lignes confirmées par PostgREST), statut.
+
+Les lots sont envoyés dans l'ordre : next_offset avance après chaque réponse 2xx. Relancer un import
+avec le même import_id reprend au premier lot non confirmé (sans DROP TABLE en mode create).
+Avec un autre fichier, d'autres paramètres ou une autre table (empreinte différente), l'import_id
+repart de zéro : rien n'est repris de l'essai précédent.
+Le lot "incertain" (envoyé, réponse perdue) peut être renvoyé : avec on_conflict (clé unique),
+PostgREST ignore alors les doublons en mode create (resolution=ignore-duplicates : la table ne contient
+que les lignes de cet import) et les met à jour en mode append (resolution=merge-duplicates : les
+valeurs du fichier s'appliquent, qu'elles aient déjà été envoyées par cet import ou modifiées entre-temps).
+Sans clé, une reprise en mode append insérerait ce lot deux fois : elle est refusée (ImportConflict).
+
+Toute erreur après begin() doit passer l'import en 'failed' (checkpoint.guard()) : un import resté
+'running' bloque les nouveaux essais pendant STALE_SECONDS.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+IMPORT_FOLDER = os.getenv('IMPORT_FOLDER', 'imports')
+
+# Un import "running" sans nouvelle depuis ce délai est considéré comme interrompu (worker tué)
+STALE_SECONDS = 300
+
+
+class ImportConflict(Exception):
+    """Import en cours, import_id invalide, ou reprise d'un append sans clé."""
+
+
+def fingerprint(source_path, n_records, **params):
+    """Empreinte de l'import : un import_id ne peut reprendre que le même fichier avec les mêmes paramètres."""
+    st = os.stat(source_path)
+    payload = json.dumps({'source': os.path.basename(source_path), 'size': st.st_size, 'mtime': st.st_mtime,
+                          'records': n_records, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ImportCheckpoint:
+    """État d'un import, sauvegardé après chaque lot confirmé."""
+
+    def __init__(self, journal, state):
+        self.journal = journal
+        self.state = state
+
+    @property
+    def import_id(self):
+        return self.state['import_id']
+
+    @property
+    def next_offset(self):
+        return self.state['next_offset']
+
+    @property
+    def table_created(self):
+        return self.state['table_created']
+
+    @property
+    def resumed(self):
+        return self.state['attempts'] > 1
+
+    def _save(self):
+        self.state['updated_at'] = time.time()
+        self.journal._write(self.state)
+
+    def mark_table_created(self):
+        self.state['table_created'] = True
+        self._save()
+
+    def commit(self, offset, n_rows):
+        """Lot [offset, offset + n_rows) confirmé."""
+        self.state['next_offset'] = max(self.state['next_offset'], offset + n_rows)
+        self._save()
+
+    def done(self):
+        self.state['status'] = 'done'
+        self.state['error'] = None
+        self._save()
+
+    def failed(self, error):
+        self.state['status'] = 'failed'
+        self.state['error'] = str(error)[:500]
+        self._save()
+
+    @contextmanager
+    def guard(self):
+        """Exception (ou annulation) dans le bloc alors que l'import tourne encore -> 'failed', puis relevée."""
+        try:
+            yield self
+        except BaseException as e:
+            if self.state['status'] == 'running':
+                self.failed(str(e) or type(e).__name__)
+            raise
+
+    def summary(self):
+        return {
+            'import_id': self.import_id,
+            'status': self.state['status'],
+            'committed_rows': self.state['next_offset'],
+            'total_rows': self.state['total_records'],
+            'resumed': self.resumed,
+            'resumable': self.state['status'] != 'done',
+        }
+
+
+class ImportJournal:
+    def __init__(self, folder=IMPORT_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, import_id):
+        return os.path.join(self.folder, f"{import_id}.json")
+
+    def _write(self, state):
+        path = self._path(state['import_id'])
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def get(self, import_id):
+        path = self._path(import_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def unfinished(self, path):
+        """Fichier journal d'un import non terminé (reprise encore possible) : à garder par ArtifactStore (keep)."""
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.folder) or not path.endswith('.json'):
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f).get('status') != 'done'
+        except (OSError, ValueError):
+            return False
+
+    def begin(self, import_id, table_name, mode, fingerprint, total_records, batch_size, conflict_key=None,
+              restart=False):
+        """
+        Nouvel import (import_id None, inconnu ou d'empreinte différente) ou reprise d'un import existant.
+        Lève ImportConflict si l'import tourne encore, ou pour reprendre un append sans conflict_key
+        (on_conflict : seule garantie contre le lot incertain en double).
+        restart : un nouvel essai reprend au premier lot (chargement qui remplace ses propres lignes).
+        """
+        if import_id and (not all(c.isalnum() or c in '-_' for c in import_id) or len(import_id) > 64):
+            raise ImportConflict(f"import_id invalide: {import_id}")
+        import_id = import_id or uuid.uuid4().hex
+        now = time.time()
+        state = self.get(import_id)
+
+        if state is not None and state['status'] == 'running' and now - state['updated_at'] < STALE_SECONDS:
+            raise ImportConflict(f"Import {import_id} déjà en cours")
+        if state is not None and (state['fingerprint'] != fingerprint or state['table'] != table_name):
+            print(f"Info: import {import_id} relancé avec un autre fichier ou d'autres paramètres, "
+                  f"reprise depuis le début")
+            state = None
+
+        if state is None:
+            state = {
+                'import_id': import_id, 'table': table_name, 'mode': mode, 'fingerprint': fingerprint,
+                'total_records': total_records, 'batch_size': batch_size, 'table_created': False,
+                'next_offset': 0, 'status': 'running', 'attempts': 1, 'error': None,
+                'created_at': now, 'updated_at': now,
+            }
+        else:
+            if state['status'] != 'done' and mode == 'append' and not conflict_key and not restart:
+                raise ImportConflict(f"Reprise de l'import {import_id} impossible sans clé on_conflict en mode append "
+                                     f"(le dernier lot envoyé serait inséré deux fois)")
+            if state['status'] != 'done':
+                state['status'] = 'running'
+                state['attempts'] += 1
+                if restart:
+                    state['next_offset'] = 0
+            state['batch_size'] = batch_size
+
+        checkpoint = ImportCheckpoint(self, state)
+        checkpoint._save()
+        return checkpoint
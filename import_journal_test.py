@@ -0,0 +1,152 @@
+import os
+import tempfile
+
+from benchmarks.stub_server import StubSupabase
+from import_journal import ImportConflict, ImportJournal, fingerprint
+from supabase_rest import insert_records
+
+# 10 lignes en lots de 3 : lots aux offsets 0, 3, 6, 9
+ROWS = [{'reference': f'R{i:03d}', 'etat': 'Validee'} for i in range(10)]
+BATCH = 3
+
+
+def _source(folder, text="reference;etat\n"):
+    path = os.path.join(folder, 'rapport.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def _load(stub, checkpoint, rows, on_conflict='reference', merge=False):
+    """Chargement comme app.run_load : échec journalisé, erreur relevée."""
+    try:
+        insert_records(stub.url, 'k', 'resa', rows, batch_size=BATCH, on_conflict=on_conflict,
+                       checkpoint=checkpoint, merge=merge)
+    except Exception as e:
+        checkpoint.failed(e)
+        raise
+    checkpoint.done()
+
+
+def _failing_load(stub, checkpoint, rows, **kwargs):
+    try:
+        _load(stub, checkpoint, rows, **kwargs)
+    except Exception:
+        return
+    raise AssertionError("le chargement aurait dû échouer")
+
+
+def test_resume_starts_at_confirmed_offset():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        fp = fingerprint(_source(tmp), len(ROWS), on_conflict='reference')
+        checkpoint = journal.begin('imp-1', 'resa', 'create', fp, len(ROWS), BATCH, conflict_key='reference')
+        stub.state.fail_inserts = {3}
+        _failing_load(stub, checkpoint, ROWS)
+        assert journal.get('imp-1')['status'] == 'failed'
+        assert journal.get('imp-1')['next_offset'] == 6
+
+        resumed = journal.begin('imp-1', 'resa', 'create', fp, len(ROWS), BATCH, conflict_key='reference')
+        assert resumed.next_offset == 6 and resumed.resumed
+        sent = stub.state.inserts
+        _load(stub, resumed, ROWS)
+        assert stub.state.inserts - sent == 2  # lots 6 et 9 seulement
+        assert stub.state.row_counts['resa'] == len(ROWS)
+        assert journal.get('imp-1')['status'] == 'done'
+
+
+def test_other_fingerprint_restarts_from_zero():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        source = _source(tmp)
+        fp = fingerprint(source, len(ROWS), on_conflict='reference')
+        checkpoint = journal.begin('imp-2', 'resa', 'create', fp, len(ROWS), BATCH, conflict_key='reference')
+        checkpoint.mark_table_created()
+        stub.state.fail_inserts = {2}
+        _failing_load(stub, checkpoint, ROWS)
+        assert checkpoint.next_offset == 3
+
+        # Autre fichier sous le même nom : rien n'est repris
+        source = _source(tmp, "reference;etat;montant\n")
+        other = fingerprint(source, len(ROWS), on_conflict='reference')
+        assert other != fp
+        restarted = journal.begin('imp-2', 'resa', 'create', other, len(ROWS), BATCH, conflict_key='reference')
+        assert restarted.next_offset == 0 and not restarted.table_created and not restarted.resumed
+        restarted.failed("interrompu")
+        # Mêmes paramètres mais autre table : idem
+        moved = journal.begin('imp-2', 'resa_bis', 'create', other, len(ROWS), BATCH, conflict_key='reference')
+        assert moved.next_offset == 0 and moved.state['table'] == 'resa_bis'
+
+
+def test_append_resume_requires_conflict_key():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        fp = fingerprint(_source(tmp), len(ROWS))
+        checkpoint = journal.begin('imp-3', 'resa', 'append', fp, len(ROWS), BATCH)
+        stub.state.fail_inserts = {2}
+        _failing_load(stub, checkpoint, ROWS, on_conflict=None)
+        try:
+            journal.begin('imp-3', 'resa', 'append', fp, len(ROWS), BATCH)
+            raise AssertionError("reprise d'un append sans clé acceptée")
+        except ImportConflict:
+            pass
+        assert journal.get('imp-3')['next_offset'] == 3
+
+
+def test_error_after_begin_fails_the_import():
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        fp = fingerprint(_source(tmp), len(ROWS))
+        checkpoint = journal.begin('imp-4', 'resa', 'create', fp, len(ROWS), BATCH)
+        try:
+            journal.begin('imp-4', 'resa', 'create', fp, len(ROWS), BATCH)
+            raise AssertionError("deux essais simultanés acceptés")
+        except ImportConflict:
+            pass
+        try:
+            with checkpoint.guard():
+                raise OSError("disque plein")
+        except OSError:
+            pass
+        assert journal.get('imp-4')['status'] == 'failed'
+        assert journal.get('imp-4')['error'] == "disque plein"
+        # Plus de 409 pendant STALE_SECONDS : l'essai suivant reprend tout de suite
+        assert journal.begin('imp-4', 'resa', 'create', fp, len(ROWS), BATCH).state['attempts'] == 2
+
+
+def test_resumed_append_applies_the_file():
+    """
+    Append avec clé (upsert) : à la reprise, le fichier fait foi, que la ligne déjà présente vienne
+    du lot incertain de cet import ou d'une modification faite entre-temps dans la table.
+    """
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        stub.state.insert('resa', [dict(r) for r in ROWS])
+        stub.state.declare_key('resa', ['reference'], primary=True)
+        report = [{'reference': r['reference'], 'etat': 'Annulee'} for r in ROWS]
+        report.insert(1, {'reference': 'R001', 'etat': 'Option'})  # doublon du fichier : la dernière ligne gagne
+
+        journal = ImportJournal(os.path.join(tmp, 'imports'))
+        fp = fingerprint(_source(tmp), len(report), on_conflict='reference')
+        checkpoint = journal.begin('imp-5', 'resa', 'append', fp, len(report), BATCH, conflict_key='reference')
+        stub.state.lose_inserts = {stub.state.inserts + 2}  # lot de l'offset 3 appliqué, réponse perdue
+        _failing_load(stub, checkpoint, report, merge=True)
+        assert checkpoint.next_offset == 3
+        rows = {r['reference']: r for r in stub.state.tables['resa']}
+        assert rows['R003']['etat'] == 'Annulee'  # envoyé par cet import, non confirmé
+        rows['R008']['etat'] = 'Modifiee'  # modifié dans la table entre les deux essais
+
+        resumed = journal.begin('imp-5', 'resa', 'append', fp, len(report), BATCH, conflict_key='reference')
+        assert resumed.next_offset == 3
+        _load(stub, resumed, report, merge=True)
+        assert stub.state.row_counts['resa'] == len(ROWS)
+        assert {r['etat'] for r in stub.state.tables['resa']} == {'Annulee'}
+
+
+if __name__ == '__main__':
+    test_resume_starts_at_confirmed_offset()
+    test_other_fingerprint_restarts_from_zero()
+    test_append_resume_requires_conflict_key()
+    test_error_after_begin_fails_the_import()
+    test_resumed_append_applies_the_file()
+    print("✅ import_journal: reprise au dernier lot confirmé, empreinte différente -> depuis zéro, "
+          "append sans clé refusé, échec journalisé, le fichier fait foi à la reprise d'un append")
@@ -0,0 +1,224 @@
+"""
+Logique des routes d'import partagée par le serveur Flask (app.py) et le mode ASGI (asgi_app.py).
+
+Paramètres de la requête, nom de la table, plan de chargement (SQL, clé on_conflict, layout),
+journal de l'import, messages et réponse JSON. Aucune I/O réseau ici : chaque serveur exécute
+le plan avec son propre client (app.run_load synchrone, asgi_app.run_load asynchrone) :
+    1. create_sql si la table n'est pas encore créée (journal), puis attente settle_seconds
+    2. pre_insert_sql avant le premier lot (nuitées : suppression des nuits des réservations rechargées)
+    3. insertions par lots (batch_size, on_conflict, merge, offset confirmé journalisé)
+    4. post_load_sql (clé et index après le chargement en masse, rejoué sans effet en cas de reprise)
+"""
+import os
+import uuid
+
+import pipeline
+import stay_nights
+import table_layout
+from import_journal import fingerprint
+from utils import clean_column_name
+
+BATCH_SIZE = 500
+SETTLE_SECONDS = 2  # Propagation du nouveau schéma (cache PostgREST) avant les insertions
+
+NO_SUPABASE_STATUS = "⚠️ Supabase non configuré."
+NO_SUPABASE_MESSAGE = "Supabase non configuré (Mode local seulement)"
+NO_CREATE_SQL = "-- Mode Mise à jour (APPEND) : Pas de CREATE TABLE"
+
+
+# --- Paramètres ---
+
+def csv_params(data, imports):
+    """Paramètres de /filter. Lève ValueError (400) si incomplets."""
+    params = {
+        'filename': data.get('filename'),
+        'columns': data.get('columns', []),
+        'mapping': data.get('column_mapping', {}),  # {csv_col: db_col}
+        'mode': data.get('mode', 'create'),  # create | append
+        'table': (data.get('table_name') or '').strip(),
+    }
+    if not params['filename'] or not params['columns']:
+        raise ValueError("Fichier ou colonnes manquants")
+    if not params['table'] and params['mode'] == 'append':
+        raise ValueError("Nom de la table requis pour le mode 'Mettre à jour'")
+    if not params['table']:
+        # Reprise d'un import sans nom de table : même table générée que la première tentative
+        previous = imports.get(data['import_id']) if data.get('import_id') else None
+        params['table'] = previous['table'] if previous else 'reservations_' + uuid.uuid4().hex[:8]
+    # Nettoyage du nom de la table pour sécurité SQL si création
+    if params['mode'] == 'create':
+        params['table'] = clean_column_name(params['table'])
+    return params
+
+
+def excel_params(data):
+    """Paramètres de /process_excel. Lève ValueError (400) si incomplets."""
+    params = {
+        'filename': data.get('filename'),
+        'sheet': data.get('sheet_name'),
+        'columns': data.get('columns', []),
+        'mapping': data.get('column_mapping', {}),
+        'types': data.get('column_types', {}),
+        'mode': data.get('mode', 'create'),  # create or update
+        'table': data.get('table_name'),
+        'is_lighthouse': data.get('is_lighthouse', False),
+    }
+    if not params['filename'] or not params['sheet'] or not params['table']:
+        raise ValueError('Paramètres manquants')
+    if params['mode'] == 'create':
+        params['table'] = clean_column_name(params['table'])
+    return params
+
+
+# --- Plan de chargement ---
+
+def needs_table_keys(params, data):
+    """Append sans on_conflict : lire les clés de la table existante (RPC get_table_keys) avant plan_load."""
+    return params['mode'] == 'append' and not data.get('on_conflict')
+
+
+def plan_load(df, params, data, replace=False, table_keys=None):
+    """
+    Plan de chargement de la table cible : clé on_conflict vérifiée, puis en mode create
+    layout (clé, index, partitions : voir table_layout) et SQL.
+    replace : DROP + CREATE (/process_excel) au lieu de CREATE TABLE IF NOT EXISTS (/filter).
+    table_keys : clés de la table existante (append sans on_conflict), reprises comme on_conflict.
+    merge : un append avec clé met à jour les lignes déjà présentes (réservation modifiée ou annulée
+    dans un rapport plus récent : le fichier fait foi). En mode create, la table ne contient que les
+    lignes de cet import : un doublon ne peut être qu'un lot renvoyé à la reprise, il est ignoré.
+    Lève ValueError si la clé on_conflict est invalide.
+    """
+    table, mode = params['table'], params['mode']
+    on_conflict = pipeline.check_conflict_key(df, data.get('on_conflict'))
+    if on_conflict is None and mode == 'append':
+        on_conflict = table_layout.existing_key(df.columns, table_keys)
+    plan = {
+        'table': table, 'mode': mode, 'on_conflict': on_conflict,
+        'partition': bool(data.get('partition_by_month')), 'layout': None, 'create_sql': None,
+        'merge': mode == 'append' and bool(on_conflict),
+        'pre_insert_sql': [], 'post_load_sql': '', 'batch_size': BATCH_SIZE, 'settle_seconds': SETTLE_SECONDS,
+    }
+    if mode == 'create':
+        layout = table_layout.plan_layout(df, plan['on_conflict'], plan['partition'])
+        if replace:
+            create_sql = pipeline.build_replace_table_sql(df, table, params.get('types'),
+                                                          unique_key=layout['on_conflict'], layout=layout)
+        else:
+            create_sql = pipeline.build_create_table_sql(df, table, layout=layout)
+        plan.update(layout=layout, on_conflict=layout['on_conflict'], create_sql=create_sql,
+                    post_load_sql=table_layout.post_load_sql(table, layout))
+    return plan
+
+
+def begin(imports, data, params, plan, source_path, n_records):
+    """
+    Journal de l'import : un nouvel essai avec le même import_id reprend au dernier lot confirmé.
+    Lève ImportConflict (409).
+    """
+    source = {k: params[k] for k in ('sheet', 'columns', 'mapping', 'types') if k in params}
+    return imports.begin(
+        data.get('import_id'), plan['table'], plan['mode'],
+        fingerprint(source_path, n_records, on_conflict=plan['on_conflict'], partition=plan['partition'], **source),
+        n_records, batch_size=plan['batch_size'], conflict_key=plan['on_conflict'])
+
+
+def sql_file_text(plan):
+    """Contenu du .sql téléchargeable (mode create)."""
+    return f"{plan['create_sql']}\n\n-- Après chargement des données\n{plan['post_load_sql']}"
+
+
+def load_message(plan, total_inserted, already, excel=False):
+    action = "créée et remplie" if plan['mode'] == 'create' else "mise à jour"
+    resumed = f", reprise après {already} lignes déjà confirmées" if already else ""
+    rows = "lignes" if excel else "lignes ajoutées"
+    if plan['merge']:
+        # merge-duplicates : PostgREST ne dit pas combien de lignes étaient déjà présentes
+        rows = f"lignes envoyées, déjà présentes mises à jour (clé {plan['on_conflict']})"
+    table = f"Table Excel '{plan['table']}'" if excel else f"Table '{plan['table']}'"
+    return f"✅ {table} {action} ({total_inserted} {rows}{resumed})."
+
+
+def load_error_status(error, checkpoint):
+    return (f"⚠️ Erreur Supabase API : {str(error)} "
+            f"(relancer avec import_id={checkpoint.import_id} pour reprendre)")
+
+
+# --- Nuitées (rapport D-Edge) : une ligne par nuit de séjour dans <table>_nuits ---
+
+def stay_nights_table(table_name):
+    return f"{table_name}_nuits"
+
+
+def plan_stay_nights(df_nights, references, table_name, mode, table_exists=False):
+    """
+    Plan de chargement de la table de faits <table>_nuits (voir stay_nights), même mode que la table brute.
+    La table existe déjà après un premier rapport (CREATE TABLE IF NOT EXISTS) : les nuits des réservations
+    du rapport (references, annulées comprises) sont supprimées avant l'insertion, un rapport rechargé
+    ne compte donc pas deux fois ses nuits. Clé unique (reference, date_nuit), ajoutée aussi aux tables
+    créées avant elle : un lot renvoyé à la reprise est ignoré.
+    table_exists : pas d'attente settle_seconds (le CREATE TABLE IF NOT EXISTS ne change pas le schéma).
+    """
+    nights_table = stay_nights_table(table_name)
+    layout = table_layout.plan_layout(df_nights)
+    layout.update(key=stay_nights.FACT_UNIQUE_KEY, key_kind='unique')
+    return {
+        'table': nights_table, 'mode': mode, 'on_conflict': ','.join(stay_nights.FACT_UNIQUE_KEY), 'merge': False,
+        'partition': False, 'layout': layout,
+        'create_sql': pipeline.build_create_table_sql(df_nights, nights_table, layout=layout,
+                                                      column_types=stay_nights.FACT_COLUMN_TYPES),
+        'pre_insert_sql': [table_layout.unique_key_sql(nights_table, stay_nights.FACT_UNIQUE_KEY)]
+                          + pipeline.build_delete_rows_sql(nights_table, stay_nights.REFERENCE_COL, references),
+        'post_load_sql': table_layout.post_load_sql(nights_table, layout),
+        'batch_size': stay_nights.INSERT_BATCH_SIZE, 'settle_seconds': 0 if table_exists else SETTLE_SECONDS,
+    }
+
+
+def begin_stay_nights(imports, plan, import_id, input_path, n_records):
+    """
+    Journal séparé (<import_id>-nuits) : relancer /filter avec le même import_id reprend aussi ce chargement
+    au dernier lot confirmé (DELETE au premier lot seulement, lot renvoyé ignoré par la clé unique).
+    Lève ImportConflict.
+    """
+    return imports.begin(f"{import_id[:58]}-nuits", plan['table'], plan['mode'],
+                         fingerprint(input_path, n_records, part='nuits'), n_records, batch_size=plan['batch_size'],
+                         conflict_key=plan['on_conflict'])
+
+
+def stay_nights_summary(plan, checkpoint=None, error=None):
+    """Résumé du chargement des nuitées pour la réponse de /filter."""
+    if checkpoint is None:
+        return {"table": plan['table'], "status": "failed", "error": str(error)}
+    summary = dict(checkpoint.summary(), table=plan['table'])
+    if error is not None:
+        summary['error'] = str(error)
+    return summary
+
+
+def stay_nights_status(summary, n_rows):
+    long_stays = summary.get('long_stays')
+    ignored = ""
+    if long_stays:
+        ignored = f", {long_stays} séjour(s) de plus de {stay_nights.MAX_STAY_NIGHTS} nuits ignoré(s)"
+    if summary['status'] == 'done':
+        return f" Nuitées : '{summary['table']}' ({n_rows} lignes{ignored})."
+    return f" ⚠️ Nuitées non chargées : {summary['error']}"
+
+
+# --- Réponses ---
+
+def filter_response(plan, output_filename, sql_path, import_status, checkpoint, **fields):
+    """Réponse JSON de /filter (fields : storage_url, otb_snapshot, csv_report, stay_nights)."""
+    return {
+        "download_url": f"/download/{output_filename}",
+        "sql_url": f"/download/{os.path.basename(sql_path)}" if plan['mode'] == 'create' else "",
+        "table_name": plan['table'],
+        "import_status": import_status,
+        "create_table_sql": plan['create_sql'] or NO_CREATE_SQL,
+        "storage_url": fields.get('storage_url', ""),
+        "otb_snapshot": fields.get('otb_snapshot'),
+        "csv_report": fields.get('csv_report'),
+        "table_layout": plan['layout'],
+        "import_id": checkpoint.import_id,
+        "import": checkpoint.summary(),
+        "stay_nights": fields.get('stay_nights'),
+    }
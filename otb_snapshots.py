@@ -0,0 +1,285 @@
+"""
+Snapshots "on the books" (OTB) des réservations D-Edge, pour le pickup et le pace.
+
+À chaque import du rapport "réservations en cours", on enregistre un snapshot compact :
+nuitées (chambres x nuits) et revenu par date de séjour x hôtel x segment, daté par la date
+de capture. Stockage en colonnes NumPy (un .npz par date de capture dans SNAPSHOT_FOLDER).
+
+Les requêtes (pickup entre deux captures, courbes de pace) travaillent sur toutes les captures
+empilées en mémoire et sont entièrement vectorisées (np.add.at / indexation).
+"""
+import os
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import stay_nights
+from stay_nights import ARRIVAL_COL, DEPARTURE_COL, SEGMENT_COLUMNS, EPOCH
+from utils import file_lock, hotel_key
+
+SNAPSHOT_FOLDER = os.getenv('SNAPSHOT_FOLDER', 'snapshots')
+
+
+def is_reservation_report(columns):
+    """Le fichier ressemble-t-il au rapport de réservations D-Edge (noms nettoyés) ?"""
+    return ARRIVAL_COL in columns and (DEPARTURE_COL in columns or 'nuits' in columns)
+
+
+def _codes(values):
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna('').astype(str))
+    return codes.astype(np.int32), np.asarray(uniques, dtype=str)
+
+
+def build_snapshot(df):
+    """Agrégat compact (stay_day, hotel, segment) -> rooms, revenue pour un rapport D-Edge (noms nettoyés)."""
+    nights = stay_nights.expand(df)
+    hotel_src = df['hotel'].to_numpy() if 'hotel' in df.columns else np.full(len(df), 'ALL', dtype=object)
+    segment_col = next((c for c in SEGMENT_COLUMNS if c in df.columns), None)
+    segment_src = df[segment_col].to_numpy() if segment_col else np.full(len(df), 'ALL', dtype=object)
+
+    hotel_codes, hotels = _codes(hotel_src)
+    segment_codes, segments = _codes(segment_src)
+
+    keys = pd.DataFrame({
+        'stay_day': nights['stay_day'],
+        'hotel': hotel_codes[nights['row']],
+        'segment': segment_codes[nights['row']],
+        'rooms': nights['rooms'],
+        'revenue': nights['revenue'],
+    })
+    agg = keys.groupby(['stay_day', 'hotel', 'segment'], sort=True).sum().reset_index()
+    return {
+        'stay_day': agg['stay_day'].to_numpy(np.int32),
+        'hotel': agg['hotel'].to_numpy(np.int32),
+        'segment': agg['segment'].to_numpy(np.int32),
+        'rooms': agg['rooms'].to_numpy(np.float32),
+        'revenue': agg['revenue'].to_numpy(np.float64),
+        'hotels': hotels,
+        'segments': segments,
+    }
+
+
+class SnapshotStore:
+    def __init__(self, folder=SNAPSHOT_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stack = None
+        self._stack_key = None
+
+    def __getstate__(self):
+        # Passage à un ProcessPoolExecutor (asgi_app en mode 'process') : ni verrou ni cache
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    # --- Écriture ---
+
+    def _path(self, capture):
+        return os.path.join(self.folder, f"{pd.Timestamp(capture).date().isoformat()}.npz")
+
+    def record(self, df, capture_date=None):
+        """
+        Enregistre le snapshot d'un import. Si une capture existe déjà pour ce jour,
+        les hôtels présents dans le nouvel import remplacent les anciens (les autres sont conservés).
+        """
+        capture = pd.Timestamp(capture_date or date.today()).date()
+        snap = build_snapshot(df)
+        path = self._path(capture)
+
+        # Deux imports du même jour dans deux workers : lecture + fusion + écriture sous verrou
+        with file_lock(path):
+            if os.path.exists(path):
+                old = self._read(path)
+                keep = ~np.isin(old['hotels'][old['hotel']], snap['hotels'])
+                snap = self._merge(old, keep, snap)
+
+            tmp = path + '.tmp.npz'
+            np.savez(tmp, **snap)
+            os.replace(tmp, path)
+        return {'capture_date': capture.isoformat(), 'keys': int(len(snap['stay_day'])),
+                'room_nights': float(snap['rooms'].sum()), 'revenue': round(float(snap['revenue'].sum()), 2)}
+
+    @staticmethod
+    def _merge(old, keep, new):
+        hotels = np.unique(np.concatenate([old['hotels'], new['hotels']]))
+        segments = np.unique(np.concatenate([old['segments'], new['segments']]))
+        remap = lambda vocab, codes, target: np.searchsorted(target, vocab[codes]).astype(np.int32)
+        return {
+            'stay_day': np.concatenate([old['stay_day'][keep], new['stay_day']]),
+            'hotel': np.concatenate([remap(old['hotels'], old['hotel'][keep], hotels),
+                                     remap(new['hotels'], new['hotel'], hotels)]),
+            'segment': np.concatenate([remap(old['segments'], old['segment'][keep], segments),
+                                       remap(new['segments'], new['segment'], segments)]),
+            'rooms': np.concatenate([old['rooms'][keep], new['rooms']]),
+            'revenue': np.concatenate([old['revenue'][keep], new['revenue']]),
+            'hotels': hotels,
+            'segments': segments,
+        }
+
+    # --- Lecture ---
+
+    @staticmethod
+    def _read(path):
+        with np.load(path, allow_pickle=False) as data:
+            return {k: data[k] for k in data.files}
+
+    def captures(self):
+        names = sorted(f for f in os.listdir(self.folder) if f.endswith('.npz') and not f.endswith('.tmp.npz'))
+        return [n[:-4] for n in names]
+
+    def hotels(self):
+        return [str(h) for h in self._stacked()['hotels']]
+
+    def _stacked(self):
+        """
+        Toutes les captures empilées (colonnes + capture_day), vocabulaire hôtels/segments unifié.
+        Recalculé seulement si un fichier a changé.
+        """
+        names = self.captures()
+        key = tuple((n, os.path.getmtime(os.path.join(self.folder, n + '.npz'))) for n in names)
+        with self._lock:
+            if self._stack_key == key:
+                return self._stack
+            snaps = [self._read(os.path.join(self.folder, n + '.npz')) for n in names]
+            hotels = np.unique(np.concatenate([s['hotels'] for s in snaps])) if snaps else np.array([], dtype=str)
+            segments = np.unique(np.concatenate([s['segments'] for s in snaps])) if snaps else np.array([], dtype=str)
+            capture_days = [(np.datetime64(n, 'D') - EPOCH).astype(np.int64) for n in names]
+            parts = {k: [] for k in ('capture_day', 'stay_day', 'hotel', 'segment', 'rooms', 'revenue')}
+            for cday, s in zip(capture_days, snaps):
+                parts['capture_day'].append(np.full(len(s['stay_day']), cday, dtype=np.int32))
+                parts['stay_day'].append(s['stay_day'])
+                parts['hotel'].append(np.searchsorted(hotels, s['hotels'][s['hotel']]).astype(np.int32))
+                parts['segment'].append(np.searchsorted(segments, s['segments'][s['segment']]).astype(np.int32))
+                parts['rooms'].append(s['rooms'])
+                parts['revenue'].append(s['revenue'])
+            stack = {k: (np.concatenate(v) if v else np.array([], dtype=np.int32)) for k, v in parts.items()}
+            stack['hotels'] = hotels
+            stack['hotel_keys'] = np.array([hotel_key(h) for h in hotels], dtype=str)
+            stack['segments'] = segments
+            stack['capture_days'] = np.array(capture_days, dtype=np.int64)
+            self._stack, self._stack_key = stack, key
+            return stack
+
+    def _mask(self, stack, hotel=None, segment=None, stay_from=None, stay_to=None):
+        mask = np.ones(len(stack['stay_day']), dtype=bool)
+        if hotel is not None:
+            # Hôtel comparé sur son identité normalisée (même clé que les rate shops)
+            mask &= np.isin(stack['hotel'], np.flatnonzero(stack['hotel_keys'] == hotel_key(hotel)))
+        if segment is not None:
+            if segment not in stack['segments']:
+                return np.zeros(len(mask), dtype=bool)
+            mask &= stack['segment'] == np.searchsorted(stack['segments'], segment)
+        if stay_from is not None:
+            mask &= stack['stay_day'] >= _day(stay_from)
+        if stay_to is not None:
+            mask &= stack['stay_day'] <= _day(stay_to)
+        return mask
+
+    def otb(self, capture, hotel=None, segment=None, stay_from=None, stay_to=None):
+        """OTB d'une capture par date de séjour."""
+        stack = self._stacked()
+        mask = self._mask(stack, hotel, segment, stay_from, stay_to) & (stack['capture_day'] == _day(capture))
+        return _by_stay_day(stack['stay_day'][mask], stack['rooms'][mask], stack['revenue'][mask])
+
+    def otb_matrix(self, capture, hotels, stay_from, n_days):
+        """Nuitées d'une capture sous forme de matrice hôtel x date de séjour (n_days jours à partir de stay_from)."""
+        stack = self._stacked()
+        out = np.zeros((len(hotels), n_days))
+        # Code hôtel du stack -> ligne de la matrice (-1 si non demandé), sur l'identité normalisée
+        rows_by_key = {hotel_key(h): i for i, h in enumerate(hotels)}
+        row_of = np.array([rows_by_key.get(k, -1) for k in stack['hotel_keys']] + [-1], dtype=np.int64)
+        first = _day(stay_from)
+        col = stack['stay_day'].astype(np.int64) - first
+        rows = row_of[stack['hotel']]
+        sel = (stack['capture_day'] == _day(capture)) & (rows >= 0) & (col >= 0) & (col < n_days)
+        np.add.at(out, (rows[sel], col[sel]), stack['rooms'][sel])
+        return out
+
+    def pickup(self, capture_from, capture_to, hotel=None, segment=None, stay_from=None, stay_to=None):
+        """
+        Pickup par date de séjour entre deux captures : OTB(to) - OTB(from).
+        Une date absente d'une capture compte pour 0.
+        """
+        stack = self._stacked()
+        base = self._mask(stack, hotel, segment, stay_from, stay_to)
+        c_from, c_to = _day(capture_from), _day(capture_to)
+        sel = base & ((stack['capture_day'] == c_from) | (stack['capture_day'] == c_to))
+        if not sel.any():
+            return pd.DataFrame(columns=['stay_date', 'rooms_from', 'rooms_to', 'pickup_rooms',
+                                         'revenue_from', 'revenue_to', 'pickup_revenue'])
+
+        stay = stack['stay_day'][sel]
+        side = (stack['capture_day'][sel] == c_to).astype(np.int64)  # 0 = from, 1 = to
+        lo = stay.min()
+        idx = stay - lo
+        width = int(idx.max()) + 1
+        rooms = np.zeros((2, width))
+        revenue = np.zeros((2, width))
+        np.add.at(rooms, (side, idx), stack['rooms'][sel])
+        np.add.at(revenue, (side, idx), stack['revenue'][sel])
+
+        present = (rooms != 0).any(axis=0) | (revenue != 0).any(axis=0)
+        days = np.arange(lo, lo + width)[present]
+        return pd.DataFrame({
+            'stay_date': (EPOCH + days.astype('timedelta64[D]')).astype('datetime64[ns]'),
+            'rooms_from': rooms[0, present],
+            'rooms_to': rooms[1, present],
+            'pickup_rooms': rooms[1, present] - rooms[0, present],
+            'revenue_from': revenue[0, present].round(2),
+            'revenue_to': revenue[1, present].round(2),
+            'pickup_revenue': (revenue[1, present] - revenue[0, present]).round(2),
+        })
+
+    def pace(self, stay_from, stay_to, hotel=None, segment=None, max_days_before=365):
+        """
+        Courbe de pace : OTB cumulé des dates de séjour [stay_from, stay_to] en fonction
+        du nombre de jours avant l'arrivée (days_before = stay_date - capture_date).
+        Pour chaque capture, seules les dates de séjour encore futures sont comptées.
+        """
+        stack = self._stacked()
+        mask = self._mask(stack, hotel, segment, stay_from, stay_to)
+        dba = stack['stay_day'][mask].astype(np.int64) - stack['capture_day'][mask]
+        keep = (dba >= 0) & (dba <= max_days_before)
+        dba = dba[keep]
+        rooms = np.zeros(max_days_before + 1)
+        revenue = np.zeros(max_days_before + 1)
+        np.add.at(rooms, dba, stack['rooms'][mask][keep])
+        np.add.at(revenue, dba, stack['revenue'][mask][keep])
+
+        # Jours avant arrivée pour lesquels une capture existe (pas de "trou" à 0 si capture manquante)
+        cdays = stack['capture_days']
+        lo = np.maximum(_day(stay_from) - cdays, 0)
+        hi = np.minimum(_day(stay_to) - cdays, max_days_before)
+        ok = lo <= hi
+        coverage = np.zeros(max_days_before + 2, dtype=np.int64)
+        np.add.at(coverage, lo[ok], 1)
+        np.add.at(coverage, hi[ok] + 1, -1)
+        days_before = np.flatnonzero(np.cumsum(coverage)[:-1] > 0)[::-1]
+        return pd.DataFrame({'days_before': days_before, 'rooms': rooms[days_before],
+                             'revenue': revenue[days_before].round(2)})
+
+
+def to_records(df):
+    """DataFrame de résultat -> liste JSON (dates ISO jj)."""
+    out = df.copy()
+    if 'stay_date' in out.columns:
+        out['stay_date'] = pd.to_datetime(out['stay_date']).dt.strftime('%Y-%m-%d')
+    return out.to_dict(orient='records')
+
+
+def _day(value):
+    return int((np.datetime64(pd.Timestamp(value).date(), 'D') - EPOCH).astype(np.int64))
+
+
+def _by_stay_day(stay_day, rooms, revenue):
+    if len(stay_day) == 0:
+        return pd.DataFrame(columns=['stay_date', 'rooms', 'revenue'])
+    df = pd.DataFrame({'stay_day': stay_day, 'rooms': rooms, 'revenue': revenue})
+    agg = df.groupby('stay_day', sort=True).sum().reset_index()
+    agg.insert(0, 'stay_date', (EPOCH + agg.pop('stay_day').to_numpy().astype('timedelta64[D]')).astype('datetime64[ns]'))
+    agg['revenue'] = agg['revenue'].round(2)
+    return agg
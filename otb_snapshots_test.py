@@ -0,0 +1,69 @@
+import tempfile
+
+import pandas as pd
+
+from otb_snapshots import SnapshotStore
+
+
+def _report(rows):
+    """Rapport D-Edge minimal (noms de colonnes nettoyés)."""
+    return pd.DataFrame(rows, columns=['etat', 'reference', 'hotel', 'date_d_arrivee', 'date_de_depart',
+                                       'chambres', 'montant_total', 'origine'])
+
+
+FIRST = _report([
+    ['Validée', 'A', 'Hôtel Alpha', '01/03/2026', '03/03/2026', 1, '200,00', 'Booking.com'],
+    ['Validée', 'B', 'Hôtel Alpha', '02/03/2026', '03/03/2026', 2, '150,00', 'Direct'],
+    ['Annulée', 'C', 'Hôtel Alpha', '01/03/2026', '05/03/2026', 1, '400,00', 'Direct'],
+    ['Validée', 'D', 'Hôtel Beta', '01/03/2026', '02/03/2026', 1, '80,00', 'Direct'],
+])
+
+
+def test_record_and_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = SnapshotStore(tmp).record(FIRST, '2026-02-01')
+        assert summary['capture_date'] == '2026-02-01'
+        assert summary['room_nights'] == 5 and summary['revenue'] == 430.0  # annulée exclue
+
+        # Relu depuis le .npz par un autre store (autre worker)
+        store = SnapshotStore(tmp)
+        assert store.captures() == ['2026-02-01']
+        assert store.hotels() == ['Hôtel Alpha', 'Hôtel Beta']
+        otb = store.otb('2026-02-01', hotel='HOTEL ALPHA')  # même identité normalisée (utils.hotel_key)
+        assert otb['stay_date'].dt.strftime('%Y-%m-%d').tolist() == ['2026-03-01', '2026-03-02']
+        assert otb['rooms'].tolist() == [1, 3] and otb['revenue'].tolist() == [100.0, 250.0]
+        assert store.otb('2026-01-31').empty  # pas de capture ce jour-là
+
+
+def test_same_day_capture_replaces_only_its_hotels():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(tmp)
+        store.record(FIRST, '2026-02-01')
+        beta = _report([['Validée', 'E', 'Hôtel Beta', '04/03/2026', '06/03/2026', 3, '300,00', 'Direct']])
+        store.record(beta, '2026-02-01')
+        otb = store.otb('2026-02-01')
+        by_day = dict(zip(otb['stay_date'].dt.strftime('%Y-%m-%d'), otb['rooms']))
+        # Alpha conservé, ancienne nuit de Beta (01/03, D) remplacée par le nouvel import
+        assert by_day == {'2026-03-01': 1, '2026-03-02': 3, '2026-03-04': 3, '2026-03-05': 3}
+
+
+def test_pickup_between_captures():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(tmp)
+        store.record(FIRST, '2026-02-01')
+        later = FIRST.copy()
+        later.loc[later['reference'] == 'B', 'etat'] = 'Annulée'
+        later.loc[len(later)] = ['Validée', 'F', 'Hôtel Alpha', '03/03/2026', '04/03/2026', 2, '180,00', 'Direct']
+        store.record(later, '2026-02-08')
+        pickup = store.pickup('2026-02-01', '2026-02-08', hotel='Hôtel Alpha')
+        got = dict(zip(pickup['stay_date'].dt.strftime('%Y-%m-%d'), pickup['pickup_rooms']))
+        assert got == {'2026-03-01': 0, '2026-03-02': -2, '2026-03-03': 2}
+        assert pickup['pickup_revenue'].sum() == 30.0
+        assert store.captures() == ['2026-02-01', '2026-02-08']
+
+
+if __name__ == '__main__':
+    test_record_and_reload()
+    test_same_day_capture_replaces_only_its_hotels()
+    test_pickup_between_captures()
+    print("✅ otb_snapshots: snapshot relu à l'identique, capture du jour fusionnée par hôtel, pickup entre captures")
@@ -0,0 +1,288 @@
+"""
+Étapes pandas (CPU) des imports, partagées par le serveur Flask (app.py) et le mode ASGI (asgi_app.py).
+Aucune I/O réseau ici: uniquement lecture de fichiers locaux et transformations.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+import column_executor
+import csv_reader
+import excel_handler
+import otb_snapshots
+import stay_nights
+import table_layout
+from utils import clean_column_name, infer_sql_type, split_datetime_columns, format_all_dates
+
+# Liste des colonnes dates techniques qu'on veut regrouper après 'reference'
+TECHNICAL_DATE_COLS = [
+    'date_d_achat', 'heure_d_achat',
+    'date_modification', 'heure_modification',
+    'date_d_annulation', 'heure_d_annulation'
+]
+
+# Valeurs par ordre DELETE ... IN (...) : requêtes exec_sql de taille bornée
+DELETE_CHUNK_SIZE = 5000
+
+
+# --- CSV ---
+
+def read_uploaded_csv(filepath, preview_rows=200):
+    """Lecture rapide du début du CSV uploadé (pour proposer les colonnes). None si illisible."""
+    try:
+        df, _report = csv_reader.read_csv(filepath, nrows=preview_rows)
+        return df
+    except Exception:
+        return None
+
+
+def preview_csv_columns(df):
+    """
+    Simulation du pré-traitement pour avoir les 'bonnes' colonnes (avec split date/heure).
+    On renvoie les noms nettoyés comme référence "source" pour le mapping
+    (ex: "reservation" au lieu de "Réservation", mieux pour le mapping auto).
+    """
+    df_preview = split_datetime_columns(df)
+    return [clean_column_name(c) for c in df_preview.columns]
+
+
+def read_csv_for_import(input_path):
+    """
+    Lecture complète en une passe (dialecte détecté sur les premiers Ko, voir csv_reader).
+    Retourne (df, rapport) ; le rapport liste les lignes mal formées ignorées.
+    """
+    return csv_reader.read_csv(input_path)
+
+
+def prepare_csv_import(df, selected_columns, mode, column_mapping):
+    """
+    Transformation du CSV (/filter) : split date/heure, noms nettoyés, sélection,
+    ordre des colonnes (create) ou mapping (append), nettoyage texte et dates.
+    """
+    # 1. Split datetime (créer date_d_achat, heure_d_achat...)
+    df_filtered = split_datetime_columns(df)
+
+    # 2. Nettoyer TOUS les noms pour matcher ceux du frontend
+    df_filtered.columns = [clean_column_name(c) for c in df_filtered.columns]
+
+    # 3. Filtrage selon la sélection du front (qui utilise les noms clean)
+    valid_cols = [c for c in selected_columns if c in df_filtered.columns]
+    df_filtered = df_filtered[valid_cols]
+
+    if mode == 'create':
+        # Réorganiser colonnes (Business Logic pour placer les dates après la référence)
+        cols = df_filtered.columns.tolist()
+        new_order = []
+        inserted = False
+
+        for col in cols:
+            if col == 'reference' and not inserted:
+                new_order.append(col)
+                for dt_col in TECHNICAL_DATE_COLS:
+                    if dt_col in cols:
+                        new_order.append(dt_col)
+                inserted = True
+            elif col not in TECHNICAL_DATE_COLS:
+                new_order.append(col)
+
+        if not inserted:
+            # Fallback si 'reference' pas trouvé
+            new_order = [c for c in cols if c not in TECHNICAL_DATE_COLS] + [c for c in TECHNICAL_DATE_COLS if c in cols]
+
+        df_filtered = df_filtered[new_order]
+
+    elif mode == 'append':
+        # l'utilisateur envoie { "col_csv_clean": "col_db" }
+        if column_mapping:
+            df_filtered = df_filtered.rename(columns=column_mapping)
+            # On ne garde que les colonnes mappées (celles qui sont maintenant des noms DB valides)
+            target_cols = set(column_mapping.values())
+            df_filtered = df_filtered[[c for c in df_filtered.columns if c in target_cols]]
+
+    df_filtered = df_filtered.copy()
+
+    # 4. Nettoyer données textuelles (toujours)
+    # Exclure colonnes date/heure pour éviter d'introduire "0" dans des champs DATE/TIME
+    text_cols = [col for col in df_filtered.select_dtypes(include='object').columns
+                 if 'date' not in col and 'heure' not in col]
+    df_filtered = column_executor.map_columns(df_filtered, ascii_text_column, text_cols)
+
+    # Nettoyage explicite des colonnes date/heure
+    for col in df_filtered.columns:
+        if 'date' in col or 'heure' in col:
+            df_filtered[col] = df_filtered[col].replace({'0': None, 0: None, '': None})
+
+    # 5. Formater toutes les dates (toujours)
+    return format_all_dates(df_filtered)
+
+
+def ascii_text_column(series):
+    """Texte sans accents (unidecode, une fois par valeur distincte) ; vides -> ''."""
+    codes, uniques = pd.factorize(series.astype(str).where(series.notna(), 'nan'))
+    cleaned = np.array([unidecode(x) if x != 'nan' else '' for x in uniques], dtype=object)
+    return pd.Series(cleaned[codes], index=series.index, dtype=object)
+
+
+def record_otb_snapshot(df, store, capture_date=None):
+    """
+    Snapshot OTB (otb_snapshots) si le CSV est un rapport de réservations D-Edge.
+    Ne bloque jamais l'import : None si non applicable ou en cas d'erreur.
+    """
+    df_named = df.rename(columns=clean_column_name)
+    if not otb_snapshots.is_reservation_report(df_named.columns):
+        return None
+    try:
+        return store.record(df_named, capture_date)
+    except Exception as e:
+        print(f"Info/Erreur snapshot OTB: {e}")
+        return None
+
+
+def build_stay_nights(df):
+    """
+    (table de faits par nuit, références du rapport, séjours trop longs : voir stay_nights.fact_table)
+    si le CSV est un rapport de réservations D-Edge avec une colonne reference, sinon None. Calculée sur
+    toutes les colonnes du rapport, pas seulement la sélection. Sans reference, les nuits d'un rapport
+    rechargé ne pourraient pas être remplacées (comptées deux fois) : pas de table de nuitées.
+    """
+    df_named = df.rename(columns=clean_column_name)
+    if not otb_snapshots.is_reservation_report(df_named.columns):
+        return None
+    if stay_nights.REFERENCE_COL not in df_named.columns:
+        print("Info: rapport sans colonne reference, table de nuitées non chargée")
+        return None
+    facts, long_stays = stay_nights.fact_table(df_named)
+    return facts, stay_nights.report_references(df_named), long_stays
+
+
+def build_create_table_sql(df, table_name, unique_key=None, layout=None, column_types=None):
+    """
+    SQL CREATE TABLE IF NOT EXISTS (fichier .sql téléchargeable + exec_sql).
+    layout (table_layout.plan_layout) : contrainte on_conflict, partitions ; les index viennent après le chargement.
+    column_types : types SQL imposés ({colonne: type}), les autres sont inférés.
+    """
+    column_types = column_types or {}
+    create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} (\n"
+    columns_defs = []
+    for col in df.columns:
+        sql_type = column_types.get(col) or infer_sql_type(df[col])
+        columns_defs.append(f"    {col} {sql_type}")
+    partition_clause, partitions = "", []
+    if layout:
+        extra_defs, partition_clause, partitions = table_layout.table_suffix_sql(table_name, layout)
+        columns_defs += [f"    {d}" for d in extra_defs]
+    elif unique_key:
+        # Requis par on_conflict (reprise sans doublons)
+        columns_defs.append(f"    UNIQUE ({unique_key})")
+    return "\n".join([create_table_sql + ",\n".join(columns_defs) + f"\n){partition_clause};"] + partitions)
+
+
+def build_delete_rows_sql(table_name, column, values, chunk_size=DELETE_CHUNK_SIZE):
+    """DELETE des lignes dont column vaut l'une des valeurs (texte), un ordre par tranche de chunk_size valeurs."""
+    statements = []
+    for i in range(0, len(values), chunk_size):
+        literals = ", ".join("'" + str(v).replace("'", "''") + "'" for v in values[i:i + chunk_size])
+        statements.append(f"DELETE FROM {table_name} WHERE {column} IN ({literals});")
+    return statements
+
+
+def check_conflict_key(df, key):
+    """Clé on_conflict (reprise idempotente) : identifiant SQL présent dans les colonnes importées."""
+    if not key:
+        return None
+    if clean_column_name(key) != key or key not in df.columns:
+        raise ValueError(f"Clé on_conflict invalide ou absente des colonnes importées: {key}")
+    return key
+
+
+def build_csv_records(df_filtered):
+    """Payload JSON des insertions /filter."""
+    # Nettoyage ULTIME : Remplacer tout "0" ou 0 par None dans tout le dataframe
+    df_clean = df_filtered.replace({'0': None, 0: None, '': None, pd.NA: None, float('nan'): None})
+    # S'assurer que les NaNs sont None (null en JSON)
+    df_clean = df_clean.where(pd.notnull(df_clean), None)
+    return json.loads(df_clean.to_json(orient='records', date_format='iso'))
+
+
+# --- Excel ---
+
+def read_excel_for_import(filepath, sheet_name, is_lighthouse=False):
+    # Custom Smart Logic (Detects Lighthouse or Planning)
+    if is_lighthouse:
+        df = excel_handler.read_smart_excel(filepath, sheet_name)
+    else:
+        df = excel_handler.read_excel_sheet(filepath, sheet_name)
+    # Split datetime logic (to match what we do for CSVs)
+    # Lighthouse dates are like "Jeu 15/01/2026", split_datetime_columns only touches known columns.
+    return split_datetime_columns(df)
+
+
+def preview_excel_columns(filepath, sheet_name, is_lighthouse=False):
+    df = read_excel_for_import(filepath, sheet_name, is_lighthouse)
+    return [clean_column_name(c) for c in df.columns]
+
+
+def prepare_excel_import(filepath, sheet_name, state_mode, selected_columns, column_mapping, column_types,
+                         is_lighthouse=False):
+    """Lecture + transformation d'une feuille Excel (/process_excel)."""
+    # Lecture + 1. Split colonnes Datetime
+    df = read_excel_for_import(filepath, sheet_name, is_lighthouse)
+
+    # 2. Nettoyage des noms de colonnes
+    df.columns = [clean_column_name(c) for c in df.columns]
+
+    # 3. Filtrage & Mapping (Similaire à CSV)
+    if selected_columns:
+        # On ne garde que les colonnes demandées
+        valid_cols = [c for c in selected_columns if c in df.columns]
+        df = df[valid_cols]
+
+    if state_mode == 'append' and column_mapping:
+        df = df.rename(columns=column_mapping)
+        # Garder uniquement les colonnes mappées (Destination DB names)
+        target_cols = set(column_mapping.values())
+        df = df[[c for c in df.columns if c in target_cols]]
+
+    # 4. Formatage dates (incluant les colonnes déclarées DATE par l'user)
+    force_dates = [orig for orig, t in column_types.items() if t == 'DATE']
+    df_clean = format_all_dates(df, force_dates=force_dates)
+
+    # 5. Nettoyage '0' / Empty -> None
+    return df_clean.where(pd.notnull(df_clean), None)
+
+
+def record_rate_shop(filepath, sheet_name, store, hotel, shop_date=None):
+    """
+    Matrice tarifaire (rate_matrix) d'une feuille Lighthouse, en plus de l'import de la table.
+    hotel = nom de l'hôtel dans les rapports D-Edge (pas de repli sur le nom de la table : les recommandations
+    ne retrouveraient pas le shop). Ne bloque jamais l'import : None si hotel absent ou en cas d'erreur.
+    """
+    if not hotel:
+        print("Info: rate shop non enregistré (paramètre 'hotel' absent)")
+        return None
+    try:
+        stay_dates, competitors, rates, status, _demand = excel_handler.read_lighthouse_rates(filepath, sheet_name)
+        return store.record(hotel, stay_dates, competitors, rates, status, shop_date)
+    except Exception as e:
+        print(f"Info/Erreur matrice tarifaire: {e}")
+        return None
+
+
+def build_replace_table_sql(df, table_name, column_types=None, unique_key=None, layout=None):
+    """DROP + CREATE (mode create de /process_excel). layout : voir build_create_table_sql."""
+    if column_types is None: column_types = {}
+    cols_def = []
+    for col in df.columns:
+        # Use provided type from UI, otherwise infer
+        sql_type = column_types.get(col, infer_sql_type(df[col]))
+        cols_def.append(f"{col} {sql_type}")
+    partition_clause, partitions = "", []
+    if layout:
+        extra_defs, partition_clause, partitions = table_layout.table_suffix_sql(table_name, layout)
+        cols_def += extra_defs
+    elif unique_key:
+        cols_def.append(f"UNIQUE ({unique_key})")
+    return " ".join([f"DROP TABLE IF EXISTS {table_name}; CREATE TABLE {table_name} ({', '.join(cols_def)})"
+                     f"{partition_clause};"] + partitions)
@@ -0,0 +1,182 @@
+"""
+Recommandations de prix (BAR) par hôtel x date de séjour.
+
+Entrées :
+- OTB et pickup (otb_snapshots) : occupation = nuitées / capacité, pickup sur `pickup_window_days`
+- Rate shop Lighthouse (rate_matrix) : notre tarif actuel et la médiane du compset
+
+Toutes les règles s'appliquent en une passe NumPy sur une matrice hôtels x jours :
+    ancre   = médiane compset x indice cible (mélangée avec notre tarif actuel), sinon notre tarif, sinon base_rate
+    prix    = ancre x facteur occupation (paliers) x facteur pickup x prime compset complet
+    bornes  = variation max vs tarif actuel, puis min_rate / max_rate, arrondi
+
+Un hôtel est identifié par utils.hotel_key de son nom (snapshots : nom D-Edge, rate shops : paramètre
+'hotel' de l'import Lighthouse, clés de 'capacities'). Un hôtel sans rate shop est une erreur (ValueError),
+pas un compset NaN. Capture OTB et rate shop : les derniers à la date as_of (recalcul d'une date passée).
+
+Les hôtels sont répartis par blocs dans le pool de process du worker (clients.get_process_pool : lecture
+des matrices tarifaires + calcul), le calcul des matrices OTB est fait une seule fois pour tous les hôtels.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import clients
+from otb_snapshots import EPOCH, _day
+from rate_matrix import RATES_FOLDER, RateStore
+from utils import hotel_key
+
+DEFAULT_RULES = {
+    'capacity': 100,                 # Chambres par hôtel si non précisé dans 'capacities'
+    'capacities': {},                # {"Hôtel X": 62, ...} (nom comparé via utils.hotel_key)
+    'base_rate': 150.0,              # Ancre si ni compset ni tarif actuel
+    # Paliers d'occupation : (seuil, multiplicateur), seuils croissants
+    'occupancy_bands': [[0.0, 0.90], [0.40, 0.95], [0.60, 1.00], [0.75, 1.08], [0.85, 1.15], [0.95, 1.25]],
+    'pickup_window_days': 7,
+    'pickup_weight': 1.0,            # +1% de prix par 1% de capacité prise sur la fenêtre
+    'max_pickup_adjustment': 0.15,
+    'compset_target_index': 100.0,   # Positionnement visé (100 = médiane du compset)
+    'compset_weight': 0.6,           # Part du compset dans l'ancre quand notre tarif est connu
+    'compset_sold_out_share': 0.5,   # Part du compset complet au-delà de laquelle on applique la prime
+    'compset_sold_out_premium': 1.10,
+    'max_change_pct': 0.25,          # Variation max vs tarif actuel
+    'min_rate': 60.0,
+    'max_rate': 900.0,
+    'round_to': 1.0,
+}
+
+RESULT_COLUMNS = ['hotel', 'stay_date', 'otb_rooms', 'occupancy', 'pickup_rooms', 'own_rate', 'compset_median',
+                  'anchor', 'recommended_rate', 'change_pct']
+
+
+def merge_rules(overrides=None):
+    rules = dict(DEFAULT_RULES)
+    for k, v in (overrides or {}).items():
+        if k not in DEFAULT_RULES:
+            raise ValueError(f"Règle inconnue: {k}")
+        rules[k] = v
+    return rules
+
+
+def recommend_prices(otb_rooms, pickup_rooms, capacity, own_rate, compset_median, compset_sold_out_share, rules):
+    """
+    Cœur vectorisé. Toutes les entrées sont des matrices hôtels x jours (capacity : vecteur par hôtel),
+    NaN pour un tarif inconnu. Retourne (anchor, recommended).
+    """
+    cap = np.asarray(capacity, dtype=np.float64)[:, None]
+    occupancy = otb_rooms / cap
+
+    thresholds = np.array([b[0] for b in rules['occupancy_bands']])
+    multipliers = np.array([b[1] for b in rules['occupancy_bands']])
+    band = np.clip(np.searchsorted(thresholds, occupancy, side='right') - 1, 0, len(thresholds) - 1)
+    occ_factor = multipliers[band]
+
+    pickup_factor = 1 + np.clip(rules['pickup_weight'] * pickup_rooms / cap,
+                                -rules['max_pickup_adjustment'], rules['max_pickup_adjustment'])
+
+    target = compset_median * (rules['compset_target_index'] / 100)
+    has_target = np.isfinite(target)
+    has_own = np.isfinite(own_rate)
+    w = rules['compset_weight']
+    anchor = np.where(has_target & has_own, w * target + (1 - w) * own_rate,
+                      np.where(has_target, target, np.where(has_own, own_rate, rules['base_rate'])))
+
+    sold_out = np.nan_to_num(compset_sold_out_share) >= rules['compset_sold_out_share']
+    price = anchor * occ_factor * pickup_factor * np.where(sold_out, rules['compset_sold_out_premium'], 1.0)
+
+    # Variation max par rapport au tarif actuel (ignorée si pas de tarif)
+    lo = np.where(has_own, own_rate * (1 - rules['max_change_pct']), -np.inf)
+    hi = np.where(has_own, own_rate * (1 + rules['max_change_pct']), np.inf)
+    price = np.clip(price, lo, hi)
+    price = np.clip(price, rules['min_rate'], rules['max_rate'])
+    step = rules['round_to'] or 1.0
+    return anchor, np.round(price / step) * step
+
+
+def _compset_inputs(rates, hotel, start, n_days, as_of):
+    """(own_rate, compset_median, sold_out_share) du dernier shop de l'hôtel à as_of (vérifié par recommend)."""
+    shop = _on_or_before(rates.shop_dates(hotel), as_of)
+    end = str(EPOCH + np.int64(_day(start) + n_days - 1))
+    cs = rates.compset(hotel, shop, stay_from=start, stay_to=end)
+    total = cs['compset_available'] + cs['compset_sold_out']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sold_out_share = (cs['compset_sold_out'] / total.where(total > 0)).to_numpy(np.float64)
+    return (cs['own_rate'].to_numpy(np.float64), cs['compset_median'].to_numpy(np.float64), sold_out_share)
+
+
+def _price_chunk(hotels, otb_rooms, pickup_rooms, start, n_days, rules, rates_folder, as_of):
+    """Un bloc d'hôtels (exécuté dans un process du pool)."""
+    rates = RateStore(rates_folder)
+    inputs = [_compset_inputs(rates, h, start, n_days, as_of) for h in hotels]
+    own = np.array([i[0] for i in inputs]).reshape(len(hotels), n_days)
+    median = np.array([i[1] for i in inputs]).reshape(len(hotels), n_days)
+    sold_out = np.array([i[2] for i in inputs]).reshape(len(hotels), n_days)
+    capacities = {hotel_key(h): c for h, c in rules['capacities'].items()}
+    capacity = [capacities.get(hotel_key(h), rules['capacity']) for h in hotels]
+
+    anchor, price = recommend_prices(otb_rooms, pickup_rooms, capacity, own, median, sold_out, rules)
+
+    n = len(hotels)
+    days = np.tile(np.arange(n_days) + _day(start), n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = (price / own - 1) * 100
+    return pd.DataFrame({
+        'hotel': np.repeat(np.array(hotels, dtype=object), n_days),
+        'stay_date': (EPOCH + days.astype('timedelta64[D]')).astype('datetime64[ns]'),
+        'otb_rooms': otb_rooms.ravel(),
+        'occupancy': np.round(otb_rooms / np.asarray(capacity, dtype=np.float64)[:, None], 3).ravel(),
+        'pickup_rooms': pickup_rooms.ravel(),
+        'own_rate': own.ravel(),
+        'compset_median': median.ravel(),
+        'anchor': np.round(anchor, 2).ravel(),
+        'recommended_rate': price.ravel(),
+        'change_pct': np.round(change, 1).ravel(),
+    })
+
+
+def _on_or_before(dates, day):
+    """Dernière date ISO (capture OTB, rate shop) antérieure ou égale à day, None si aucune."""
+    eligible = [c for c in dates if c <= day]
+    return eligible[-1] if eligible else None
+
+
+def recommend(snapshots, hotels=None, start=None, n_days=365, rules=None, as_of=None,
+              rates_folder=RATES_FOLDER, workers=None, chunk_size=8):
+    """
+    Recommandations pour tous les hôtels (ceux des snapshots OTB par défaut) sur n_days jours à partir de start.
+    workers=1 : calcul dans le process courant.
+    """
+    rules = merge_rules(rules)
+    start = pd.Timestamp(start or date.today()).date().isoformat()
+    captures = snapshots.captures()
+    as_of = pd.Timestamp(as_of or date.today()).date().isoformat()
+    capture = _on_or_before(captures, as_of) if captures else None
+    if hotels is None:
+        hotels = snapshots.hotels()
+    if not hotels:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    store = RateStore(rates_folder)
+    missing = [h for h in hotels if not _on_or_before(store.shop_dates(h), as_of)]
+    if missing:
+        raise ValueError(f"Aucun rate shop au {as_of} pour {', '.join(map(str, missing))} : importer le rapport "
+                         f"Lighthouse avec 'hotel' = nom de l'hôtel dans le rapport D-Edge")
+
+    # OTB actuel et pickup : une seule passe sur le stack pour tous les hôtels
+    if capture:
+        otb = snapshots.otb_matrix(capture, hotels, start, n_days)
+        ref_day = str(np.datetime64(capture) - np.timedelta64(rules['pickup_window_days'], 'D'))
+        ref = _on_or_before(captures, ref_day)
+        pickup = otb - snapshots.otb_matrix(ref, hotels, start, n_days) if ref else np.zeros_like(otb)
+    else:
+        otb = np.zeros((len(hotels), n_days))
+        pickup = np.zeros_like(otb)
+
+    chunks = [slice(i, i + chunk_size) for i in range(0, len(hotels), chunk_size)]
+    args = [(hotels[s], otb[s], pickup[s], start, n_days, rules, rates_folder, as_of) for s in chunks]
+    workers = workers or min(len(chunks), clients.PROCESS_WORKERS)
+    if workers <= 1 or len(chunks) == 1:
+        parts = [_price_chunk(*a) for a in args]
+    else:
+        parts = list(clients.get_process_pool().map(_price_chunk, *zip(*args)))
+    return pd.concat(parts, ignore_index=True)
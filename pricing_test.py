@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import pricing
+from excel_handler import RATE_OK
+from otb_snapshots import SnapshotStore
+from rate_matrix import RateStore
+
+# Hôtel de 10 chambres, nuits du 01/03 et du 02/03/2026 : (référence, arrivée, départ, chambres) par capture
+BOOKINGS = {
+    '2026-02-01': [('A', '01/03/2026', '03/03/2026', 4), ('B', '02/03/2026', '03/03/2026', 5)],
+    '2026-02-08': [('A', '01/03/2026', '03/03/2026', 4), ('B', '02/03/2026', '03/03/2026', 5),
+                   ('C', '01/03/2026', '02/03/2026', 1)],
+    # Après as_of : ne doit pas compter
+    '2026-02-15': [('A', '01/03/2026', '03/03/2026', 4), ('B', '02/03/2026', '03/03/2026', 5),
+                   ('C', '01/03/2026', '02/03/2026', 1), ('D', '01/03/2026', '03/03/2026', 4)],
+}
+# Rate shops : notre tarif puis deux concurrents (le shop du 12/02 est postérieur à as_of)
+SHOPS = {'2026-02-05': [100, 120, 140], '2026-02-12': [300, 400, 400]}
+RULES = {'capacities': {'HOTEL ALPHA': 10}, 'max_change_pct': 0.5}
+
+
+def _fixture(tmp):
+    snapshots = SnapshotStore(os.path.join(tmp, 'snapshots'))
+    for capture, rows in BOOKINGS.items():
+        report = pd.DataFrame([['Validée', ref, 'Hôtel Alpha', arrival, departure, rooms, '100,00']
+                               for ref, arrival, departure, rooms in rows],
+                              columns=['etat', 'reference', 'hotel', 'date_d_arrivee', 'date_de_depart',
+                                       'chambres', 'montant_total'])
+        snapshots.record(report, capture)
+    rates = RateStore(os.path.join(tmp, 'rates'))
+    for shop, row in SHOPS.items():
+        rates.record('Hotel Alpha', ['2026-03-01', '2026-03-02'], ['Alpha', 'Beta', 'Gamma'],
+                     np.array([row, row], dtype=np.float32), np.full((2, 3), RATE_OK, dtype=np.int8), shop_date=shop)
+    return snapshots, rates.folder
+
+
+def test_recommendation_on_fixture():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshots, rates_folder = _fixture(tmp)
+        df = pricing.recommend(snapshots, start='2026-03-01', n_days=2, rules=RULES, as_of='2026-02-10',
+                               rates_folder=rates_folder, workers=1)
+    assert df['hotel'].tolist() == ['Hôtel Alpha'] * 2
+    assert df['otb_rooms'].tolist() == [5, 9]      # capture du 08/02
+    assert df['pickup_rooms'].tolist() == [1, 0]   # vs capture du 01/02 (fenêtre de 7 jours)
+    assert df['occupancy'].tolist() == [0.5, 0.9]  # capacité trouvée malgré la graphie 'HOTEL ALPHA'
+    assert df['own_rate'].tolist() == [100, 100] and df['compset_median'].tolist() == [130, 130]  # shop du 05/02
+    # ancre 0.6 x 130 + 0.4 x 100 = 118 ; 118 x 0.95 x 1.10 = 123.3 ; 118 x 1.15 x 1.00 = 135.7
+    assert df['anchor'].tolist() == [118, 118]
+    assert df['recommended_rate'].tolist() == [123, 136]
+    assert df['change_pct'].tolist() == [23, 36]
+
+
+def test_as_of_before_any_shop_is_an_error():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshots, rates_folder = _fixture(tmp)
+        try:
+            pricing.recommend(snapshots, start='2026-03-01', n_days=2, as_of='2026-02-04', rates_folder=rates_folder,
+                              workers=1)
+            raise AssertionError("recommandation sans rate shop à la date as_of")
+        except ValueError as e:
+            assert '2026-02-04' in str(e)
+
+
+if __name__ == '__main__':
+    test_recommendation_on_fixture()
+    test_as_of_before_any_shop_is_an_error()
+    print("✅ pricing: capture et rate shop à la date as_of, capacité par identité d'hôtel, prix attendus")
@@ -0,0 +1,229 @@
+"""
+Stockage "rate shopping" Lighthouse : une matrice dense par hôtel et par date de shop.
+
+Chaque shop est une matrice float32 date de séjour x concurrent (NaN si pas de tarif) accompagnée
+d'un masque int8 de statuts (excel_handler.RATE_*), au lieu des colonnes texte avec 'x'.
+Fichiers : RATES_FOLDER/<hotel>/<shop_date>.rates.npy / .status.npy, relus en mémoire mappée
+(np.load(mmap_mode='r')) : seules les pages touchées par une requête sont lues.
+
+<hotel>/meta.json garde l'axe des concurrents (ordre stable, colonne 0 = notre hôtel par défaut)
+et la première date de séjour de chaque shop.
+"""
+import json
+import os
+import threading
+import warnings
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from excel_handler import RATE_MISSING, RATE_SOLD_OUT, RATE_STATUS_LABELS
+from utils import file_lock, hotel_key
+
+RATES_FOLDER = os.getenv('RATES_FOLDER', 'rates')
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def _day(value):
+    return int((np.datetime64(pd.Timestamp(value).date(), 'D') - EPOCH).astype(np.int64))
+
+
+def _dates(days):
+    return (EPOCH + np.asarray(days, dtype=np.int64).astype('timedelta64[D]')).astype('datetime64[ns]')
+
+
+class RateStore:
+    def __init__(self, folder=RATES_FOLDER):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Passage à un ProcessPoolExecutor (asgi_app en mode 'process')
+        return {'folder': self.folder}
+
+    def __setstate__(self, state):
+        self.__init__(state['folder'])
+
+    # --- Fichiers / méta ---
+
+    def _hotel_dir(self, hotel):
+        return os.path.join(self.folder, hotel_key(hotel))
+
+    def _meta(self, hotel):
+        path = os.path.join(self._hotel_dir(hotel), 'meta.json')
+        if not os.path.exists(path):
+            return {'hotel': hotel, 'competitors': [], 'own': None, 'shops': {}}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_meta(self, hotel, meta):
+        path = os.path.join(self._hotel_dir(hotel), 'meta.json')
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def hotels(self):
+        return sorted(d for d in os.listdir(self.folder) if os.path.isdir(os.path.join(self.folder, d)))
+
+    def shop_dates(self, hotel):
+        return sorted(self._meta(hotel)['shops'])
+
+    # --- Écriture ---
+
+    def record(self, hotel, stay_dates, competitors, rates, status, shop_date=None, own=None):
+        """
+        Enregistre un shop (sortie de excel_handler.read_lighthouse_rates).
+        Les lignes sont réindexées sur un axe de dates continu, les colonnes sur l'axe concurrents de l'hôtel.
+        """
+        shop = pd.Timestamp(shop_date or date.today()).date().isoformat()
+        days = (np.asarray(pd.DatetimeIndex(stay_dates).values.astype('datetime64[D]')) - EPOCH).astype(np.int64)
+        if len(days) == 0:
+            raise ValueError("Aucune date de séjour dans la feuille.")
+
+        os.makedirs(self._hotel_dir(hotel), exist_ok=True)
+        # meta.json est partagé par tous les shops de l'hôtel : verrou entre threads et entre workers
+        with self._lock, file_lock(os.path.join(self._hotel_dir(hotel), 'meta.json')):
+            meta = self._meta(hotel)
+            for c in competitors:
+                if c not in meta['competitors']:
+                    meta['competitors'].append(c)
+            meta['own'] = own or meta['own'] or competitors[0]
+
+            first = int(days.min())
+            n_days = int(days.max()) - first + 1
+            col_idx = np.array([meta['competitors'].index(c) for c in competitors])
+            dense = np.full((n_days, len(meta['competitors'])), np.nan, dtype=np.float32)
+            dense_status = np.full(dense.shape, RATE_MISSING, dtype=np.int8)
+            dense[np.ix_(days - first, col_idx)] = rates
+            dense_status[np.ix_(days - first, col_idx)] = status
+
+            base = os.path.join(self._hotel_dir(hotel), shop)
+            # Fichier temporaire + os.replace : un lecteur (mmap) ne voit jamais une matrice à moitié écrite
+            for suffix, array in (('.rates.npy', dense), ('.status.npy', dense_status)):
+                with open(base + suffix + '.tmp', 'wb') as f:
+                    np.save(f, array)
+                os.replace(base + suffix + '.tmp', base + suffix)
+            meta['shops'][shop] = {'stay_start': str(EPOCH + first), 'n_competitors': len(meta['competitors'])}
+            self._save_meta(hotel, meta)
+        return {'hotel': hotel, 'shop_date': shop, 'stay_dates': n_days, 'competitors': len(competitors),
+                'rates': int(np.isfinite(rates).sum())}
+
+    # --- Lecture ---
+
+    def matrix(self, hotel, shop_date):
+        """(stay_days int64, competitors, rates memmap, status memmap) d'un shop."""
+        meta = self._meta(hotel)
+        shop = pd.Timestamp(shop_date).date().isoformat()
+        if shop not in meta['shops']:
+            raise KeyError(f"Aucun shop {shop} pour {hotel}")
+        base = os.path.join(self._hotel_dir(hotel), shop)
+        rates = np.load(base + '.rates.npy', mmap_mode='r')
+        status = np.load(base + '.status.npy', mmap_mode='r')
+        first = _day(meta['shops'][shop]['stay_start'])
+        stay_days = np.arange(first, first + rates.shape[0])
+        return stay_days, meta['competitors'][:rates.shape[1]], rates, status
+
+    def cube(self, hotel, shop_dates=None, stay_from=None, stay_to=None):
+        """
+        Empilement shops x dates de séjour x concurrents sur un axe de séjour commun (NaN si absent).
+        Retourne (shops, stay_days, competitors, rates, status).
+        """
+        meta = self._meta(hotel)
+        shops = sorted(meta['shops'] if shop_dates is None else shop_dates)
+        shops = [pd.Timestamp(s).date().isoformat() for s in shops]
+        mats = [self.matrix(hotel, s) for s in shops]
+        if not mats:
+            return shops, np.array([], dtype=np.int64), meta['competitors'], np.empty((0, 0, 0), np.float32), \
+                np.empty((0, 0, 0), np.int8)
+
+        lo = min(m[0][0] for m in mats) if stay_from is None else _day(stay_from)
+        hi = max(m[0][-1] for m in mats) if stay_to is None else _day(stay_to)
+        n_comp = len(meta['competitors'])
+        rates = np.full((len(mats), max(hi - lo + 1, 0), n_comp), np.nan, dtype=np.float32)
+        status = np.full(rates.shape, RATE_MISSING, dtype=np.int8)
+        for i, (days, _, r, s) in enumerate(mats):
+            a, b = max(lo, days[0]), min(hi, days[-1])
+            if a > b:
+                continue
+            src = slice(a - days[0], b - days[0] + 1)
+            dst = slice(a - lo, b - lo + 1)
+            rates[i, dst, :r.shape[1]] = r[src]
+            status[i, dst, :s.shape[1]] = s[src]
+        return shops, np.arange(lo, hi + 1), meta['competitors'], rates, status
+
+    # --- Requêtes vectorisées ---
+
+    def compset(self, hotel, shop_date, own=None, stay_from=None, stay_to=None):
+        """
+        Par date de séjour : min / médiane / max du compset (hors notre hôtel), notre tarif,
+        notre rang (1 = le moins cher parmi les tarifs disponibles), indice de prix (notre tarif / médiane x 100).
+        """
+        meta = self._meta(hotel)
+        own = own or meta['own']
+        shops, days, competitors, rates, status = self.cube(hotel, [shop_date], stay_from, stay_to)
+        r = rates[0]
+        own_idx = competitors.index(own)
+        own_rate = r[:, own_idx]
+        comp = np.delete(r, own_idx, axis=1)
+
+        available = np.isfinite(comp).sum(axis=1)
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Dates sans aucun tarif concurrent
+            cmin = np.nanmin(comp, axis=1)
+            cmed = np.nanmedian(comp, axis=1)
+            cmax = np.nanmax(comp, axis=1)
+            rank = np.where(np.isfinite(own_rate), (comp < own_rate[:, None]).sum(axis=1) + 1, np.nan)
+            index = own_rate.astype(np.float64) / cmed * 100
+
+        return pd.DataFrame({
+            'stay_date': _dates(days),
+            'own_rate': own_rate,
+            'own_status': [RATE_STATUS_LABELS[int(s)] for s in status[0][:, own_idx]],
+            'compset_min': cmin,
+            'compset_median': cmed,
+            'compset_max': cmax,
+            'compset_available': available,
+            'compset_sold_out': (np.delete(status[0], own_idx, axis=1) == RATE_SOLD_OUT).sum(axis=1),
+            'rank': rank,
+            'price_index': np.round(index, 1),
+        })
+
+    def rate_changes(self, hotel, shop_dates=None, stay_from=None, stay_to=None):
+        """
+        Variations de tarif d'un shop au suivant (jour sur jour) pour chaque date de séjour et concurrent.
+        Seules les cellules qui changent (valeur ou statut) sont renvoyées.
+        """
+        shops, days, competitors, rates, status = self.cube(hotel, shop_dates, stay_from, stay_to)
+        if len(shops) < 2:
+            return pd.DataFrame(columns=['shop_date', 'stay_date', 'competitor', 'previous_rate', 'rate', 'change',
+                                         'previous_status', 'status'])
+        prev, cur = rates[:-1], rates[1:]
+        prev_s, cur_s = status[:-1], status[1:]
+        with np.errstate(invalid='ignore'):
+            value_changed = (prev != cur) & np.isfinite(prev) & np.isfinite(cur)
+        changed = value_changed | (prev_s != cur_s)
+        # Les cases absentes des deux côtés ne comptent pas
+        changed &= ~((prev_s == RATE_MISSING) & (cur_s == RATE_MISSING))
+        i, j, k = np.nonzero(changed)
+        return pd.DataFrame({
+            'shop_date': np.array(shops[1:])[i],
+            'stay_date': _dates(days[j]),
+            'competitor': np.array(competitors, dtype=object)[k],
+            'previous_rate': prev[i, j, k],
+            'rate': cur[i, j, k],
+            'change': cur[i, j, k] - prev[i, j, k],
+            'previous_status': [RATE_STATUS_LABELS[int(s)] for s in prev_s[i, j, k]],
+            'status': [RATE_STATUS_LABELS[int(s)] for s in cur_s[i, j, k]],
+        })
+
+
+def to_records(df):
+    """DataFrame de résultat -> liste JSON (NaN -> null, dates ISO)."""
+    out = df.copy()
+    if 'stay_date' in out.columns:
+        out['stay_date'] = pd.to_datetime(out['stay_date']).dt.strftime('%Y-%m-%d')
+    return json.loads(out.to_json(orient='records'))
@@ -0,0 +1,65 @@
+import tempfile
+
+import numpy as np
+
+from excel_handler import RATE_MISSING, RATE_OK, RATE_SOLD_OUT
+from rate_matrix import RateStore
+
+NAN = np.nan
+
+
+def _shop(store, shop_date, stay_dates, competitors, rates, status):
+    return store.record('Hôtel Alpha', stay_dates, competitors, np.array(rates, dtype=np.float32),
+                        np.array(status, dtype=np.int8), shop_date=shop_date)
+
+
+def test_memmap_shape_and_lookup():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateStore(tmp)
+        # 03/03 absent de la feuille : ligne NaN / manquante dans la matrice dense
+        summary = _shop(store, '2026-02-01', ['2026-03-01', '2026-03-02', '2026-03-04'], ['Alpha', 'Beta', 'Gamma'],
+                        [[100, 120, NAN], [110, 130, 90], [105, NAN, 95]],
+                        [[RATE_OK, RATE_OK, RATE_SOLD_OUT], [RATE_OK] * 3, [RATE_OK, RATE_MISSING, RATE_OK]])
+        assert summary['stay_dates'] == 4 and summary['rates'] == 7
+
+        days, competitors, rates, status = RateStore(tmp).matrix('HOTEL ALPHA', '2026-02-01')
+        assert isinstance(rates, np.memmap) and isinstance(status, np.memmap)
+        assert rates.shape == status.shape == (4, 3) and rates.dtype == np.float32
+        assert competitors == ['Alpha', 'Beta', 'Gamma']
+        assert rates[1, 2] == 90 and np.isnan(rates[2]).all() and (status[2] == RATE_MISSING).all()
+
+        cs = store.compset('Hôtel Alpha', '2026-02-01', stay_from='2026-03-01', stay_to='2026-03-02')
+        assert cs['own_rate'].tolist() == [100, 110]
+        assert cs['compset_median'].tolist() == [120, 110]
+        assert cs['compset_sold_out'].tolist() == [1, 0]
+        assert cs['rank'].tolist() == [1, 2]
+
+
+def test_new_competitor_and_rate_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RateStore(tmp)
+        _shop(store, '2026-02-01', ['2026-03-01', '2026-03-02'], ['Alpha', 'Beta'],
+              [[100, 120], [110, 130]], [[RATE_OK] * 2] * 2)
+        # Shop suivant : un concurrent de plus (colonne ajoutée à l'axe), séjour décalé d'un jour
+        _shop(store, '2026-02-02', ['2026-03-02', '2026-03-03'], ['Alpha', 'Delta', 'Beta'],
+              [[115, 99, 130], [120, 98, NAN]], [[RATE_OK] * 3, [RATE_OK, RATE_OK, RATE_SOLD_OUT]])
+        assert store.shop_dates('Hôtel Alpha') == ['2026-02-01', '2026-02-02']
+
+        _, competitors, old, _ = store.matrix('Hôtel Alpha', '2026-02-01')
+        assert old.shape == (2, 2)  # Shop écrit avant Delta : pas réécrit
+        shops, days, competitors, rates, status = store.cube('Hôtel Alpha')
+        assert competitors == ['Alpha', 'Beta', 'Delta'] and rates.shape == (2, 3, 3)
+        assert np.isnan(rates[0, :, 2]).all() and rates[1, 1].tolist() == [115, 130, 99]
+
+        changes = store.rate_changes('Hôtel Alpha')
+        got = {(c.stay_date.strftime('%d/%m'), c.competitor): (c.previous_status, c.status, c.change)
+               for c in changes.itertuples()}
+        assert got[('02/03', 'Alpha')][2] == 5
+        assert ('02/03', 'Beta') not in got  # tarif inchangé
+        assert got[('03/03', 'Beta')][1] != got[('03/03', 'Beta')][0]  # manquant -> complet
+
+
+if __name__ == '__main__':
+    test_memmap_shape_and_lookup()
+    test_new_competitor_and_rate_changes()
+    print("✅ rate_matrix: matrice dense relue en mmap, compset par date de séjour, axe concurrents et variations")
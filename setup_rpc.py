@@ -35,6 +35,26 @@ AS $$
 $$;
 """
 
+# Clés uniques d'une table (PRIMARY KEY d'abord) : on_conflict automatique des imports en mode append
+sql_get_keys = """
+CREATE OR REPLACE FUNCTION get_table_keys(t_name text)
+RETURNS TABLE(key_columns text[], is_primary boolean)
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+  SELECT array_agg(a.attname::text ORDER BY k.ord), i.indisprimary
+  FROM pg_index i
+  JOIN pg_class c ON c.oid = i.indrelid
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  CROSS JOIN LATERAL unnest(i.indkey) WITH ORDINALITY AS k(attnum, ord)
+  JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+  WHERE n.nspname = 'public' AND c.relname = t_name
+    AND i.indisunique AND i.indpred IS NULL AND i.indexprs IS NULL
+  GROUP BY i.indexrelid, i.indisprimary
+  ORDER BY i.indisprimary DESC;
+$$;
+"""
+
 try:
     print("Création de get_public_tables...")
     supabase.rpc("exec_sql", {"query": sql_get_tables}).execute()
@@ -43,6 +63,10 @@ try:
     print("Création de get_table_columns...")
     supabase.rpc("exec_sql", {"query": sql_get_columns}).execute()
     print("✅ OK")
+
+    print("Création de get_table_keys...")
+    supabase.rpc("exec_sql", {"query": sql_get_keys}).execute()
+    print("✅ OK")
     
     # Pause pour propagation schema cache
     time.sleep(2)
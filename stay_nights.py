@@ -0,0 +1,157 @@
+"""
+Nuitées : une ligne par nuit de séjour pour chaque réservation D-Edge (noms de colonnes nettoyés).
+
+Expansion vectorisée (np.repeat + décalages de dates), sans boucle Python par réservation :
+les dates, montants et états sont convertis une fois par valeur distincte, puis chaque réservation
+active (Etat ≠ annulée, arrivée valide, au moins une nuit) est répétée autant de fois qu'elle a de nuits.
+Le montant total est réparti également entre les nuits.
+
+Utilisé par les snapshots OTB (otb_snapshots.build_snapshot) et pour la table de faits
+<table>_nuits chargée à côté de la table brute par /filter (occupation et prix moyen par date de séjour :
+SUM(chambres), SUM(revenu) / SUM(chambres)). Un rapport rechargé (append, nouvel export) remplace les
+nuits de ses réservations : DELETE par reference puis insertion (voir import_service.plan_stay_nights),
+une ligne par (reference, date_nuit) (clé unique de la table).
+
+Un séjour de plus de MAX_STAY_NIGHTS nuits (date de départ aberrante : 2099) n'est pas développé :
+il est compté et signalé (comme les lignes mal formées du rapport CSV) au lieu de produire des millions de lignes.
+"""
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+# Colonnes D-Edge (noms nettoyés par clean_column_name)
+ARRIVAL_COL = 'date_d_arrivee'
+DEPARTURE_COL = 'date_de_depart'
+SEGMENT_COLUMNS = ['segment', 'origine', 'type_d_origine']
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+# Table de faits : colonnes descriptives reprises de la réservation (si présentes) et types SQL
+REFERENCE_COL = 'reference'
+FACT_KEY_COLUMNS = [REFERENCE_COL, 'hotel']
+FACT_UNIQUE_KEY = [REFERENCE_COL, 'date_nuit']
+FACT_COLUMN_TYPES = {'date_nuit': 'DATE', 'chambres': 'INTEGER', 'revenu': 'NUMERIC(12,2)'}
+# Lignes étroites : lots d'insertion plus gros que pour la table brute
+INSERT_BATCH_SIZE = 2000
+
+MAX_STAY_NIGHTS = 365
+MAX_LONG_STAY_SAMPLES = 20
+
+
+def _distinct(series, convert):
+    """convert(valeurs distinctes) appliqué puis redistribué (les exports répètent beaucoup les valeurs)."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return convert(pd.Series(uniques, dtype=object))[codes]
+
+
+def _to_days(series):
+    """Dates jj/mm/aaaa (ou ISO) -> jours depuis 1970 (int64), -1 si invalide."""
+    def convert(values):
+        parsed = pd.to_datetime(values, format='%d/%m/%Y', errors='coerce')
+        if parsed.isna().all():
+            parsed = pd.to_datetime(values, errors='coerce', dayfirst=True)
+        days = parsed.to_numpy(dtype='datetime64[D]')
+        out = (days - EPOCH).astype(np.int64)
+        out[np.isnat(days)] = -1
+        return out
+    return _distinct(series, convert)
+
+
+def _to_number(series):
+    """Montants "900,35" / "1 200,00" -> float."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=float)
+
+    def convert(values):
+        s = values.astype(str).str.replace('\xa0', '', regex=False).str.replace(' ', '', regex=False)
+        return pd.to_numeric(s.str.replace(',', '.', regex=False), errors='coerce').to_numpy(dtype=float)
+    return _distinct(series, convert)
+
+
+def active_mask(df):
+    """Exclut les réservations annulées (colonne 'etat')."""
+    if 'etat' not in df.columns:
+        return np.ones(len(df), dtype=bool)
+
+    def convert(values):
+        etat = values.astype(str).map(lambda v: unidecode(v).strip().lower())
+        return ~etat.str.startswith('annul').to_numpy()
+    return _distinct(df['etat'], convert)
+
+
+def expand(df):
+    """
+    Une ligne par nuit de séjour (vectorisé : répétition + décalages de dates).
+    Retourne un dict de colonnes NumPy : row (index de la réservation), stay_day, rooms, revenue,
+    et too_long (index des réservations actives de plus de MAX_STAY_NIGHTS nuits, non développées).
+    """
+    arrival = _to_days(df[ARRIVAL_COL])
+    if DEPARTURE_COL in df.columns:
+        nights = _to_days(df[DEPARTURE_COL]) - arrival
+    else:
+        nights = np.nan_to_num(_to_number(df['nuits'])).astype(np.int64)
+    rooms = np.nan_to_num(_to_number(df['chambres'])) if 'chambres' in df.columns else np.ones(len(df))
+    amount = np.nan_to_num(_to_number(df['montant_total'])) if 'montant_total' in df.columns else np.zeros(len(df))
+
+    valid = active_mask(df) & (arrival >= 0) & (nights > 0)
+    too_long = valid & (nights > MAX_STAY_NIGHTS)
+    rows = np.flatnonzero(valid & ~too_long)
+    n = nights[rows]
+
+    # Décalage 0..n-1 pour chaque nuit : arange global moins le début de chaque bloc
+    starts = np.repeat(np.cumsum(n) - n, n)
+    offsets = np.arange(n.sum()) - starts
+    rep_rows = np.repeat(rows, n)
+    return {
+        'row': rep_rows,
+        'stay_day': arrival[rep_rows] + offsets,
+        'rooms': rooms[rep_rows],
+        'revenue': (amount[rows] / n)[np.repeat(np.arange(len(rows)), n)],  # revenu proratisé par nuit
+        'too_long': np.flatnonzero(too_long),
+    }
+
+
+def fact_table(df):
+    """
+    Table de faits par nuit : reference, hotel, segment (si présents), date_nuit, chambres, revenu.
+    Colonnes texte en category (une seule copie de chaque valeur), dates en datetime64,
+    chambres entières (colonne INTEGER, voir FACT_COLUMN_TYPES).
+    Une réservation présente plusieurs fois dans le rapport : la dernière ligne fait foi, comme pour l'upsert
+    de la table brute sur reference, d'où une seule ligne par (reference, date_nuit).
+    Retourne (faits, rapport des séjours trop longs : long_stays, long_stay_samples).
+    """
+    if REFERENCE_COL in df.columns:
+        ref = df[REFERENCE_COL]
+        df = df[~(ref.duplicated(keep='last') & ref.notna() & (ref.astype(str).str.strip() != ''))]
+    nights = expand(df)
+    rows = nights['row']
+    facts = {}
+    segment_col = next((c for c in SEGMENT_COLUMNS if c in df.columns), None)
+    for col in FACT_KEY_COLUMNS + ([segment_col] if segment_col else []):
+        if col in df.columns:
+            codes, uniques = pd.factorize(df[col])
+            facts['segment' if col == segment_col else col] = pd.Categorical.from_codes(codes[rows], uniques)
+    facts['date_nuit'] = (EPOCH + nights['stay_day'].astype('timedelta64[D]')).astype('datetime64[ns]')
+    facts['chambres'] = np.rint(nights['rooms']).astype(np.int32)
+    facts['revenu'] = np.round(nights['revenue'], 2)
+
+    too_long = nights['too_long']
+    if len(too_long):
+        print(f"Info: {len(too_long)} séjour(s) de plus de {MAX_STAY_NIGHTS} nuits ignoré(s) dans les nuitées")
+    report = {'long_stays': len(too_long), 'long_stay_samples': _stay_labels(df, too_long[:MAX_LONG_STAY_SAMPLES])}
+    return pd.DataFrame(facts), report
+
+
+def _stay_labels(df, rows):
+    """'reference : arrivée -> départ' (ou nombre de nuits) des réservations aux positions rows."""
+    sample = df.iloc[rows]
+    end = sample[DEPARTURE_COL] if DEPARTURE_COL in df.columns else sample['nuits'].astype(str) + ' nuits'
+    ref = sample[REFERENCE_COL] if REFERENCE_COL in df.columns else pd.Series(rows, index=sample.index)
+    return [f"{r} : {a} -> {e}" for r, a, e in zip(ref, sample[ARRIVAL_COL], end)]
+
+
+def report_references(df):
+    """Références distinctes du rapport, annulées comprises (leurs nuits déjà chargées sont à supprimer)."""
+    values = df[REFERENCE_COL].dropna()
+    values = values[values.astype(str).str.strip() != '']
+    return [str(v) for v in pd.unique(values)]
@@ -0,0 +1,240 @@
+"""
+Upload Supabase Storage en flux, par blocs et reprenable (protocole TUS, /storage/v1/upload/resumable).
+
+Le CSV de /filter est écrit à travers StreamingUpload.writer() : chaque bloc de CHUNK_SIZE octets
+est envoyé (PATCH) par un thread dès qu'il est écrit sur disque, pendant l'écriture puis pendant
+les insertions en base. La taille totale n'est connue qu'à la fin (Upload-Defer-Length) et
+envoyée avec le dernier bloc.
+
+Les blocs sont relus depuis le fichier local (rien n'est gardé en mémoire) : après une erreur
+réseau, HEAD donne l'offset reçu par le serveur et l'envoi reprend à cet endroit.
+"""
+import base64
+import io
+import os
+import threading
+import time
+
+import requests
+
+# Supabase impose des blocs de 6 Mo (sauf le dernier)
+CHUNK_SIZE = int(float(os.getenv('STORAGE_CHUNK_MB', 6)) * 1024 * 1024)
+MAX_RETRIES = 5
+# Attente max de la fin de l'upload après les insertions (avant de répondre)
+UPLOAD_TIMEOUT = int(os.getenv('STORAGE_UPLOAD_TIMEOUT', 600))
+TUS_VERSION = '1.0.0'
+
+
+def public_url(base_url, bucket, path):
+    return f"{base_url.rstrip('/')}/storage/v1/object/public/{bucket}/{path}"
+
+
+def _metadata(**values):
+    return ','.join(f"{k} {base64.b64encode(str(v).encode('utf-8')).decode('ascii')}" for k, v in values.items())
+
+
+class TusUpload:
+    """
+    Client TUS minimal (creation, creation-defer-length, HEAD pour la reprise).
+    Utilisé par le seul thread d'upload : ne pas lui passer une session partagée (clients.get_session).
+    """
+
+    def __init__(self, base_url, key, bucket, object_name, content_type='text/csv', upsert=False, session=None):
+        self.base_url = base_url.rstrip('/')
+        self.bucket = bucket
+        self.object_name = object_name
+        self.content_type = content_type
+        self.upsert = upsert
+        # Session propre à l'upload (requests.Session n'est pas thread-safe : jamais celle du thread de requête)
+        self.http = session or requests.Session()
+        self.headers = {'apikey': key, 'Authorization': f"Bearer {key}", 'Tus-Resumable': TUS_VERSION}
+        self.location = None
+
+    def create(self):
+        headers = dict(self.headers, **{
+            'Upload-Defer-Length': '1',
+            'Upload-Metadata': _metadata(bucketName=self.bucket, objectName=self.object_name,
+                                         contentType=self.content_type, cacheControl=3600),
+            'x-upsert': 'true' if self.upsert else 'false',
+        })
+        response = self.http.post(f"{self.base_url}/storage/v1/upload/resumable", headers=headers)
+        if response.status_code != 201:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        location = response.headers['Location']
+        self.location = location if location.startswith('http') else self.base_url + location
+        return self.location
+
+    def server_offset(self):
+        response = self.http.head(self.location, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        return int(response.headers['Upload-Offset'])
+
+    def patch(self, offset, chunk, total_length=None):
+        """Envoie un bloc à `offset`. Retourne le nouvel offset confirmé."""
+        headers = dict(self.headers, **{'Upload-Offset': str(offset),
+                                        'Content-Type': 'application/offset+octet-stream'})
+        if total_length is not None:
+            headers['Upload-Length'] = str(total_length)
+        response = self.http.patch(self.location, data=chunk, headers=headers)
+        if response.status_code != 204:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        return int(response.headers['Upload-Offset'])
+
+
+class _TeeFile(io.RawIOBase):
+    """Fichier local qui signale chaque écriture au thread d'upload."""
+
+    def __init__(self, path, upload):
+        self._file = open(path, 'wb')
+        self._upload = upload
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        n = self._file.write(b)
+        self._upload._written(n)
+        return n
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._file.close()
+            self._upload._finished()
+
+
+class StreamingUpload:
+    """
+    Envoi en arrière-plan d'un fichier pendant son écriture.
+
+        upload = StreamingUpload(tus, output_path).start()
+        upload.write_csv(df, sep=';', ...)
+        ... (insertions en base pendant que l'envoi continue)
+        url = upload.result(timeout)   # lève l'erreur d'upload éventuelle
+    """
+
+    def __init__(self, tus, path, chunk_size=CHUNK_SIZE):
+        self.tus = tus
+        self.path = path
+        self.chunk_size = chunk_size
+        self._cond = threading.Condition()
+        self._size = 0
+        self._closed = False
+        self._aborted = False
+        self._error = None
+        self._thread = None
+        self.sent = 0
+        self.chunks = 0
+        self.retries = 0
+        self.rewinds = 0
+        self.elapsed = None
+
+    # --- Côté écrivain ---
+
+    def writer(self, encoding='utf-8'):
+        """Fichier texte à passer à df.to_csv."""
+        return io.TextIOWrapper(io.BufferedWriter(_TeeFile(self.path, self), buffer_size=64 * 1024),
+                                encoding=encoding, newline='')
+
+    def write_csv(self, df, encoding='utf-8', **kwargs):
+        """df.to_csv à travers writer() ; un CSV incomplet (erreur d'écriture) n'est jamais finalisé."""
+        try:
+            with self.writer(encoding) as f:
+                df.to_csv(f, **kwargs)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        with self._cond:
+            self._aborted = True
+            self._cond.notify()
+
+    def _written(self, n):
+        with self._cond:
+            self._size += n
+            self._cond.notify()
+
+    def _finished(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    # --- Thread d'upload ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='storage-upload', daemon=True)
+        self._thread.start()
+        return self
+
+    def _next_chunk(self):
+        """(offset, taille, dernier ?) du prochain bloc complet, en attendant l'écrivain si besoin."""
+        with self._cond:
+            while not self._closed and not self._aborted and self._size - self.sent < self.chunk_size:
+                self._cond.wait()
+            if self._aborted:
+                raise Exception("Écriture du fichier interrompue, upload annulé")
+            size = min(self.chunk_size, self._size - self.sent)
+            return self.sent, size, self._closed and self.sent + size == self._size
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            self.tus.create()
+            with open(self.path, 'rb') as f:
+                while True:
+                    offset, size, last = self._next_chunk()
+                    f.seek(offset)
+                    chunk = f.read(size)
+                    self.sent = self._patch_with_retry(offset, chunk, self._size if last else None)
+                    self.chunks += 1
+                    if last and self.sent == self._size:
+                        break
+        except Exception as e:
+            # L'écrivain n'attend jamais l'upload : l'erreur est remontée par result()
+            self._error = e
+        finally:
+            self.elapsed = time.perf_counter() - t0
+
+    def _patch_with_retry(self, offset, chunk, total_length):
+        """Envoie le bloc ; retourne l'offset confirmé par le serveur (inférieur à `offset` s'il faut renvoyer)."""
+        end = offset + len(chunk)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if attempt:
+                    # Le serveur a pu recevoir tout ou partie du bloc (réponse perdue) : reprise à son offset
+                    received = self.tus.server_offset()
+                    if received < offset:
+                        break
+                    if received >= end and total_length is None:
+                        return received
+                    chunk, offset = chunk[received - offset:], received
+                return self.tus.patch(offset, chunk, total_length)
+            except Exception:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.retries += 1
+                time.sleep(min(0.2 * 2 ** attempt, 5))
+
+        # Offset serveur en recul (octets déjà confirmés perdus) : _run relit le fichier depuis cet offset
+        self.rewinds += 1
+        if self.rewinds > MAX_RETRIES:
+            raise Exception(f"Offset serveur en recul ({received} < {offset}), upload abandonné")
+        return received
+
+    def result(self, timeout=None):
+        """Attend la fin de l'upload ; URL publique de l'objet, ou lève l'erreur d'upload."""
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise TimeoutError("Upload Storage toujours en cours")
+        if self._error:
+            raise self._error
+        return public_url(self.tus.base_url, self.tus.bucket, self.tus.object_name)
+
+    def stats(self):
+        return {'bytes': self._size, 'chunks': self.chunks, 'retries': self.retries,
+                'upload_seconds': round(self.elapsed, 3) if self.elapsed is not None else None}
@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.stub_server import StubSupabase
+from storage_upload import StreamingUpload, TusUpload
+
+CHUNK = 16 * 1024
+DF = pd.DataFrame({'reference': [f"R{i:05d}" for i in range(4000)], 'note': 'é' * 20})
+
+
+def _upload(stub, tmp, name, tus=None):
+    tus = tus or TusUpload(stub.url, 'k', 'exports', name)
+    return StreamingUpload(tus, os.path.join(tmp, name), chunk_size=CHUNK).start()
+
+
+def _local(tmp, name):
+    with open(os.path.join(tmp, name), 'rb') as f:
+        return f.read()
+
+
+class _RewindingTus(TusUpload):
+    """Le serveur perd les octets du dernier bloc confirmé pendant le 3e PATCH (offset qui recule)."""
+
+    def __init__(self, state, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state = state
+        self.calls = 0
+
+    def patch(self, offset, chunk, total_length=None):
+        self.calls += 1
+        if self.calls == 3:
+            with self.state.lock:
+                upload = self.state.uploads[self.location.rsplit('/', 1)[-1]]
+                upload['offset'] -= CHUNK
+                del upload['data'][upload['offset']:]
+            raise ConnectionError("connexion coupée")
+        return super().patch(offset, chunk, total_length)
+
+
+def test_lost_response_resumes_at_server_offset():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        stub.state.fail_patches = {2}  # 2e bloc reçu par le serveur, réponse perdue
+        upload = _upload(stub, tmp, 'export.csv')
+        upload.write_csv(DF, sep=';', index=False)
+        url = upload.result(30)
+        data = _local(tmp, 'export.csv')
+        assert url.endswith('/storage/v1/object/public/exports/export.csv')
+        assert stub.state.objects['exports/export.csv'] == data
+        assert upload.retries == 1 and upload.rewinds == 0
+        # Rien n'est renvoyé : un PATCH par bloc, plus celui qui a perdu sa réponse
+        assert stub.state.patches == upload.chunks == -(-len(data) // CHUNK)
+        assert upload.stats()['bytes'] == len(data)
+
+
+def test_server_offset_going_back_resends_from_the_file():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        tus = _RewindingTus(stub.state, stub.url, 'k', 'exports', 'rewind.csv')
+        upload = _upload(stub, tmp, 'rewind.csv', tus)
+        upload.write_csv(DF, sep=';', index=False)
+        upload.result(30)
+        assert stub.state.objects['exports/rewind.csv'] == _local(tmp, 'rewind.csv')
+        assert upload.rewinds == 1 and upload.retries == 1
+
+
+def test_interrupted_write_is_never_finalized():
+    with tempfile.TemporaryDirectory() as tmp, StubSupabase() as stub:
+        upload = _upload(stub, tmp, 'partial.csv')
+
+        class Broken:
+            def to_csv(self, f, **kwargs):
+                f.write('reference;note\n' * 5000)
+                raise OSError("disque plein")
+
+        try:
+            upload.write_csv(Broken())
+            raise AssertionError("erreur d'écriture avalée")
+        except OSError:
+            pass
+        try:
+            upload.result(30)
+            raise AssertionError("upload finalisé malgré l'écriture interrompue")
+        except Exception as e:
+            assert 'interrompue' in str(e)
+        assert 'exports/partial.csv' not in stub.state.objects
+
+
+if __name__ == '__main__':
+    test_lost_response_resumes_at_server_offset()
+    test_server_offset_going_back_resends_from_the_file()
+    test_interrupted_write_is_never_finalized()
+    print("✅ storage_upload: reprise TUS à l'offset du serveur, offset en recul renvoyé, écriture interrompue non finalisée")
@@ -0,0 +1,51 @@
+"""
+Client Supabase asynchrone (PostgREST) pour le mode ASGI.
+Un seul httpx.AsyncClient partagé par processus: les connexions sont réutilisées
+entre les requêtes et les imports concurrents ne bloquent pas la boucle d'événements.
+"""
+import httpx
+
+from supabase_rest import insert_url, last_per_key, rest_headers
+
+
+class AsyncSupabase:
+    def __init__(self, url, key, max_connections=20, timeout=60.0):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.client = httpx.AsyncClient(
+            base_url=self.url,
+            headers={"apikey": key, "Authorization": f"Bearer {key}"},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def rpc(self, name, params=None):
+        response = await self.client.post(f"/rest/v1/rpc/{name}", json=params or {})
+        if response.status_code >= 400:
+            raise Exception(f"HTTP {response.status_code}: {response.text}")
+        return response.json() if response.content else None
+
+    async def insert_records(self, table_name, records, batch_size=500, on_conflict=None, checkpoint=None,
+                             merge=False):
+        """Même protocole que supabase_rest.insert_records (POST par lots, return=minimal, reprise, upsert)."""
+        headers = rest_headers(self.key, on_conflict, merge)
+        url = insert_url('', table_name, on_conflict)
+        total_inserted = 0
+        start = checkpoint.next_offset if checkpoint else 0
+        for i in range(start, len(records), batch_size):
+            batch = records[i:i + batch_size]
+            try:
+                response = await self.client.post(url, json=last_per_key(batch, on_conflict) if merge else batch,
+                                                  headers=headers)
+                if response.status_code not in (200, 201):
+                    raise Exception(f"HTTP {response.status_code}: {response.text}")
+                total_inserted += len(batch)
+                if checkpoint:
+                    checkpoint.commit(i, len(batch))
+            except Exception as e:
+                print(f"❌ Error inserting batch {i}: {e}")
+                raise e
+        return total_inserted
@@ -0,0 +1,99 @@
+"""
+Appels PostgREST directs (sans le SDK) pour les insertions en masse.
+"""
+import json
+
+import pandas as pd
+import requests
+
+
+def build_records(df):
+    """
+    Convert to standard python types for JSON (handles datetimes -> ISO strings).
+    We use json.loads(df.to_json) to ensure everything is JSON-compliant (NaN -> null, Dates -> ISO)
+    """
+    df_final = df.where(pd.notnull(df), None) # Ensure NaNs are None (null in JSON)
+    return json.loads(df_final.to_json(orient='records', date_format='iso'))
+
+
+class FrameRecords:
+    """
+    Lignes JSON d'un DataFrame construites lot par lot (insert_records ne fait que des tranches
+    records[i:i + batch_size]) : évite de matérialiser des millions de dicts (tables de nuitées).
+    """
+
+    def __init__(self, df):
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getitem__(self, key):
+        return build_records(self.df.iloc[key])
+
+
+def rest_headers(key, on_conflict=None, merge=False):
+    """
+    on_conflict : lignes déjà présentes (même clé unique) ignorées, un lot renvoyé après reprise ne duplique rien.
+    merge (append d'un rapport) : lignes déjà présentes mises à jour (upsert), le fichier fait foi.
+    """
+    headers = {
+        "apikey": key,
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal" # Don't return inserted rows (saves bandwidth)
+    }
+    if on_conflict:
+        resolution = "merge-duplicates" if merge else "ignore-duplicates"
+        headers["Prefer"] = f"resolution={resolution},return=minimal"
+    return headers
+
+
+def last_per_key(batch, on_conflict):
+    """
+    Upsert : une clé au plus une fois par lot (PostgreSQL refuse qu'un ON CONFLICT DO UPDATE modifie
+    deux fois la même ligne), dernière occurrence gardée comme entre deux lots. Clé avec NULL : jamais en conflit.
+    """
+    cols = on_conflict.split(',')
+    rows = {}
+    for n, row in enumerate(batch):
+        key = tuple(row.get(c) for c in cols)
+        rows[(n,) if None in key else key] = row
+    return list(rows.values()) if len(rows) < len(batch) else batch
+
+
+def insert_url(base_url, table_name, on_conflict=None):
+    url = f"{base_url.rstrip('/')}/rest/v1/{table_name}"
+    return f"{url}?on_conflict={on_conflict}" if on_conflict else url
+
+
+def insert_records(base_url, key, table_name, records, batch_size=500, session=None, on_conflict=None,
+                   checkpoint=None, merge=False):
+    """
+    POST des lignes par lots sur /rest/v1/<table>. Retourne le nombre de lignes envoyées.
+    checkpoint (import_journal.ImportCheckpoint) : reprise au premier lot non confirmé, offset
+    enregistré après chaque lot. merge : upsert sur on_conflict (voir rest_headers).
+    """
+    http = session or requests
+    headers = rest_headers(key, on_conflict, merge)
+    url = insert_url(base_url, table_name, on_conflict)
+    total_inserted = 0
+    start = checkpoint.next_offset if checkpoint else 0
+
+    for i in range(start, len(records), batch_size):
+        batch = records[i:i + batch_size]
+        try:
+            # We use direct requests to avoid SDK weirdness (URI Too Long 414)
+            response = http.post(url, json=last_per_key(batch, on_conflict) if merge else batch, headers=headers)
+
+            if response.status_code not in (200, 201):
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
+
+            total_inserted += len(batch)
+            if checkpoint:
+                checkpoint.commit(i, len(batch))
+        except Exception as e:
+            print(f"❌ Error inserting batch {i}: {e}")
+            raise e
+
+    return total_inserted
@@ -0,0 +1,148 @@
+"""
+Structure des tables créées par les imports (mode create), pensée pour les lectures
+(tableaux de bord, pickup : filtres sur date_d_arrivee / hotel / reference).
+
+- Clé : PRIMARY KEY sur reference si elle est unique et renseignée dans le fichier,
+  UNIQUE si unique avec des vides, simple index sinon (doublons : pas de contrainte possible).
+- Index : dates de séjour, (hotel, date_d_arrivee) ou (hotel, date_nuit) pour les tables de nuitées.
+- Partitionnement optionnel par mois sur date_d_arrivee (PARTITION BY RANGE) : une partition
+  par mois présent dans le fichier + DEFAULT (dates vides, mois ajoutés plus tard en append).
+  Une clé unique sur une table partitionnée doit contenir la colonne de partition :
+  la clé devient (reference, date_d_arrivee).
+
+Chargement en masse : clé et index sont créés après les insertions (post_load_sql), sauf la
+contrainte on_conflict, nécessaire pendant le chargement pour la reprise sans doublons.
+Tout est idempotent (IF NOT EXISTS) : une reprise d'import peut rejouer post_load_sql.
+
+La clé reste portée par la table : un import en mode append sans on_conflict reprend la clé
+de la table existante (RPC get_table_keys, voir existing_key) et met à jour les lignes déjà présentes
+(upsert : une réservation modifiée ou annulée dans un rapport plus récent remplace l'ancienne).
+"""
+import pandas as pd
+
+KEY_COLUMN = 'reference'
+STAY_DATE_COLUMNS = ['date_d_arrivee', 'date_de_depart', 'date_nuit']  # date_nuit : tables <table>_nuits
+HOTEL_COLUMNS = ['hotel', 'hotel_id_']  # Nom, puis "Hôtel (ID)" nettoyé
+PARTITION_COLUMN = 'date_d_arrivee'
+
+# Au-delà, dates probablement aberrantes : pas de partitionnement
+MAX_PARTITIONS = 240
+
+
+def _index_name(table_name, suffix):
+    return f"{table_name}_{suffix}"[:63]  # Limite des identifiants PostgreSQL
+
+
+def _months(series):
+    """Mois (Timestamp du 1er) présents dans une colonne de dates 'YYYY-MM-DD'."""
+    dates = pd.to_datetime(series, errors='coerce', format='%Y-%m-%d').dropna()
+    return sorted(set(dates.dt.to_period('M').dt.start_time))
+
+
+def plan_layout(df, unique_key=None, partition_by_month=False):
+    """
+    Structure de la table pour ce DataFrame (colonnes déjà nettoyées, dates formatées).
+    Retourne un dict : key (colonnes), key_kind (primary | unique | index | None), on_conflict,
+    indexes (liste de listes de colonnes), partition_column, partitions [(suffixe, début, fin)].
+    """
+    columns = list(df.columns)
+    layout = {'key': None, 'key_kind': None, 'on_conflict': unique_key, 'indexes': [],
+              'partition_column': None, 'partitions': []}
+
+    if partition_by_month and PARTITION_COLUMN in columns:
+        months = _months(df[PARTITION_COLUMN])
+        if len(months) > MAX_PARTITIONS:
+            print(f"Info: {len(months)} mois distincts dans {PARTITION_COLUMN}, table non partitionnée")
+        else:
+            layout['partition_column'] = PARTITION_COLUMN
+            layout['partitions'] = [(m.strftime('%Y_%m'), m.strftime('%Y-%m-%d'),
+                                     (m + pd.offsets.MonthBegin(1)).strftime('%Y-%m-%d')) for m in months]
+
+    key = unique_key or (KEY_COLUMN if KEY_COLUMN in columns else None)
+    if key:
+        key_cols = [key]
+        if layout['partition_column'] and layout['partition_column'] != key:
+            key_cols.append(layout['partition_column'])
+        values = df[key_cols]
+        if unique_key or not values.duplicated().any():
+            complete = not values.isna().any().any() and not (values == '').any().any()
+            layout['key_kind'] = 'primary' if complete and not unique_key else 'unique'
+        else:
+            layout['key_kind'] = 'index'
+        layout['key'] = key_cols
+        if unique_key:
+            layout['on_conflict'] = ','.join(key_cols)
+
+    stay_cols = [c for c in STAY_DATE_COLUMNS if c in columns]
+    layout['indexes'] = [[c] for c in stay_cols]
+    hotel_cols = [c for c in HOTEL_COLUMNS if c in columns]
+    if hotel_cols:
+        # (hotel, date d'arrivée) : sert aussi les filtres sur l'hôtel seul
+        layout['indexes'].append(hotel_cols[:1] + stay_cols[:1])
+    return layout
+
+
+def existing_key(columns, table_keys):
+    """
+    on_conflict d'un append sur une table existante : clé primaire, sinon première clé unique
+    (lignes de get_table_keys) dont toutes les colonnes sont importées. None si aucune.
+    """
+    for row in sorted(table_keys or [], key=lambda r: not r.get('is_primary')):
+        key_cols = row.get('key_columns') or []
+        if key_cols and all(c in columns for c in key_cols):
+            return ','.join(key_cols)
+    return None
+
+
+def table_suffix_sql(table_name, layout):
+    """
+    Contrainte on_conflict (dans le CREATE TABLE), clause PARTITION BY et partitions.
+    Retourne (définitions de colonnes supplémentaires, clause après la parenthèse, ordres suivants).
+    """
+    extra_defs = []
+    if layout['on_conflict'] and layout['key']:
+        # Requis pendant le chargement par on_conflict (reprise sans doublons)
+        extra_defs.append(f"UNIQUE ({', '.join(layout['key'])})")
+    column = layout['partition_column']
+    if not column:
+        return extra_defs, "", []
+    statements = [f"CREATE TABLE IF NOT EXISTS {table_name}_{suffix} PARTITION OF {table_name} "
+                  f"FOR VALUES FROM ('{start}') TO ('{end}');" for suffix, start, end in layout['partitions']]
+    statements.append(f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT;")
+    return extra_defs, f" PARTITION BY RANGE ({column})", statements
+
+
+def unique_key_sql(table_name, key):
+    """
+    Clé unique (index <table>_key) sur une table qui peut déjà exister sans elle (tables de nuitées d'avant
+    la clé) : doublons supprimés d'abord, le dernier écrit gardé. Sans effet si l'index existe.
+    """
+    name = _index_name(table_name, 'key')
+    same = ' AND '.join(f"a.{c} = b.{c}" for c in key)
+    return (f"DO $$ BEGIN IF to_regclass('{name}') IS NULL THEN "
+            f"DELETE FROM {table_name} a USING {table_name} b WHERE a.ctid < b.ctid AND {same}; "
+            f"CREATE UNIQUE INDEX {name} ON {table_name} ({', '.join(key)}); END IF; END $$;")
+
+
+def post_load_sql(table_name, layout):
+    """Clé et index créés après le chargement en masse, puis ANALYZE (idempotent)."""
+    statements = []
+    key = layout['key']
+    if key and not layout['on_conflict']:
+        cols = ', '.join(key)
+        if layout['key_kind'] == 'primary':
+            statements.append(
+                f"DO $$ BEGIN IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = '{table_name}'::regclass "
+                f"AND contype = 'p') THEN ALTER TABLE {table_name} ADD PRIMARY KEY ({cols}); END IF; END $$;")
+        elif layout['key_kind'] == 'unique':
+            statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS {_index_name(table_name, 'key')} "
+                              f"ON {table_name} ({cols});")
+        else:
+            statements.append(f"CREATE INDEX IF NOT EXISTS {_index_name(table_name, key[0] + '_idx')} "
+                              f"ON {table_name} ({key[0]});")
+    for cols in layout['indexes']:
+        statements.append(f"CREATE INDEX IF NOT EXISTS {_index_name(table_name, '_'.join(cols) + '_idx')} "
+                          f"ON {table_name} ({', '.join(cols)});")
+    if statements:
+        statements.append(f"ANALYZE {table_name};")
+    return "\n".join(statements)
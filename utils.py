@@ -1,6 +1,10 @@
 import pandas as pd
 from unidecode import unidecode
 import re
+import fcntl
+from contextlib import contextmanager
+
+import column_executor
 
 # Colonnes datetime à splitter
 DATETIME_COLUMNS = {
@@ -17,6 +21,10 @@ def clean_column_name(name):
         name = 'col_' + name
     return name.lower()
 
+def hotel_key(name):
+    """Identité d'un hôtel commune aux snapshots OTB (nom D-Edge) et aux rate shops (paramètre 'hotel')."""
+    return clean_column_name(name)
+
 def infer_sql_type(series):
     col_name = series.name.lower() if series.name else ""
     dtype = str(series.dtype)
@@ -70,20 +78,37 @@ def split_datetime_columns(df):
         new_df[col] = data
     return new_df
 
+def format_date_column(series):
+    """Colonne de dates -> 'YYYY-MM-DD' (None si vide ou invalide)."""
+    # Si déjà datetime (cas Excel), on formate direct
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime('%Y-%m-%d').where(series.notna(), None)
+    # Logic for string parsing
+    temp_series = pd.to_datetime(series, errors='coerce', dayfirst=True)
+    return temp_series.dt.strftime('%Y-%m-%d').where(temp_series.notna(), None)
+
 def format_all_dates(df, force_dates=None):
     if force_dates is None: force_dates = []
-    df_formatted = df.copy()
+    date_cols = []
     for col in df.columns:
         col_clean = col.lower()
         # On touche si 'date', 'debut', 'fin' est dans le nom OU si forcé par UI
         is_date_col = any(p in col_clean for p in ['date', 'debut', 'fin']) or (col in force_dates)
-        
         if is_date_col and 'heure' not in col_clean:
-            # Si déjà datetime (cas Excel), on formate direct
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                 df_formatted[col] = df[col].dt.strftime('%Y-%m-%d').where(df[col].notna(), None)
-            else:
-                 # Logic for string parsing
-                 temp_series = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
-                 df_formatted[col] = temp_series.dt.strftime('%Y-%m-%d').where(temp_series.notna(), None)
-    return df_formatted
+            date_cols.append(col)
+    # Colonnes réparties entre workers pour les gros fichiers (voir column_executor)
+    return column_executor.map_columns(df, format_date_column, date_cols)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Verrou exclusif entre process (workers gunicorn) sur <path>.lock, pour les lecture-modification-écriture
+    des stores sur disque (snapshots OTB, matrices tarifaires).
+    """
+    with open(path + '.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)